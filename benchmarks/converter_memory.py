@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for the EIDC JSON converter.
+
+Writes a synthetic EIDC API response with a large number of datasets to disk
+and compares the peak RSS of converting it in one go with `run` against
+streaming it with `iter_batches`. Each mode runs in its own subprocess so the
+peaks are measured independently.
+
+Usage:
+    python benchmarks/converter_memory.py --datasets 100000 --batch-size 1000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIELDS = ["description", "lineage", "title"]
+
+
+def write_response(path: str, datasets: int) -> None:
+    """
+    Writes a synthetic API response, one dataset at a time.
+    """
+    with open(path, "w") as f:
+        f.write(f'{{"numFound": {datasets}, "results": [')
+        for i in range(datasets):
+            dataset = {
+                "identifier": f"dataset-{i}",
+                "title": f"Synthetic dataset {i}",
+                "description": f"Description of dataset {i}. " * 20,
+                "lineage": f"Lineage of dataset {i}. " * 10,
+                "keywords": [{"value": f"keyword-{j}"} for j in range(5)],
+            }
+            f.write(("," if i else "") + json.dumps(dataset))
+        f.write("]}")
+
+
+def convert(path: str, mode: str, batch_size: int) -> None:
+    """
+    Converts the response with the given mode and prints the results as json.
+    """
+    from haystack.dataclasses import ByteStream
+
+    from ingestion.converter import EIDCJSONToDocument
+
+    converter = EIDCJSONToDocument(batch_size=batch_size)
+    start = time.perf_counter()
+    if mode == "run":
+        source = ByteStream.from_file_path(path)
+        documents = len(
+            converter.run(sources=[source], metadata_fields=FIELDS)[
+                "documents"
+            ]
+        )
+    else:
+        documents = 0
+        for batch in converter.iter_batches([path], metadata_fields=FIELDS):
+            documents += len(batch)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "documents": documents,
+                "seconds": elapsed,
+                "peak_rss_mb": peak_mb,
+            }
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--datasets", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--mode", choices=["run", "stream"])
+    parser.add_argument("--file")
+    args = parser.parse_args()
+
+    if args.mode:
+        convert(args.file, args.mode, args.batch_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "response.json")
+        write_response(path, args.datasets)
+        size_mb = os.path.getsize(path) / 1024**2
+        print(f"{args.datasets} datasets, {size_mb:.1f}MB response")
+        for mode in ("run", "stream"):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--mode",
+                    mode,
+                    "--file",
+                    path,
+                    "--batch-size",
+                    str(args.batch_size),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{mode:>6}: {result['documents']} documents in "
+                f"{result['seconds']:.1f}s, peak RSS "
+                f"{result['peak_rss_mb']:.0f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
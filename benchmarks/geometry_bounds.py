@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for the map app geometry helpers.
+
+Builds a synthetic MultiPolygon the size of a large county or coastline
+boundary from Nominatim and compares calculating its bounds with the
+original list based implementation against the vectorised `map.geometry`
+module, and reports the effect of simplification on the size of the
+geometry handed to Folium.
+
+Usage:
+    python benchmarks/geometry_bounds.py --polygons 200 --points 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map import geometry  # noqa: E402
+
+
+def list_calc_bounds(coords):
+    transposed_coords = np.array(coords).T.tolist()
+    return [
+        [min(transposed_coords[0]), min(transposed_coords[1])],
+        [max(transposed_coords[0]), max(transposed_coords[1])],
+    ]
+
+
+def list_calc_geojson_bounds(geojson):
+    """
+    The bounds calculation map_app used before `map.geometry`.
+    """
+    polygons = geojson["coordinates"]
+    polygon_bounds = []
+    match geojson["type"]:
+        case "MultiPolygon":
+            for polygon in polygons:
+                polygon_bounds.extend(list_calc_bounds(polygon[0]))
+        case "Polygon":
+            polygon_bounds.extend(list_calc_bounds(polygons[0]))
+        case "Point":
+            polygon_bounds = [polygons]
+    return list_calc_bounds(polygon_bounds)
+
+
+def multipolygon(polygons: int, points: int) -> dict:
+    """
+    Returns a MultiPolygon of noisy circles spread over the UK.
+    """
+    rng = np.random.default_rng(42)
+    coordinates = []
+    for _ in range(polygons):
+        centre = rng.uniform([-6, 50], [2, 58])
+        angles = np.linspace(0, 2 * np.pi, points)
+        radius = 0.2 + 0.01 * rng.standard_normal(points)
+        ring = centre + np.stack(
+            [radius * np.cos(angles), radius * np.sin(angles)], axis=1
+        )
+        ring[-1] = ring[0]
+        coordinates.append([ring.tolist()])
+    return {"type": "MultiPolygon", "coordinates": coordinates}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--polygons", type=int, default=200)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.001)
+    args = parser.parse_args()
+
+    geojson = multipolygon(args.polygons, args.points)
+    assert np.allclose(
+        list_calc_geojson_bounds(geojson),
+        geometry.calc_geojson_bounds(geojson),
+    )
+    print(
+        f"MultiPolygon of {args.polygons} polygons x {args.points} points "
+        f"({len(json.dumps(geojson)) / 1e6:.1f}MB of GeoJSON)"
+    )
+
+    timings = {}
+    for name, function in [
+        ("lists", list_calc_geojson_bounds),
+        ("vectorised", geometry.calc_geojson_bounds),
+    ]:
+        timings[name] = (
+            min(
+                timeit.repeat(
+                    lambda: function(geojson), number=1, repeat=args.repeat
+                )
+            )
+            * 1000
+        )
+        print(f"{name:>12}: {timings[name]:8.1f}ms")
+    print(
+        f"{'speed-up':>12}: {timings['lists'] / timings['vectorised']:8.1f}x"
+    )
+
+    simplified = geometry.simplify(geojson, args.tolerance)
+    print(
+        f"Simplified to {args.tolerance} degrees: "
+        f"{len(geometry.coordinates_array(geojson))} -> "
+        f"{len(geometry.coordinates_array(simplified))} points"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,742 @@
+#!/usr/bin/env python
+"""
+Offline benchmark and load test of the RAG pipeline.
+
+Builds a synthetic Chroma collection (and BM25 index) of a given number of
+datasets, starts a stub Ollama server that streams a canned answer with a
+given latency per token, and runs a query set through `RagPipelineWrapper`,
+one query at a time, and then through the API, with a number of concurrent
+requests. The query set is the `rag-demo.examples` in config.yml and the
+queries in any JSON lines files given, taken from their `query` field, or
+`title` if they have none. Each query has a target dataset in the synthetic
+collection whose description contains the query, among other datasets on
+the same topic, and recall@k is the share of queries whose target is among
+the first k datasets returned.
+
+Before the queries, a calibration run times the pipeline's generator alone
+answering the prompt without any context from the stub server, the floor
+of the query latency on the machine running the benchmark. Latencies and
+throughput are compared with a baseline as multiples of it, so that a
+baseline recorded on one machine can be checked on another.
+
+Recall@k is reported with the recall@k of an exact nearest neighbour search
+of the collection, the most a dense retriever could find. The pipeline
+searches Chroma's approximate HNSW index with its default `hnsw:search_ef`
+of 10, which misses some targets whose neighbours in the index are similar
+to each other but not to the query, so its recall is lower than the exact
+search's.
+
+Throughput, latency percentiles, recall@k and peak RSS are printed as json
+and can be saved as a baseline, or compared against one, in which case the
+run fails if any of them are worse than the baseline by more than the
+tolerance.
+
+Queries are embedded with a hashing embedding function by default, so the
+benchmark needs neither the Chroma embedding model nor a network connection;
+`--embedding default` uses the pipeline's own embedding function instead.
+
+Usage:
+    python benchmarks/rag_load.py --datasets 10000 --concurrency 4 \
+        --queries requests.jsonl --baseline benchmarks/rag_baseline.json
+    python benchmarks/rag_load.py --queries requests.jsonl \
+        --baseline benchmarks/rag_baseline.json --update-baseline
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import yaml
+from haystack import Document
+
+# Chroma's telemetry client fails noisily without a network connection.
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ingestion.bm25 import STOPWORDS, BM25Index  # noqa: E402
+from ingestion.converter import (  # noqa: E402
+    content_hash,
+    content_prefix,
+    document_id,
+)
+from rag.context import estimate_tokens  # noqa: E402
+from rag.generators import KeepAliveOllamaGenerator  # noqa: E402
+from rag.metrics import Metrics  # noqa: E402
+from rag.wrappers import RagPipelineWrapper  # noqa: E402
+
+WORDS = (
+    "soil moisture river flow rainfall upland peat carbon woodland "
+    "grassland pollinator bumblebee butterfly moth bird survey breeding "
+    "nitrate phosphate catchment groundwater lake sediment chlorophyll "
+    "land cover habitat heather bog estuary salt marsh invertebrate otter "
+    "badger deer bat emissions ammonia ozone deposition drought flood "
+    "temperature weather station sensor transect quadrat plot monitoring "
+    "annual decadal spatial model simulation reanalysis satellite lidar"
+).split()
+
+# Number of random words in the description of each dataset, added to the
+# query in those of the target datasets. They are drawn from one of TOPICS
+# topics of TOPIC_WORDS words, from the words above and VOCABULARY made up
+# ones.
+FILLER = 60
+VOCABULARY = 2000
+TOPICS = 50
+TOPIC_WORDS = 20
+
+ANSWER = (
+    "The available information suggests the following datasets may help "
+    "answer the question, as they describe measurements relevant to it."
+).split()
+
+# Metrics where a larger value is a regression, and where a smaller one is.
+HIGHER_IS_WORSE = ("latency_p50", "latency_p95", "latency_p99", "peak_rss_mb")
+LOWER_IS_WORSE = ("throughput_qps",)
+
+# Metrics compared with the baseline as multiples of the calibration run.
+LATENCIES = ("latency_p50", "latency_p95", "latency_p99")
+
+# Number of generations timed by the calibration run.
+CALIBRATION_RUNS = 20
+
+
+class HashEmbeddingFunction:
+    """
+    Chroma embedding function summing a random vector per word, seeded by a
+    hash of the word, so that texts sharing words other than stopwords are
+    similar. The vectors are dense, like those of a real embedding model,
+    which the HNSW index searches far more accurately than sparse ones.
+    """
+
+    def __init__(self, dimensions: int = 384) -> None:
+        self.dimensions = dimensions
+        self.vectors: Dict[str, np.ndarray] = {}
+
+    def vector(self, word: str) -> np.ndarray:
+        if word not in self.vectors:
+            rng = np.random.default_rng(zlib.crc32(word.encode()))
+            self.vectors[word] = rng.standard_normal(self.dimensions)
+        return self.vectors[word]
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        embeddings = np.zeros((len(input), self.dimensions))
+        for row, text in enumerate(input):
+            for word in re.findall(r"\w+", text.casefold()):
+                if word not in STOPWORDS:
+                    embeddings[row] += self.vector(word)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.where(norms, norms, 1)).tolist()
+
+
+class StubOllama(ThreadingHTTPServer):
+    """
+    HTTP server answering Ollama `/api/generate` requests with a canned
+    answer, waiting `prefill_rate` tokens per second to "read" the prompt and
+    `token_latency` seconds before each answer token. Streams json lines
+    like Ollama, with the generation statistics in the last one.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, token_latency: float, answer_tokens: int, prefill_rate: float
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), StubOllamaHandler)
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        self.prefill_rate = prefill_rate
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(
+            self.rfile.read(int(self.headers["Content-Length"]))
+        )
+        server = self.server
+        prompt_tokens = estimate_tokens(request.get("prompt", ""))
+        prefill = prompt_tokens / server.prefill_rate
+        time.sleep(prefill)
+        tokens = [
+            ANSWER[i % len(ANSWER)] + " " for i in range(server.answer_tokens)
+        ]
+        stats = {
+            "model": request.get("model"),
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) * server.token_latency * 1e9),
+        }
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        if not request.get("stream"):
+            time.sleep(len(tokens) * server.token_latency)
+            body = {**stats, "response": "".join(tokens)}
+            self.wfile.write(json.dumps(body).encode())
+            return
+        for token in tokens:
+            time.sleep(server.token_latency)
+            chunk = {"model": request.get("model"), "response": token}
+            self.wfile.write(json.dumps({**chunk, "done": False}).encode())
+            self.wfile.write(b"\n")
+            self.wfile.flush()
+        self.wfile.write(json.dumps({**stats, "response": ""}).encode())
+        self.wfile.write(b"\n")
+
+
+def load_queries(config: Dict[str, Any], paths: List[str]) -> List[str]:
+    """
+    Returns the example questions from the config followed by the queries in
+    the JSON lines files.
+    """
+    queries = list(config["rag-demo"].get("examples", []))
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    queries.append(record.get("query") or record["title"])
+    return queries
+
+
+def target_title(index: int) -> str:
+    return f"Benchmark target dataset {index}"
+
+
+def build_collection(
+    path: str,
+    collection: str,
+    datasets: int,
+    queries: List[str],
+    embedding: Optional[HashEmbeddingFunction],
+    seed: int = 42,
+) -> None:
+    """
+    Writes a collection of synthetic dataset descriptions, and its BM25
+    index, with a target dataset for each query whose description contains
+    the query and random filler datasets making up the rest.
+    """
+    import chromadb
+
+    rng = random.Random(seed)
+    client = chromadb.PersistentClient(path=path)
+    # Chroma adds the datasets to the HNSW index in the order of a set of
+    # their ids, which depends on the hash seed (see `main`), and on several
+    # threads by default, so either would build a different index, with a
+    # different recall, on every run.
+    store = client.get_or_create_collection(
+        collection,
+        embedding_function=embedding,
+        metadata={"hnsw:num_threads": 1},
+    )
+    bm25 = BM25Index(f"{path}/{collection}-bm25.sqlite")
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        contents = [doc["content"] for doc in batch]
+        store.add(
+            ids=[doc["id"] for doc in batch],
+            documents=contents,
+            metadatas=[doc["meta"] for doc in batch],
+        )
+        bm25.write(
+            Document(id=doc["id"], content=doc["content"], meta=doc["meta"])
+            for doc in batch
+        )
+        batch.clear()
+
+    total = max(datasets, len(queries))
+    # Topics make the collection form clusters of similar datasets, like real
+    # embeddings do, rather than being spread evenly, which approximate
+    # nearest neighbour search handles poorly. Each query has a topic of its
+    # own that its target and some filler datasets are drawn from. The target
+    # contains all the words of the query, and each filler dataset on its
+    # topic half of them, so that they lead the search towards the target
+    # without matching the query as well as it does.
+    vocabulary = WORDS + [f"term{n}" for n in range(VOCABULARY)]
+    topics = [rng.sample(vocabulary, TOPIC_WORDS) for _ in range(TOPICS)]
+    query_words = [
+        [
+            word
+            for word in re.findall(r"\w+", query.casefold())
+            if word not in STOPWORDS
+        ]
+        for query in queries
+    ]
+    topics += [rng.sample(vocabulary, TOPIC_WORDS) for _ in queries]
+    # Targets are spread through the collection rather than written first.
+    positions = rng.sample(range(total), len(queries))
+    targets = {position: index for index, position in enumerate(positions)}
+    for i in range(total):
+        if i in targets:
+            words = query_words[targets[i]]
+            topic = topics[TOPICS + targets[i]] + words
+            filler = " ".join(rng.choices(topic, k=FILLER))
+            title = target_title(targets[i])
+            text = f"{queries[targets[i]]} {filler}"
+        else:
+            index = rng.randrange(len(topics))
+            topic = topics[index]
+            if index >= TOPICS:
+                words = query_words[index - TOPICS]
+                topic = topic + rng.sample(words, len(words) // 2)
+            filler = " ".join(rng.choices(topic, k=FILLER))
+            title, text = f"Synthetic dataset {i}", filler
+        west, south = rng.uniform(-8, 1), rng.uniform(50, 58)
+        content = content_prefix(title, "description") + text
+        batch.append(
+            {
+                "id": document_id(f"dataset-{i}", "description"),
+                "content": content,
+                "meta": {
+                    "dataset_id": f"dataset-{i}",
+                    "dataset_title": title,
+                    "eidc_metadata_key": "description",
+                    "chunk_start": 0,
+                    "content_hash": content_hash(content),
+                    "bbox_west": west,
+                    "bbox_south": south,
+                    "bbox_east": west + rng.uniform(0.1, 2),
+                    "bbox_north": south + rng.uniform(0.1, 2),
+                },
+            }
+        )
+        if len(batch) == 1000:
+            flush()
+    if batch:
+        flush()
+
+
+def write_pipeline(source: str, directory: str, llm_url: str) -> str:
+    """
+    Copies a pipeline yaml file, pointing its generator at the stub server.
+    """
+    with open(source) as f:
+        text = re.sub(r"url: \S+/api/generate", f"url: {llm_url}", f.read())
+    path = os.path.join(directory, os.path.basename(source))
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def prepare(
+    wrapper: RagPipelineWrapper, embedding: Optional[HashEmbeddingFunction]
+) -> None:
+    """
+    Loads the wrapper's pipeline, replacing the embedding function of its
+    document store with the hashing one if the benchmark uses it.
+    """
+    retriever = wrapper.get_component("retriever")
+    if embedding is not None:
+        retriever.document_store._collection._embedding_function = embedding
+
+
+def exact_recall(
+    path: str,
+    collection: str,
+    queries: List[str],
+    k: int,
+    embedding: Optional[HashEmbeddingFunction],
+) -> float:
+    """
+    Returns the recall@k of an exact nearest neighbour search of the
+    collection, by the squared euclidean distance of Chroma's default `l2`
+    space, where the pipeline searches its approximate HNSW index.
+    """
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    if embedding is None:
+        store = client.get_collection(collection)
+    else:
+        store = client.get_collection(collection, embedding_function=embedding)
+    records = store.get(include=["embeddings", "metadatas"])
+    vectors = np.asarray(records["embeddings"])
+    titles = np.array([meta["dataset_title"] for meta in records["metadatas"]])
+    found = []
+    for i, query in enumerate(np.asarray(store._embedding_function(queries))):
+        distances = (vectors**2).sum(axis=1) - 2 * vectors @ query
+        nearest = titles[np.argsort(distances)[:k]]
+        found.append(target_title(i) in nearest)
+    return sum(found) / len(found)
+
+
+def calibrate(url: str, prompt: str) -> float:
+    """
+    Returns the median seconds the pipeline's generator takes to answer the
+    prompt from the stub server, the floor of the query latency, which
+    includes the stub's waits and the HTTP and json handling of the machine
+    running the benchmark.
+    """
+    generator = KeepAliveOllamaGenerator(model="benchmark", url=url)
+    seconds = []
+    for _ in range(CALIBRATION_RUNS):
+        start = time.perf_counter()
+        generator.run(prompt)
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds))
+
+
+def normalise(run: Dict[str, float], calibration: float) -> Dict[str, float]:
+    """
+    Returns the latencies of a run as multiples of the calibration run and
+    its throughput as queries per calibration run.
+    """
+    normalised = {metric: run[metric] / calibration for metric in LATENCIES}
+    normalised["throughput_qps"] = run["throughput_qps"] * calibration
+    return normalised
+
+
+def hits(datasets, query_index: int, k: int) -> bool:
+    return target_title(query_index) in list(datasets["dataset"][:k])
+
+
+def summarise(
+    latencies: List[float], seconds: float, found: List[bool]
+) -> Dict[str, float]:
+    p50, p95, p99 = np.quantile(latencies, (0.5, 0.95, 0.99))
+    return {
+        "queries": len(latencies),
+        "throughput_qps": len(latencies) / seconds,
+        "latency_p50": p50,
+        "latency_p95": p95,
+        "latency_p99": p99,
+        "recall_at_k": sum(found) / len(found),
+    }
+
+
+def run_wrapper(
+    pipeline: str,
+    config: Dict[str, Any],
+    queries: List[str],
+    repeat: int,
+    k: int,
+    embedding: Optional[HashEmbeddingFunction],
+    metrics: Metrics,
+) -> Dict[str, float]:
+    """
+    Runs the queries through a single `RagPipelineWrapper`, one at a time.
+    """
+    wrapper = RagPipelineWrapper(pipeline, metrics=metrics, **config)
+    prepare(wrapper, embedding)
+    latencies, found = [], []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for i, query in enumerate(queries):
+            query_start = time.perf_counter()
+            _, datasets = wrapper.query(query)
+            latencies.append(time.perf_counter() - query_start)
+            found.append(hits(datasets, i, k))
+    return summarise(latencies, time.perf_counter() - start, found)
+
+
+def run_api(
+    directory: str,
+    pipeline: str,
+    config: Dict[str, Any],
+    queries: List[str],
+    repeat: int,
+    k: int,
+    concurrency: int,
+    embedding: Optional[HashEmbeddingFunction],
+) -> Dict[str, float]:
+    """
+    Runs the queries through the API in process, with up to `concurrency`
+    requests at once, served by a pool of as many pipelines.
+    """
+    import httpx
+    import pandas as pd
+
+    api_config = {
+        "pipelines-dir": os.path.dirname(pipeline),
+        "rag-demo": {
+            "pipeline": os.path.basename(pipeline),
+            "prompt": config["prompt"],
+            "api": {"size": concurrency, "max_queue": len(queries) * repeat},
+        },
+        "vector-db": {
+            "path": config["chroma_path"],
+            "collection": config["collection"],
+        },
+    }
+    with open(os.path.join(directory, "config.yml"), "w") as f:
+        yaml.safe_dump(api_config, f)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        rag_api = importlib.import_module("rag.rag_api")
+    finally:
+        os.chdir(cwd)
+    logging.getLogger().setLevel(logging.WARNING)
+    for wrapper in rag_api.pool.wrappers:
+        prepare(wrapper, embedding)
+
+    async def run() -> Dict[str, float]:
+        semaphore = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=rag_api.app)
+        latencies, found = [], []
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+
+            async def request(i: int, query: str) -> None:
+                async with semaphore:
+                    query_start = time.perf_counter()
+                    response = await client.get(
+                        "/query", params={"query_string": query}
+                    )
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - query_start)
+                datasets = pd.DataFrame(
+                    response.json()["datasets"], columns=["dataset"]
+                )
+                found.append(hits(datasets, i, k))
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                await asyncio.gather(
+                    *(request(i, query) for i, query in enumerate(queries))
+                )
+            return summarise(latencies, time.perf_counter() - start, found)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        rag_api.pool.close()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def regressions(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    recall_tolerance: float,
+) -> List[str]:
+    """
+    Returns a description of each result worse than the baseline by more than
+    the tolerance: a relative change for throughput, latency and memory, and
+    an absolute one for recall. Throughput and latency are compared as
+    multiples of the calibration run of each.
+    """
+    if results["settings"] != baseline["settings"]:
+        return ["the baseline was recorded with different settings"]
+    if "calibration_seconds" not in baseline:
+        return ["the baseline was recorded without a calibration run"]
+    found = []
+    for run in ("wrapper", "api"):
+        current = {
+            **results[run],
+            **normalise(results[run], results["calibration_seconds"]),
+        }
+        recorded = {
+            **baseline[run],
+            **normalise(baseline[run], baseline["calibration_seconds"]),
+        }
+        for metric, value in current.items():
+            previous = recorded[metric]
+            if metric in LOWER_IS_WORSE:
+                worse = value < previous * (1 - tolerance)
+            elif metric in HIGHER_IS_WORSE:
+                worse = value > previous * (1 + tolerance)
+            elif metric == "recall_at_k":
+                worse = value < previous - recall_tolerance
+            else:
+                worse = False
+            if worse:
+                relative = metric in LATENCIES or metric in LOWER_IS_WORSE
+                found.append(
+                    f"{run} {metric} {value:.3f} (was {previous:.3f})"
+                    + (" relative to the calibration run" if relative else "")
+                )
+    if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        found.append(
+            f"peak_rss_mb {results['peak_rss_mb']:.1f} "
+            f"(was {baseline['peak_rss_mb']:.1f})"
+        )
+    return found
+
+
+def main():
+    # Restarts with a fixed hash seed so that the HNSW index, and so recall,
+    # is the same on every run.
+    if "PYTHONHASHSEED" not in os.environ:
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable, *sys.argv])
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--config", default=os.path.join(ROOT, "config.yml"))
+    parser.add_argument(
+        "--pipeline",
+        default=None,
+        help="Pipeline file in the pipelines directory, defaults to the "
+        "rag-demo pipeline in the config.",
+    )
+    parser.add_argument(
+        "--queries",
+        nargs="*",
+        default=[],
+        help="JSON lines files of queries added to the config examples.",
+    )
+    parser.add_argument("--datasets", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--token-latency",
+        type=float,
+        default=0.01,
+        help="Seconds the stub LLM takes per answer token.",
+    )
+    parser.add_argument("--answer-tokens", type=int, default=20)
+    parser.add_argument(
+        "--prefill-rate",
+        type=float,
+        default=5000,
+        help="Prompt tokens per second the stub LLM reads.",
+    )
+    parser.add_argument(
+        "--embedding", choices=["hash", "default"], default="hash"
+    )
+    parser.add_argument("--baseline", help="Baseline json file.")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Save the results as the baseline rather than comparing.",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--recall-tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    pipelines_dir = os.path.join(
+        os.path.dirname(os.path.abspath(args.config)), config["pipelines-dir"]
+    )
+    pipeline_name = args.pipeline or config["rag-demo"]["pipeline"]
+    queries = load_queries(config, args.queries)
+    embedding = HashEmbeddingFunction() if args.embedding == "hash" else None
+
+    server = StubOllama(
+        args.token_latency, args.answer_tokens, args.prefill_rate
+    )
+    server.start()
+    with tempfile.TemporaryDirectory() as directory:
+        chroma_path = os.path.join(directory, "chroma-data")
+        start = time.perf_counter()
+        build_collection(
+            chroma_path, "benchmark", args.datasets, queries, embedding
+        )
+        build_seconds = time.perf_counter() - start
+        exact = exact_recall(
+            chroma_path, "benchmark", queries, args.k, embedding
+        )
+        calibration = calibrate(server.url, config["rag-demo"]["prompt"])
+        pipeline = write_pipeline(
+            os.path.join(pipelines_dir, pipeline_name), directory, server.url
+        )
+        pipeline_config = {
+            "chroma_path": chroma_path,
+            "collection": "benchmark",
+            "prompt": config["rag-demo"]["prompt"],
+        }
+        metrics = Metrics()
+        wrapper = run_wrapper(
+            pipeline,
+            pipeline_config,
+            queries,
+            args.repeat,
+            args.k,
+            embedding,
+            metrics,
+        )
+        api = run_api(
+            directory,
+            pipeline,
+            pipeline_config,
+            queries,
+            args.repeat,
+            args.k,
+            args.concurrency,
+            embedding,
+        )
+    server.shutdown()
+
+    stages = metrics.summary("component_seconds")
+    results = {
+        "settings": {
+            "pipeline": pipeline_name,
+            "queries": len(queries),
+            "datasets": args.datasets,
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "k": args.k,
+            "token_latency": args.token_latency,
+            "answer_tokens": args.answer_tokens,
+            "prefill_rate": args.prefill_rate,
+            "embedding": args.embedding,
+        },
+        "build_seconds": build_seconds,
+        "calibration_seconds": calibration,
+        "exact_recall_at_k": exact,
+        "wrapper": wrapper,
+        "api": api,
+        "normalised": {
+            "wrapper": normalise(wrapper, calibration),
+            "api": normalise(api, calibration),
+        },
+        "stages_p95": dict(zip(stages["component"], stages["p95"])),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(
+            results, baseline, args.tolerance, args.recall_tolerance
+        )
+        for regression in found:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Persistent BM25 keyword index of the documents in a Chroma collection.
+
+The index is an SQLite FTS5 full text index, an inverted index ranked with
+BM25, stored in a file next to the Chroma database and kept in step with the
+collection by `IncrementalDocumentWriter` during ingestion. Searches can be
+filtered with Chroma `where` filters, which are applied to the metadata
+stored with each document before the results are cut to the top matches.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from haystack import Document
+
+# Words too common in questions to be worth matching on.
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "data",
+    "dataset", "datasets", "do", "does", "for", "from", "has", "have", "how",
+    "i", "in", "is", "it", "most", "of", "on", "or", "the", "there", "to",
+    "was", "what", "when", "where", "which", "who", "why", "with",
+}  # fmt: skip
+
+
+def keyword_query(text: str) -> Optional[str]:
+    """
+    Returns an FTS5 query matching documents containing any of the words in
+    the text, or None if it has no words to match on. Words are quoted so
+    that FTS5 operators and punctuation in the text are matched literally.
+    """
+    words = dict.fromkeys(
+        word
+        for word in re.findall(r"\w+", text.casefold())
+        if word not in STOPWORDS
+    )
+    if not words:
+        return None
+    return " OR ".join(f'"{word}"' for word in words)
+
+
+COMPARISONS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+
+
+def where_clause(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    Translates a Chroma `where` filter into an SQL condition on the metadata
+    of the documents table and its parameters. Raises ValueError for
+    operators Chroma doesn't support in `where` filters either.
+    """
+    conditions, params = [], []
+    for key, value in filters.items():
+        if key in ("$and", "$or"):
+            clauses = [where_clause(condition) for condition in value]
+            joiner = " AND " if key == "$and" else " OR "
+            conditions.append(
+                "(" + joiner.join(clause for clause, _ in clauses) + ")"
+            )
+            params.extend(param for _, args in clauses for param in args)
+            continue
+        if not isinstance(value, dict):
+            value = {"$eq": value}
+        # The value of the key in the stored metadata, with the key passed
+        # as a parameter of its JSON path.
+        field = "json_extract(documents.meta, ?)"
+        path = f'$."{key}"'
+        for operator, operand in value.items():
+            if operator in COMPARISONS:
+                conditions.append(f"{field} {COMPARISONS[operator]} ?")
+                params.extend([path, operand])
+            elif operator in ("$in", "$nin"):
+                negation = "NOT " if operator == "$nin" else ""
+                placeholders = ", ".join("?" for _ in operand)
+                conditions.append(f"{field} {negation}IN ({placeholders})")
+                params.extend([path, *operand])
+            else:
+                raise ValueError(f"Unsupported filter operator {operator}")
+    return " AND ".join(conditions) or "1", params
+
+
+class BM25Index:
+    """
+    Keyword index of documents, searched with BM25. Documents are stored with
+    their content hash and metadata so that search results are complete
+    documents and unchanged documents need not be indexed again.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        :param path: Path to the sqlite database, or None for an in-memory
+            index.
+        """
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path or ":memory:", timeout=30, check_same_thread=False
+        )
+        with self.lock, self.connection:
+            if path:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "rowid INTEGER PRIMARY KEY, id TEXT UNIQUE, "
+                "content_hash TEXT, meta TEXT, content TEXT)"
+            )
+            # External content FTS5 table, kept in step with the documents
+            # table by triggers.
+            self.connection.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(
+                    content, content='documents', content_rowid='rowid',
+                    tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS documents_insert
+                AFTER INSERT ON documents BEGIN
+                    INSERT INTO terms(rowid, content)
+                    VALUES (new.rowid, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_delete
+                AFTER DELETE ON documents BEGIN
+                    INSERT INTO terms(terms, rowid, content)
+                    VALUES ('delete', old.rowid, old.content);
+                END;
+                """
+            )
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM documents"
+            ).fetchone()[0]
+
+    def hashes(self) -> Dict[str, Optional[str]]:
+        """
+        Returns the content hash of every indexed document, keyed by id.
+        """
+        with self.lock:
+            return dict(
+                self.connection.execute(
+                    "SELECT id, content_hash FROM documents"
+                )
+            )
+
+    def write(self, documents: Iterable[Document]) -> None:
+        """
+        Adds documents to the index, replacing documents with the same id.
+        """
+        rows = [
+            (
+                doc.id,
+                doc.meta.get("content_hash"),
+                json.dumps(doc.meta),
+                doc.content or "",
+            )
+            for doc in documents
+        ]
+        with self.lock, self.connection:
+            # Deleted and inserted rather than replaced so that the triggers
+            # update the full text index.
+            self.connection.executemany(
+                "DELETE FROM documents WHERE id = ?",
+                [(row[0],) for row in rows],
+            )
+            self.connection.executemany(
+                "INSERT INTO documents (id, content_hash, meta, content) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM documents WHERE id = ?", [(id,) for id in ids]
+            )
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        """
+        Returns the documents best matching any of the words in the query,
+        with their BM25 score, highest first. With a Chroma `where` filter,
+        only documents whose metadata match it are returned, and the top
+        `top_k` are taken from those rather than from every match.
+        """
+        match = keyword_query(query)
+        if match is None:
+            return []
+        condition, params = where_clause(filters or {})
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT documents.id, documents.content, documents.meta, "
+                "bm25(terms) AS rank FROM terms "
+                "JOIN documents ON documents.rowid = terms.rowid "
+                f"WHERE terms MATCH ? AND {condition} "
+                "ORDER BY rank LIMIT ?",
+                (match, *params, top_k),
+            ).fetchall()
+        # FTS5 returns BM25 scores negated, so that better matches sort first.
+        return [
+            Document(
+                id=id, content=content, meta=json.loads(meta), score=-rank
+            )
+            for id, content, meta, rank in rows
+        ]
@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import re
+
+SENTENCE_PATTERN = re.compile(r"[^.!?]+(?:[.!?]+|$)")
+TOKEN_PATTERN = re.compile(r"\S+")
+LINE_PATTERN = re.compile(r"[^\n]+")
+WORDPIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Characters per wordpiece assumed for words, which overestimates the tokens
+# of common words so that rarer words split into several pieces still fit.
+WORDPIECE_CHARS = 5
+
+Span = Tuple[int, int, int]
+
+
+@dataclass
+class Chunk:
+    """
+    A chunk of a rendered metadata field, with its character offsets into the
+    rendered text.
+    """
+
+    text: str
+    start: int
+    end: int
+
+
+def flatten(value: Any, prefix: str = "") -> Iterator[str]:
+    """
+    Renders nested dicts and lists as flattened `key.path: value` lines.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from flatten(item, f"{prefix}[{i}]")
+    else:
+        yield f"{prefix}: {value}" if prefix else str(value)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens the embedding model's wordpiece tokenizer
+    splits text into: one per punctuation character and one per
+    `WORDPIECE_CHARS` characters of each word, rounded up. Whitespace
+    delimited words are far fewer than model tokens, as punctuation, numbers
+    and long words are split into several.
+    """
+    return sum(
+        -(-len(piece) // WORDPIECE_CHARS)
+        for piece in WORDPIECE_PATTERN.findall(text)
+    )
+
+
+def spans(pattern: re.Pattern, text: str) -> List[Span]:
+    """
+    Returns the (start, end, tokens) span of each match of pattern in text,
+    ignoring whitespace only matches.
+    """
+    return [
+        (match.start(), match.end(), count_tokens(match.group()))
+        for match in pattern.finditer(text)
+        if match.group().strip()
+    ]
+
+
+def windows(
+    spans: List[Span], max_tokens: int, overlap: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Groups consecutive spans into windows of at most max_tokens, starting
+    each window with up to overlap tokens from the end of the previous one.
+    """
+    i = 0
+    while i < len(spans):
+        j, tokens = i, 0
+        while j < len(spans) and (
+            j == i or tokens + spans[j][2] <= max_tokens
+        ):
+            tokens += spans[j][2]
+            j += 1
+        yield spans[i][0], spans[j - 1][1]
+        if j >= len(spans):
+            return
+        k, back = j, 0
+        while k - 1 > i and back + spans[k - 1][2] <= overlap:
+            k -= 1
+            back += spans[k][2]
+        i = k
+
+
+class FieldChunker:
+    """
+    Splits metadata field values into chunks according to a per-field policy.
+
+    Tokens are those of the embedding model, estimated by `count_tokens`, so
+    that chunks are not truncated when they are embedded. Policies are one
+    of:
+    - `prose`: sentence windows of up to `max_tokens` tokens, overlapping by
+      up to `overlap` tokens. Sentences longer than a window are split on
+      whitespace.
+    - `structured`: nested values are flattened into `key.path: value` lines,
+      which are grouped into windows of up to `max_tokens` without overlap.
+    - `whole`: the value is rendered as a single chunk.
+
+    Fields without a configured policy use `prose` for strings, `structured`
+    for dicts and lists and `whole` for anything else.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 200,
+        overlap: int = 40,
+        fields: Optional[Dict[str, Union[str, Dict[str, Any]]]] = None,
+    ):
+        """
+        :param max_tokens: Maximum number of tokens in each chunk.
+        :param overlap: Number of tokens shared between consecutive prose
+            chunks.
+        :param fields: Policy for each field, either the policy name or a
+            dict with `policy` and optional `max_tokens` and `overlap`.
+        """
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.fields = fields or {}
+
+    def policy(self, key: str, value: Any) -> Tuple[str, int, int]:
+        """
+        Returns the policy, maximum tokens and overlap for a field.
+        """
+        config = self.fields.get(key, {})
+        if isinstance(config, str):
+            config = {"policy": config}
+        if "policy" in config:
+            policy = config["policy"]
+        elif isinstance(value, str):
+            policy = "prose"
+        elif isinstance(value, (dict, list)):
+            policy = "structured"
+        else:
+            policy = "whole"
+        return (
+            policy,
+            config.get("max_tokens", self.max_tokens),
+            config.get("overlap", self.overlap),
+        )
+
+    def chunk(self, key: str, value: Any, reserve: int = 0) -> List[Chunk]:
+        """
+        Renders a field value and splits it into chunks, leaving `reserve`
+        tokens of each window for text added to every chunk, such as the
+        converter's content prefix.
+        """
+        policy, max_tokens, overlap = self.policy(key, value)
+        max_tokens = max(max_tokens - reserve, 1)
+        if policy == "structured":
+            text = "\n".join(flatten(value))
+            pieces = spans(LINE_PATTERN, text)
+            overlap = 0
+        else:
+            text = str(value)
+            if policy == "whole":
+                return [Chunk(text, 0, len(text))]
+            pieces = []
+            for sentence in spans(SENTENCE_PATTERN, text):
+                if sentence[2] > max_tokens:
+                    pieces.extend(
+                        (sentence[0] + start, sentence[0] + end, tokens)
+                        for start, end, tokens in spans(
+                            TOKEN_PATTERN, text[sentence[0] : sentence[1]]
+                        )
+                    )
+                else:
+                    pieces.append(sentence)
+
+        if not pieces:
+            return [Chunk(text, 0, len(text))]
+        chunks = []
+        for start, end in windows(pieces, max_tokens, overlap):
+            raw = text[start:end]
+            start += len(raw) - len(raw.lstrip())
+            chunk_text = raw.strip()
+            chunks.append(Chunk(chunk_text, start, start + len(chunk_text)))
+        return chunks
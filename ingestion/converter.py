@@ -1,12 +1,86 @@
 from haystack import component, Document, logging
-from typing import Optional, List, Union
+from typing import Any, Dict, Iterator, Optional, List, Union
 from haystack.dataclasses import ByteStream
 from haystack.components.converters.utils import get_bytestream_from_source
+from ingestion.chunking import Chunk, FieldChunker, count_tokens
+from ingestion.streaming import iter_json_array
+from pathlib import Path
+import hashlib
+import io
 import json
+import re
 
 logger = logging.getLogger(__name__)
 
 
+def document_id(
+    dataset_id: str, metadata_key: str, chunk_index: int = 0
+) -> str:
+    """
+    Returns a stable document id for a chunk of a metadata field of a
+    dataset, so the same chunk maps to the same document across indexing
+    runs. The first chunk uses the id of the whole field.
+    """
+    key = f"{dataset_id}:{metadata_key}"
+    if chunk_index:
+        key = f"{key}:{chunk_index}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def content_prefix(title: str, metadata_key: str) -> str:
+    """
+    Returns the sentence introducing a metadata field at the start of the
+    content of each of its documents.
+    """
+    return f'The dataset entitled "{title}" contains the following information in it\'s "{metadata_key}" metadata field: '
+
+
+def content_hash(content: str) -> str:
+    """
+    Returns a hash of the document content used to detect changed documents.
+    """
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+EXTENT_KEYS = ["bbox_west", "bbox_south", "bbox_east", "bbox_north"]
+WKT_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+WKT_COORDINATES = re.compile(rf"({WKT_NUMBER})\s+({WKT_NUMBER})")
+
+
+def dataset_extent(dataset: Dict) -> Optional[List[float]]:
+    """
+    Returns the [west, south, east, north] extent covering the bounding boxes
+    of a dataset, or None if it has no spatial extent. Bounding boxes are read
+    from the `boundingBoxes` of an EIDC record, or from the WKT `locations` of
+    a catalogue search result.
+    """
+    boxes = []
+    for box in dataset.get("boundingBoxes") or []:
+        try:
+            boxes.append(
+                [
+                    float(box["westBoundLongitude"]),
+                    float(box["southBoundLatitude"]),
+                    float(box["eastBoundLongitude"]),
+                    float(box["northBoundLatitude"]),
+                ]
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+    for location in dataset.get("locations") or []:
+        coordinates = [
+            (float(x), float(y))
+            for x, y in WKT_COORDINATES.findall(str(location))
+        ]
+        if coordinates:
+            xs, ys = zip(*coordinates)
+            boxes.append([min(xs), min(ys), max(xs), max(ys)])
+    if not boxes:
+        return None
+    wests, souths, easts, norths = zip(*boxes)
+    return [min(wests), min(souths), max(easts), max(norths)]
+
+
 @component
 class EIDCJSONToDocument:
     """
@@ -15,14 +89,154 @@ class EIDCJSONToDocument:
     Each metadata field from the eidc will be individually converted to a document with referene to the dataset identifier and key name in the document metadata.
 
     Alternatively, a list of fields can be specified to extract only the required metadata.
+
+    Document ids are derived from the dataset identifier and key name, and a hash of the content is stored in the
+    document metadata so that re-indexing can skip documents that have not changed.
+
+    `run` converts whole responses at once, while `iter_batches` streams the results and emits fixed-size batches of
+    documents for large responses.
+
+    If a chunking policy is given, each field is split into chunks by a `FieldChunker` and each chunk becomes a
+    document, with its position in the rendered field recorded in the `chunk_index`, `chunk_start` and `chunk_end`
+    metadata.
+
+    The spatial extent of each dataset is stored as numbers in the `bbox_west`, `bbox_south`, `bbox_east` and
+    `bbox_north` metadata of its documents, so that retrieval can be filtered by region. Datasets without a spatial
+    extent have no extent metadata, and every document has a `has_extent` flag so that filters can still include
+    them.
     """
 
+    def __init__(
+        self, batch_size: int = 1000, chunking: Optional[Dict[str, Any]] = None
+    ):
+        """
+        :param batch_size: Number of documents in each batch emitted by `iter_batches`.
+        :param chunking: Parameters for a `FieldChunker`, or None to convert each field to a single document.
+        """
+        self.batch_size = batch_size
+        self.chunking = chunking
+        self.chunker = FieldChunker(**chunking) if chunking else None
+
+    def field_chunks(
+        self, key: str, value: Any, prefix: str = ""
+    ) -> List[Chunk]:
+        """
+        Splits a field value into chunks, or returns it as a single chunk if chunking is not configured. The tokens of
+        the prefix added to each chunk count towards the chunk size.
+        """
+        if self.chunker is None:
+            text = str(value)
+            return [Chunk(text, 0, len(text))]
+        return self.chunker.chunk(key, value, reserve=count_tokens(prefix))
+
+    def dataset_documents(
+        self, dataset: Dict, metadata_fields: Optional[List[str]] = None
+    ) -> List[Document]:
+        """
+        Converts the metadata fields of a single dataset to documents.
+        """
+        documents = []
+        keys = metadata_fields if metadata_fields else dataset
+        extent = dataset_extent(dataset)
+        for key in keys:
+            prefix = content_prefix(dataset["title"], key)
+            chunks = self.field_chunks(key, dataset[key], prefix)
+            for index, chunk in enumerate(chunks):
+                content = prefix + chunk.text
+                metadata = {
+                    "dataset_id": dataset["identifier"],
+                    "dataset_title": dataset["title"],
+                    "eidc_metadata_key": key,
+                    # The extent is part of the hash so that re-indexing
+                    # updates documents whose extent has changed.
+                    "content_hash": content_hash(f"{content}{extent}"),
+                    "chunk_index": index,
+                    "chunk_count": len(chunks),
+                    "chunk_start": chunk.start,
+                    "chunk_end": chunk.end,
+                    "has_extent": extent is not None,
+                }
+                if extent is not None:
+                    metadata.update(zip(EXTENT_KEYS, extent))
+                doc = Document(
+                    id=document_id(dataset["identifier"], key, index),
+                    content=content,
+                    meta=metadata,
+                )
+                documents.append(doc)
+        return documents
+
+    def iter_batches(
+        self,
+        sources: List[Union[str, Path, ByteStream]],
+        metadata_fields: Optional[List[str]] = None,
+        batch_size: Optional[int] = None,
+        failed_sources: Optional[List[Union[str, Path, ByteStream]]] = None,
+    ) -> Iterator[List[Document]]:
+        """
+        Streaming alternative to `run`. The results array of each source is parsed incrementally and documents are
+        yielded in batches of `batch_size`, so memory use is bounded by the batch size rather than the size of the
+        API response. File paths are read from disk in chunks rather than loaded whole. Sources that cannot be read or
+        parsed are appended to `failed_sources` if given, as with `convert`.
+        """
+        batch_size = batch_size or self.batch_size
+        batch = []
+        for source in sources:
+            try:
+                fp = (
+                    open(source, "rb")
+                    if isinstance(source, (str, Path))
+                    else io.BytesIO(source.data)
+                )
+            except Exception as e:
+                logger.warning(
+                    "Could not read {source}. Skipping. Error: {error}",
+                    source=source,
+                    error=e,
+                )
+                if failed_sources is not None:
+                    failed_sources.append(source)
+                continue
+
+            with fp:
+                try:
+                    for dataset in iter_json_array(fp, "results"):
+                        batch.extend(
+                            self.dataset_documents(dataset, metadata_fields)
+                        )
+                        if len(batch) >= batch_size:
+                            yield batch[:batch_size]
+                            batch = batch[batch_size:]
+                except Exception as conversion_e:
+                    logger.warning(
+                        "Failed to extract document(s) from {source}. Skipping. Error: {error}",
+                        source=source,
+                        error=conversion_e,
+                    )
+                    if failed_sources is not None:
+                        failed_sources.append(source)
+        while batch:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+
     @component.output_types(documents=List[Document])
     def run(
         self,
         sources: List[Union[ByteStream]],
         metadata_fields: Optional[List[str]] = None,
     ):
+        return {"documents": self.convert(sources, metadata_fields)}
+
+    def convert(
+        self,
+        sources: List[Union[ByteStream]],
+        metadata_fields: Optional[List[str]] = None,
+        failed_sources: Optional[List[Union[ByteStream]]] = None,
+    ) -> List[Document]:
+        """
+        Converts sources to documents like `run`. Sources that cannot be read or parsed are logged and skipped, and
+        appended to `failed_sources` if given, so that callers can tell a complete conversion from a partial one.
+        """
         documents = []
         for source in sources:
             try:
@@ -33,23 +247,17 @@ class EIDCJSONToDocument:
                     source=source,
                     error=e,
                 )
+                if failed_sources is not None:
+                    failed_sources.append(source)
+                continue
 
             try:
                 api_response = json.loads(bytestream.data.decode("utf-8"))
 
                 for dataset in api_response["results"]:
-                    keys = metadata_fields if metadata_fields else dataset
-                    for key in keys:
-                        metadata = {
-                            "dataset_id": dataset["identifier"],
-                            "dataset_title": dataset["title"],
-                            "eidc_metadata_key": key,
-                        }
-                        doc = Document(
-                            content=f"The dataset entitled \"{dataset['title']}\" contains the following information in it's \"{key}\" metadata field: {str(dataset[key])}",
-                            meta=metadata,
-                        )
-                        documents.append(doc)
+                    documents.extend(
+                        self.dataset_documents(dataset, metadata_fields)
+                    )
 
             except Exception as conversion_e:
                 logger.warning(
@@ -57,5 +265,7 @@ class EIDCJSONToDocument:
                     source=source,
                     error=conversion_e,
                 )
+                if failed_sources is not None:
+                    failed_sources.append(source)
 
-        return {"documents": documents}
+        return documents
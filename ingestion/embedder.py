@@ -0,0 +1,221 @@
+from concurrent.futures import ThreadPoolExecutor
+from haystack import component, default_to_dict, Document, logging
+from haystack_integrations.document_stores.chroma.utils import (
+    get_embedding_function,
+)
+from ingestion.converter import content_hash
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import json
+import numpy as np
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Embedding functions shared by every embedder and document store in the
+# process, keyed by name and parameters.
+_embedding_functions: Dict[str, Callable] = {}
+_embedding_functions_lock = threading.Lock()
+
+
+def embedding_function_key(name: str, **params) -> str:
+    return f"{name}:{json.dumps(params, sort_keys=True)}"
+
+
+def shared_embedding_function(name: str = "default", **params) -> Callable:
+    """
+    Returns the Chroma embedding function with the given name and parameters,
+    creating it only the first time it is asked for in the process, so that
+    its model is loaded once however many embedders and document stores use
+    it.
+    """
+    key = embedding_function_key(name, **params)
+    with _embedding_functions_lock:
+        if key not in _embedding_functions:
+            _embedding_functions[key] = get_embedding_function(name, **params)
+        return _embedding_functions[key]
+
+
+class EmbeddingCache:
+    """
+    Persistent on-disk cache of embeddings keyed by model name and content
+    hash, backed by sqlite so it can be shared between processes and
+    collections.
+    """
+
+    QUERY_CHUNK = 500
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False
+        )
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT, hash TEXT, embedding BLOB, "
+                "PRIMARY KEY (model, hash))"
+            )
+
+    def get_many(
+        self, model: str, hashes: Iterable[str]
+    ) -> Dict[str, List[float]]:
+        """
+        Returns the cached embeddings for the given hashes, keyed by hash.
+        """
+        hashes = list(hashes)
+        found = {}
+        with self.lock:
+            for i in range(0, len(hashes), self.QUERY_CHUNK):
+                chunk = hashes[i : i + self.QUERY_CHUNK]
+                rows = self.connection.execute(
+                    "SELECT hash, embedding FROM embeddings WHERE model = ? "
+                    f"AND hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk],
+                )
+                for doc_hash, blob in rows:
+                    found[doc_hash] = np.frombuffer(
+                        blob, dtype=np.float32
+                    ).tolist()
+        return found
+
+    def put_many(self, model: str, embeddings: Dict[str, List[float]]) -> None:
+        """
+        Stores embeddings keyed by content hash.
+        """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [
+                    (
+                        model,
+                        doc_hash,
+                        np.asarray(embedding, dtype=np.float32).tobytes(),
+                    )
+                    for doc_hash, embedding in embeddings.items()
+                ],
+            )
+
+
+@component
+class CachedDocumentEmbedder:
+    """
+    Embeds documents in batches using a Chroma embedding function, reusing
+    embeddings from a persistent cache wherever the same text has already
+    been embedded with the same model.
+
+    The embedding function should match the one configured on the document
+    store, so that queries are embedded with the same model as the documents.
+    Cache misses are split into batches of `batch_size` and embedded over a
+    pool of `workers` threads. Cache hit rates and throughput are logged
+    after each run and accumulated in `stats`.
+    """
+
+    def __init__(
+        self,
+        embedding_function: str = "default",
+        batch_size: int = 64,
+        workers: int = 2,
+        cache_path: Optional[str] = "embedding-cache/embeddings.sqlite",
+        **embedding_function_params,
+    ):
+        """
+        :param embedding_function: Name of the Chroma embedding function.
+        :param batch_size: Number of documents embedded in each model call.
+        :param workers: Number of batches embedded concurrently.
+        :param cache_path: Path to the sqlite cache, or None to disable
+            caching.
+        :param embedding_function_params: Additional parameters passed to the
+            embedding function.
+        """
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.workers = workers
+        self.cache_path = cache_path
+        self.embedding_function_params = embedding_function_params
+        self.model = embedding_function_key(
+            embedding_function, **embedding_function_params
+        )
+        self.stats = {"documents": 0, "cache_hits": 0, "seconds": 0.0}
+        self._function = None
+        self._cache = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            embedding_function=self.embedding_function,
+            batch_size=self.batch_size,
+            workers=self.workers,
+            cache_path=self.cache_path,
+            **self.embedding_function_params,
+        )
+
+    def warm_up(self):
+        """
+        Loads the embedding function, shared with other embedders and the
+        document stores of the process, and opens the cache.
+        """
+        if self._function is None:
+            self._function = shared_embedding_function(
+                self.embedding_function, **self.embedding_function_params
+            )
+        if self._cache is None and self.cache_path:
+            self._cache = EmbeddingCache(self.cache_path)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds texts in batches over the worker pool.
+        """
+        batches = [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(self._function, batches)
+        return [
+            np.asarray(embedding, dtype=np.float32).tolist()
+            for batch in results
+            for embedding in batch
+        ]
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        self.warm_up()
+        start = time.perf_counter()
+
+        hashes = [content_hash(doc.content) for doc in documents]
+        cached = (
+            self._cache.get_many(self.model, set(hashes))
+            if self._cache
+            else {}
+        )
+        missing = list(dict.fromkeys(h for h in hashes if h not in cached))
+        if missing:
+            texts = {h: doc.content for h, doc in zip(hashes, documents)}
+            embedded = dict(
+                zip(missing, self.embed([texts[h] for h in missing]))
+            )
+            if self._cache:
+                self._cache.put_many(self.model, embedded)
+            cached.update(embedded)
+
+        for doc, doc_hash in zip(documents, hashes):
+            doc.embedding = cached[doc_hash]
+
+        elapsed = time.perf_counter() - start
+        hits = len(documents) - len(missing)
+        self.stats["documents"] += len(documents)
+        self.stats["cache_hits"] += hits
+        self.stats["seconds"] += elapsed
+        logger.info(
+            "Embedded {total} documents in {elapsed:.2f}s ({rate:.1f} docs/s), cache hit rate {hit_rate:.1%}.",
+            total=len(documents),
+            elapsed=elapsed,
+            rate=len(documents) / elapsed if elapsed else 0.0,
+            hit_rate=hits / len(documents) if documents else 0.0,
+        )
+        return {"documents": documents}
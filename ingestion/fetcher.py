@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from haystack import component, logging
+from haystack.dataclasses import ByteStream
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import json
+import math
+import requests
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@component
+class EIDCPagedFetcher:
+    """
+    Fetches the full result set of an EIDC catalogue search by paging through
+    the API.
+
+    The first page is requested to discover the total number of results, the
+    remaining pages are then requested concurrently over a bounded thread
+    pool. Failed requests are retried with an exponential backoff. Pages are
+    yielded as they arrive by `iter_pages`, so they can be converted while the
+    rest of the catalogue is still downloading.
+    """
+
+    def __init__(
+        self,
+        rows: int = 500,
+        max_workers: int = 4,
+        retry_attempts: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 30,
+        total_field: str = "numFound",
+        user_agent: str = "embeddings_app/EIDCPagedFetcher",
+    ):
+        """
+        :param rows: Number of results to request per page.
+        :param max_workers: Maximum number of concurrent page requests.
+        :param retry_attempts: Number of retries after a failed request.
+        :param backoff: Base delay in seconds, doubled after every retry.
+        :param timeout: Timeout in seconds for a single page request.
+        :param total_field: Field of the API response holding the total number
+            of results.
+        :param user_agent: User agent sent with each request.
+        """
+        self.rows = rows
+        self.max_workers = max_workers
+        self.retry_attempts = retry_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.total_field = total_field
+        self.user_agent = user_agent
+
+    def page_url(self, url: str, page: int) -> str:
+        """
+        Returns the url for a given page, overriding any paging parameters
+        already present in the url.
+        """
+        parts = urlsplit(url)
+        query = [
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key not in ("page", "rows")
+        ]
+        query.extend([("page", str(page)), ("rows", str(self.rows))])
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def fetch_page(self, url: str, page: int) -> ByteStream:
+        """
+        Fetches a single page, retrying with exponential backoff on failure.
+        """
+        page_url = self.page_url(url, page)
+        for attempt in range(self.retry_attempts + 1):
+            try:
+                response = requests.get(
+                    page_url,
+                    timeout=self.timeout,
+                    headers={"User-Agent": self.user_agent},
+                )
+                response.raise_for_status()
+                return ByteStream(
+                    data=response.content,
+                    meta={"url": page_url, "page": page},
+                    mime_type="application/json",
+                )
+            except requests.RequestException as e:
+                if attempt == self.retry_attempts:
+                    raise
+                delay = self.backoff * 2**attempt
+                logger.warning(
+                    "Failed to fetch {url} ({error}), retrying in {delay}s.",
+                    url=page_url,
+                    error=e,
+                    delay=delay,
+                )
+                time.sleep(delay)
+
+    def page_count(self, first_page: ByteStream) -> Optional[int]:
+        """
+        Calculates the number of pages from the total in the first page, or
+        None if the response does not report a total.
+        """
+        total = json.loads(first_page.data).get(self.total_field)
+        if total is None:
+            return None
+        return max(1, math.ceil(int(total) / self.rows))
+
+    def iter_pages(self, url: str) -> Iterator[ByteStream]:
+        """
+        Yields every page of the search results in the order they arrive.
+        """
+        first_page = self.fetch_page(url, 1)
+        yield first_page
+
+        pages = self.page_count(first_page)
+        if pages is None:
+            # No total available, so page sequentially until a short page.
+            logger.warning(
+                "No {field} in response from {url}, paging sequentially.",
+                field=self.total_field,
+                url=url,
+            )
+            page, stream = 1, first_page
+            while len(json.loads(stream.data).get("results", [])) >= self.rows:
+                page += 1
+                stream = self.fetch_page(url, page)
+                yield stream
+            return
+
+        logger.info(
+            "Fetching {pages} pages of {rows} rows from {url}",
+            pages=pages,
+            rows=self.rows,
+            url=url,
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self.fetch_page, url, page)
+                for page in range(2, pages + 1)
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    @component.output_types(streams=List[ByteStream])
+    def run(self, urls: List[str]) -> Dict[str, List[ByteStream]]:
+        """
+        Fetches every page of results for each of the given urls.
+        """
+        streams = []
+        for url in urls:
+            streams.extend(self.iter_pages(url))
+        return {"streams": streams}
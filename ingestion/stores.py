@@ -0,0 +1,137 @@
+"""
+Access to the Chroma database shared by the apps, pipelines and ingestion.
+
+Every client and document store in a process comes from this module, which
+creates one Chroma client per database and one document store per
+collection and embedding function, shared by every thread. Chroma's clients
+are thread-safe, and sharing them means the database is opened, and its
+indexes loaded into memory, once per process rather than once per pipeline
+or session.
+
+By default clients open the database files at `vector-db.path`. If
+`vector-db.host` is set in the config, processes instead connect to a Chroma
+server (`chroma run --path chroma-data`), so that several API workers and
+Streamlit processes share the one copy of the database the server holds in
+memory.
+"""
+
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+import chromadb
+from chromadb.api import ClientAPI
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+from ingestion.embedder import shared_embedding_function
+
+_server: Optional[Tuple[str, int]] = None
+_clients: Dict[Union[str, Tuple[str, int], None], ClientAPI] = {}
+_document_stores: Dict[str, "SharedChromaDocumentStore"] = {}
+_lock = threading.RLock()
+
+
+def configure(config: Dict[str, Any]) -> None:
+    """
+    Sets whether the process connects to a Chroma server, from the `host`
+    and `port` of the `vector-db` section of the config. Clients and stores
+    already created are discarded if the setting changes, so the apps can
+    call this on every Streamlit rerun.
+    """
+    global _server
+    settings = config.get("vector-db", {})
+    host = settings.get("host")
+    server = (host, int(settings.get("port", 8000))) if host else None
+    with _lock:
+        if server != _server:
+            _server = server
+            _clients.clear()
+            _document_stores.clear()
+
+
+def get_client(path: Optional[str] = None) -> ClientAPI:
+    """
+    Returns the process's client of the Chroma server if one is configured,
+    or else of the database at `path`, or of an in-memory database if `path`
+    is None, creating it the first time it is asked for.
+    """
+    key = _server if _server and path is not None else path
+    with _lock:
+        if key not in _clients:
+            if key is None:
+                _clients[key] = chromadb.EphemeralClient()
+            elif _server and path is not None:
+                host, port = _server
+                _clients[key] = chromadb.HttpClient(host=host, port=port)
+            else:
+                _clients[key] = chromadb.PersistentClient(path=path)
+        return _clients[key]
+
+
+class SharedChromaDocumentStore(ChromaDocumentStore):
+    """
+    `ChromaDocumentStore` whose client is the shared one from `get_client`
+    and whose embedding function is shared with the other document stores
+    and embedders of the process. Create instances with `get_document_store`
+    rather than directly, so that they are shared too.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "documents",
+        embedding_function: str = "default",
+        persist_path: Optional[str] = None,
+        **embedding_function_params,
+    ):
+        # The public constructor sets up the store, but opens a client of its
+        # own for a persist_path, so it is given none, which opens the
+        # in-memory database, and only the client and collection are swapped
+        # for the shared ones.
+        ChromaDocumentStore.__init__(
+            self,
+            collection_name=collection_name,
+            embedding_function=embedding_function,
+            persist_path=None,
+            **embedding_function_params,
+        )
+        self._persist_path = persist_path
+        self._chroma_client = get_client(persist_path)
+        self._collection = self._chroma_client.get_or_create_collection(
+            name=collection_name,
+            embedding_function=shared_embedding_function(
+                embedding_function, **embedding_function_params
+            ),
+        )
+
+
+def get_document_store(
+    collection_name: str = "documents",
+    embedding_function: str = "default",
+    persist_path: Optional[str] = None,
+    **embedding_function_params,
+) -> SharedChromaDocumentStore:
+    """
+    Returns the process's document store for a collection and embedding
+    function, creating it the first time it is asked for.
+    """
+    init_parameters = {
+        "collection_name": collection_name,
+        "embedding_function": embedding_function,
+        "persist_path": persist_path,
+        **embedding_function_params,
+    }
+    key = json.dumps(init_parameters, sort_keys=True)
+    with _lock:
+        if key not in _document_stores:
+            _document_stores[key] = SharedChromaDocumentStore(
+                **init_parameters
+            )
+        return _document_stores[key]
+
+
+def document_store_from_dict(data: Dict[str, Any]) -> ChromaDocumentStore:
+    """
+    Returns the shared document store for a serialised Chroma document store,
+    for the `from_dict` of components with a document store.
+    """
+    return get_document_store(**data["init_parameters"])
@@ -0,0 +1,121 @@
+from typing import Any, BinaryIO, Iterator
+import codecs
+import json
+
+WHITESPACE = " \t\n\r"
+
+
+class JSONArrayStream:
+    """
+    Incrementally parses a JSON object from a binary file-like object,
+    yielding the items of one of its top level arrays without loading the
+    whole document into memory.
+
+    Only the current item and a small read buffer are held in memory, so the
+    memory used is bounded by the size of the largest item rather than the
+    size of the document.
+    """
+
+    def __init__(self, fp: BinaryIO, chunk_size: int = 65536):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def _fill(self) -> bool:
+        """
+        Reads the next chunk into the buffer, returning False at end of file.
+        """
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        self.eof = not chunk
+        text = self.text_decoder.decode(chunk, final=self.eof)
+        if self.pos > self.chunk_size:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        self.buffer += text
+        return not self.eof or bool(text)
+
+    def _peek(self) -> str:
+        """
+        Returns the next non-whitespace character without consuming it.
+        """
+        while True:
+            while (
+                self.pos < len(self.buffer)
+                and self.buffer[self.pos] in WHITESPACE
+            ):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        """
+        Consumes the next non-whitespace character, which must be one of
+        chars.
+        """
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f"Expected one of {chars!r} at offset {self.pos}, got {char!r}"
+            )
+        self.pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """
+        Decodes the next JSON value, reading more data until it is complete.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may be truncated.
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_items(self, key: str) -> Iterator[Any]:
+        """
+        Yields each item of the array stored under key in the top level
+        object. Other top level values are parsed and discarded.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            name = self._value()
+            self._expect(":")
+            if name == key:
+                self._expect("[")
+                if self._peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def iter_json_array(
+    fp: BinaryIO, key: str, chunk_size: int = 65536
+) -> Iterator[Any]:
+    """
+    Yields the items of the top level array `key` of the JSON object in fp.
+    """
+    return JSONArrayStream(fp, chunk_size).iter_items(key)
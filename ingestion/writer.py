@@ -0,0 +1,255 @@
+from haystack import (
+    component,
+    default_from_dict,
+    default_to_dict,
+    Document,
+    logging,
+)
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+from ingestion.bm25 import BM25Index
+from ingestion.stores import document_store_from_dict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def stored_hashes(
+    document_store: ChromaDocumentStore, ids: Optional[List[str]] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Returns the content hash of the documents in a collection, or of those
+    with the given ids, keyed by document id.
+    """
+    if ids is not None and not ids:
+        return {}
+    result = document_store._collection.get(ids=ids, include=["metadatas"])
+    return {
+        doc_id: (meta or {}).get("content_hash")
+        for doc_id, meta in zip(result["ids"], result["metadatas"])
+    }
+
+
+@component
+class ChangedDocumentFilter:
+    """
+    Splits documents into those that are new or changed compared with the
+    content hashes stored in a Chroma collection and those that are
+    unchanged.
+
+    Placed ahead of the embedder, only new or changed documents are embedded.
+    The unchanged documents are passed straight to the
+    `IncrementalDocumentWriter`'s `unchanged` input, so that they are not
+    deleted as missing from the catalogue.
+    """
+
+    def __init__(self, document_store: ChromaDocumentStore):
+        """
+        :param document_store: The Chroma document store written to.
+        """
+        self.document_store = document_store
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self, document_store=self.document_store.to_dict()
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChangedDocumentFilter":
+        init_params = data["init_parameters"]
+        init_params["document_store"] = document_store_from_dict(
+            init_params["document_store"]
+        )
+        return default_from_dict(cls, data)
+
+    @component.output_types(documents=List[Document], unchanged=List[Document])
+    def run(self, documents: List[Document]):
+        """
+        :param documents: The converted documents.
+        :returns: A dictionary with the following keys:
+            - `documents`: The new or changed documents.
+            - `unchanged`: The documents already stored with the same content
+              hash.
+        """
+        existing = stored_hashes(
+            self.document_store, list({doc.id: None for doc in documents})
+        )
+        changed, unchanged = [], []
+        for doc in documents:
+            doc_hash = doc.meta.get("content_hash")
+            if doc_hash is not None and existing.get(doc.id) == doc_hash:
+                unchanged.append(doc)
+            else:
+                changed.append(doc)
+        logger.info(
+            "{changed} of {total} documents new or changed.",
+            changed=len(changed),
+            total=len(documents),
+        )
+        return {"documents": changed, "unchanged": unchanged}
+
+
+@component
+class IncrementalDocumentWriter:
+    """
+    Writes only new or changed documents to a Chroma document store.
+
+    Documents are compared by id against the content hash stored in the
+    metadata of the documents already in the collection. Unchanged documents
+    are skipped and new or changed documents are upserted. So that unchanged
+    documents are not embedded again either, a `ChangedDocumentFilter` ahead
+    of the embedder passes them to the `unchanged` input instead, which only
+    records that they are still in the catalogue. Once a full indexing run has been written,
+    `delete_missing_documents` removes documents that were not seen during the
+    run, e.g. datasets that have been withdrawn from the catalogue.
+
+    If a BM25 index path is given, the documents are also written to a
+    `BM25Index` for keyword search, which is compared against its own content
+    hashes so that an index added to an existing collection is filled in.
+    """
+
+    def __init__(
+        self,
+        document_store: ChromaDocumentStore,
+        delete_missing: bool = True,
+        bm25_index: Optional[str] = None,
+    ):
+        """
+        :param document_store: The Chroma document store to write to.
+        :param delete_missing: Whether documents not seen during an indexing
+            run should be deleted once the run is complete.
+        :param bm25_index: Path to a BM25 index to keep in step with the
+            collection, or None.
+        """
+        self.document_store = document_store
+        self.delete_missing = delete_missing
+        self.bm25_index = bm25_index
+        self._bm25 = BM25Index(bm25_index) if bm25_index else None
+        self._existing = None
+        self._bm25_existing = None
+        self._seen = set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            document_store=self.document_store.to_dict(),
+            delete_missing=self.delete_missing,
+            bm25_index=self.bm25_index,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IncrementalDocumentWriter":
+        init_params = data["init_parameters"]
+        init_params["document_store"] = document_store_from_dict(
+            init_params["document_store"]
+        )
+        return default_from_dict(cls, data)
+
+    def existing_hashes(self) -> Dict[str, Optional[str]]:
+        """
+        Returns the content hash of every document already in the collection,
+        keyed by document id.
+        """
+        if self._existing is None:
+            self._existing = stored_hashes(self.document_store)
+        return self._existing
+
+    @component.output_types(documents_written=int)
+    def run(
+        self,
+        documents: List[Document],
+        unchanged: Optional[List[Document]] = None,
+    ):
+        """
+        :param documents: The documents to write.
+        :param unchanged: Documents known to be stored already, e.g. by a
+            `ChangedDocumentFilter`, which are only written to the BM25 index
+            if it is missing them.
+        :returns: A dictionary with the following keys:
+            - `documents_written`: The number of documents upserted.
+        """
+        unchanged = unchanged or []
+        self._seen.update(doc.id for doc in unchanged)
+        existing = self.existing_hashes()
+        changed = {}
+        for doc in documents:
+            self._seen.add(doc.id)
+            doc_hash = doc.meta.get("content_hash")
+            if doc_hash is None or existing.get(doc.id) != doc_hash:
+                changed[doc.id] = doc
+
+        if changed:
+            docs = list(changed.values())
+            data = {
+                "ids": [doc.id for doc in docs],
+                "documents": [doc.content for doc in docs],
+                "metadatas": [doc.meta for doc in docs],
+            }
+            if all(doc.embedding is not None for doc in docs):
+                data["embeddings"] = [doc.embedding for doc in docs]
+            self.document_store._collection.upsert(**data)
+            for doc in docs:
+                existing[doc.id] = doc.meta.get("content_hash")
+
+        if self._bm25 is not None:
+            self.write_bm25([*documents, *unchanged])
+
+        total = len(documents) + len(unchanged)
+        logger.info(
+            "Wrote {written} of {total} documents, {skipped} unchanged.",
+            written=len(changed),
+            total=total,
+            skipped=total - len(changed),
+        )
+        return {"documents_written": len(changed)}
+
+    def write_bm25(self, documents: List[Document]) -> None:
+        """
+        Writes new or changed documents to the BM25 index.
+        """
+        if self._bm25_existing is None:
+            self._bm25_existing = self._bm25.hashes()
+        existing = self._bm25_existing
+        changed = {
+            doc.id: doc
+            for doc in documents
+            if doc.meta.get("content_hash") is None
+            or existing.get(doc.id) != doc.meta["content_hash"]
+        }
+        if changed:
+            self._bm25.write(changed.values())
+            for doc in changed.values():
+                existing[doc.id] = doc.meta.get("content_hash")
+
+    def delete_missing_documents(self) -> int:
+        """
+        Deletes documents from the collection that were not written during
+        this indexing run and resets the writer for the next run. Returns the
+        number of documents deleted.
+        """
+        missing = []
+        if self.delete_missing and self._existing is not None:
+            missing = [
+                doc_id for doc_id in self._existing if doc_id not in self._seen
+            ]
+            if missing:
+                self.document_store.delete_documents(missing)
+            if self._bm25 is not None:
+                existing = self._bm25_existing or self._bm25.hashes()
+                self._bm25.delete(
+                    doc_id for doc_id in existing if doc_id not in self._seen
+                )
+            logger.info(
+                "Deleted {deleted} documents no longer in the catalogue.",
+                deleted=len(missing),
+            )
+        self.reset()
+        return len(missing)
+
+    def reset(self) -> None:
+        """
+        Resets the writer for the next indexing run without deleting
+        anything, e.g. when a run could not read the whole catalogue.
+        """
+        self._existing = None
+        self._bm25_existing = None
+        self._seen = set()
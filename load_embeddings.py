@@ -1,30 +1,216 @@
 #!/usr/bin/env python
-from rag.wrappers import IndexPipelineWrapper
+"""
+Ingests the EIDC catalogue into one or more Chroma collections.
+
+The catalogue is fetched once and saved to a temporary directory, then each
+collection is converted, embedded and written on its own thread. The threads
+share the process's Chroma client, as several clients opening the same
+database files would overwrite each other's writes. Collections
+are read from `ingestion.collections` in the config file, or can be given on
+the command line as NAME or NAME:FIELD,FIELD (all fields if none are given).
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rag.wrappers import DEFAULT_URL, IndexPipelineWrapper
+from ingestion import stores
+from ingestion.converter import content_hash
+from visualisation.projection import ProjectionStore
+from typing import Dict, List, Optional
+import argparse
 import logging
+import os
+import tempfile
+import time
 import yaml
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-if __name__ == "__main__":
-    with open("config.yml", "r") as config_file:
-        config = yaml.safe_load(config_file)
 
-    pipeline_file = (
-        f"{config['pipelines-dir']}/{config['ingestion']['pipeline']}"
-    )
-    chroma_path = config["vector-db"]["path"]
-    collection = config["vector-db"]["collection"]
-    metadata_fields = config["ingestion"]["metadata"]
+def collection_specs(
+    config: Dict, collections: Optional[List[str]]
+) -> List[Dict]:
+    """
+    Builds the collections to index from the command line, falling back to
+    `ingestion.collections` and then the single collection in the config.
+    """
+    if collections:
+        specs = []
+        for spec in collections:
+            name, _, fields = spec.partition(":")
+            specs.append(
+                {
+                    "collection": name,
+                    "metadata": fields.split(",") if fields else None,
+                }
+            )
+    else:
+        specs = config["ingestion"].get("collections") or [
+            {
+                "collection": config["vector-db"]["collection"],
+                "metadata": config["ingestion"]["metadata"],
+            }
+        ]
+    return [
+        {"pipeline": config["ingestion"]["pipeline"], **spec} for spec in specs
+    ]
 
-    logger.info(f"Loading indexing pipeline {pipeline_file}")
-    index_pipe = IndexPipelineWrapper(
-        pipeline_file,
-        chroma_path=chroma_path,
-        collection=collection,
+
+def make_wrapper(config: Dict, spec: Dict) -> IndexPipelineWrapper:
+    return IndexPipelineWrapper(
+        f"{config['pipelines-dir']}/{spec['pipeline']}",
+        chroma_path=config["vector-db"]["path"],
+        collection=spec["collection"],
     )
 
-    logger.info(
-        f'Retrieving data and indexing... [chroma_path="{chroma_path}", collection="{collection}", metadata_field={metadata_fields}]'
+
+def fetch_catalogue(
+    wrapper: IndexPipelineWrapper, url: str, directory: str
+) -> List[str]:
+    """
+    Fetches every page of the catalogue once, saving each page to directory.
+    """
+    fetcher = wrapper.load_component("fetcher")
+    paths = []
+    for page in fetcher.iter_pages(url):
+        path = os.path.join(directory, f"page-{page.meta['page']}.json")
+        with open(path, "wb") as f:
+            f.write(page.data)
+        paths.append(path)
+    return sorted(paths)
+
+
+def index_collection(config: Dict, spec: Dict, sources: List[str]) -> int:
+    """
+    Indexes the saved catalogue pages into a single collection.
+    """
+    wrapper = make_wrapper(config, spec)
+    return wrapper.index_sources(sources, metadata_fields=spec["metadata"])
+
+
+def dry_run(config: Dict, spec: Dict, sources: List[str], sample: int) -> Dict:
+    """
+    Converts the catalogue for a collection without writing anything and
+    estimates the embedding time from the documents missing from the
+    embedding cache and the rate measured on a small sample of them.
+    """
+    wrapper = make_wrapper(config, spec)
+    converter = wrapper.load_component("converter")
+    try:
+        embedder = wrapper.load_component("embedder")
+        embedder.warm_up()
+    except KeyError:
+        embedder = None
+
+    documents, uncached, sample_texts = 0, 0, []
+    for batch in converter.iter_batches(sources, spec["metadata"]):
+        documents += len(batch)
+        hashes = {content_hash(doc.content): doc.content for doc in batch}
+        if embedder is not None and embedder._cache is not None:
+            cached = embedder._cache.get_many(embedder.model, hashes)
+            hashes = {h: t for h, t in hashes.items() if h not in cached}
+        uncached += len(hashes)
+        sample_texts.extend(
+            list(hashes.values())[: sample - len(sample_texts)]
+        )
+
+    estimate = None
+    if embedder is not None:
+        estimate = 0.0
+        if sample_texts:
+            start = time.perf_counter()
+            embedder.embed(sample_texts)
+            rate = len(sample_texts) / (time.perf_counter() - start)
+            estimate = uncached / rate
+    return {
+        "collection": spec["collection"],
+        "documents": documents,
+        "uncached": uncached,
+        "estimate": estimate,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
     )
-    index_pipe.index(metadata_fields=metadata_fields)
+    parser.add_argument("--config", default="config.yml")
+    parser.add_argument(
+        "--collection",
+        action="append",
+        metavar="NAME[:FIELD,...]",
+        help="collection to index, may be repeated",
+    )
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of collections indexed in parallel (default: all)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="report document counts and estimated embedding time only",
+    )
+    parser.add_argument(
+        "--skip-projection",
+        action="store_true",
+        help="don't update the visualisation projection after indexing",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=32,
+        help="documents embedded to estimate the embedding rate",
+    )
+    args = parser.parse_args()
+
+    with open(args.config, "r") as config_file:
+        config = yaml.safe_load(config_file)
+    stores.configure(config)
+    specs = collection_specs(config, args.collection)
+
+    with tempfile.TemporaryDirectory() as directory:
+        logger.info(f"Fetching catalogue from {args.url}")
+        sources = fetch_catalogue(
+            make_wrapper(config, specs[0]), args.url, directory
+        )
+
+        if args.dry_run:
+            for spec in specs:
+                result = dry_run(config, spec, sources, args.sample)
+                estimate = result["estimate"]
+                logger.info(
+                    f'[collection="{result["collection"]}"] '
+                    f"{result['documents']} documents, "
+                    f"{result['uncached']} to embed, estimated embedding time "
+                    + (f"{estimate:.0f}s" if estimate is not None else "n/a")
+                )
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=args.workers or len(specs)
+        ) as executor:
+            futures = {
+                executor.submit(index_collection, config, spec, sources): spec
+                for spec in specs
+            }
+            for future in as_completed(futures):
+                spec = futures[future]
+                logger.info(
+                    f'Indexed {future.result()} documents [chroma_path="{config["vector-db"]["path"]}", collection="{spec["collection"]}", metadata_fields={spec["metadata"]}]'
+                )
+
+    collection = config["vector-db"]["collection"]
+    if not args.skip_projection and any(
+        spec["collection"] == collection for spec in specs
+    ):
+        client = stores.get_client(config["vector-db"]["path"])
+        ProjectionStore.from_config(config).get(
+            client.get_collection(collection)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+Builds the bundled gazetteer, map/uk_gazetteer.json, from OpenStreetMap
+boundaries looked up with Nominatim.
+
+Each place in map/gazetteer_places.json is searched for in the UK with its
+boundary, which is simplified and stored with the place's centre and
+bounding box. A name matching settlements or areas in more than one part of
+the UK is stored once for each, qualified by the county or nation, and a
+name whose best match is outside the UK is marked ambiguous. The gazetteer
+leaves ambiguous names to the fallback geocoder rather than guessing.
+
+    python -m map.build_gazetteer
+
+Requests are limited to one per second, as required by the Nominatim usage
+policy, so building the whole gazetteer takes a few minutes.
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from map.geocoding import GAZETTEER_PATH, TokenBucket, normalise_name
+from map.geometry import simplify
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SOURCES_PATH = Path(__file__).parent / "gazetteer_places.json"
+
+# Nominatim result classes that are places or administrative areas, rather
+# than e.g. roads or buildings that share a place's name.
+PLACE_CLASSES = {"boundary", "place", "leisure", "natural"}
+
+# Another match is a different place with the same name if it is at least
+# this fraction as important as the best match and doesn't overlap it.
+AMBIGUITY_RATIO = 0.5
+
+# Boundaries are simplified to this fraction of their bounding box size.
+SIMPLIFY_FRACTION = 0.005
+
+# Address fields tried in turn to qualify the names of ambiguous places.
+QUALIFIER_FIELDS = ["county", "state_district", "state"]
+
+
+def result_bbox(result: Dict[str, Any]) -> List[float]:
+    south, north, west, east = map(float, result["boundingbox"])
+    return [west, south, east, north]
+
+
+def overlaps(a: List[float], b: List[float]) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def matches(result: Dict[str, Any], name: str) -> bool:
+    """
+    Returns whether a Nominatim result is a place called name, in any of its
+    names or its display name.
+    """
+    names = [
+        result["display_name"].split(",")[0],
+        *(result.get("namedetails") or {}).values(),
+    ]
+    return result.get("class") in PLACE_CLASSES and normalise_name(name) in {
+        normalise_name(other) for other in names
+    }
+
+
+def distinct_places(
+    results: List[Dict[str, Any]], name: str
+) -> List[Dict[str, Any]]:
+    """
+    Returns the results that are places called name, most important first,
+    dropping results that overlap a more important one, such as the town
+    node within a town's boundary, and results much less important than the
+    best match.
+    """
+    candidates = sorted(
+        (result for result in results if matches(result, name)),
+        key=lambda result: result.get("importance", 0),
+        reverse=True,
+    )
+    if not candidates:
+        return []
+    threshold = AMBIGUITY_RATIO * candidates[0].get("importance", 0)
+    places = []
+    for result in candidates:
+        if result.get("importance", 0) < threshold:
+            break
+        if not any(
+            overlaps(result_bbox(result), result_bbox(place))
+            for place in places
+        ):
+            places.append(result)
+    return places
+
+
+def qualifier(result: Dict[str, Any], name: str) -> Optional[str]:
+    address = result.get("address", {})
+    for field in QUALIFIER_FIELDS:
+        value = address.get(field)
+        if value and normalise_name(value) != normalise_name(name):
+            return value
+    return None
+
+
+def gazetteer_entry(
+    result: Dict[str, Any], name: str, aliases: List[str]
+) -> Dict[str, Any]:
+    bbox = result_bbox(result)
+    tolerance = SIMPLIFY_FRACTION * max(bbox[2] - bbox[0], bbox[3] - bbox[1])
+    return {
+        "name": name,
+        "aliases": aliases,
+        "latitude": float(result["lat"]),
+        "longitude": float(result["lon"]),
+        "bbox": bbox,
+        "geometry": simplify(result["geojson"], tolerance),
+        "source": f"OpenStreetMap {result['osm_type']} {result['osm_id']}",
+    }
+
+
+class GazetteerBuilder:
+    """
+    Looks up the places of the gazetteer with Nominatim.
+    """
+
+    def __init__(self, user_agent: str = "ceh_sample_app") -> None:
+        from geopy.geocoders import Nominatim
+
+        self.geocode = Nominatim(user_agent=user_agent, timeout=30).geocode
+        self.rate_limit = TokenBucket(rate=1.0, capacity=1.0)
+
+    def search(self, query: str, **params) -> List[Dict[str, Any]]:
+        self.rate_limit.acquire()
+        locations = self.geocode(
+            query,
+            exactly_one=False,
+            limit=10,
+            addressdetails=True,
+            namedetails=True,
+            **params,
+        )
+        return [location.raw for location in locations or []]
+
+    def entries(self, source: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Returns the gazetteer entries for a place in the sources file: one
+        entry, or one for each place of that name in the UK.
+        """
+        name = source["name"]
+        aliases = source.get("aliases", [])
+        query = source.get("query", name)
+        places = distinct_places(
+            self.search(query, country_codes="gb", geometry="geojson"), name
+        )
+        if not places:
+            logger.warning(f'No boundary found for "{name}", skipping it.')
+            return []
+        if len(places) > 1:
+            logger.info(f'"{name}" names {len(places)} places in the UK.')
+            return [
+                {
+                    **gazetteer_entry(
+                        place,
+                        f"{name}, {qualifier(place, name)}",
+                        [name, *aliases],
+                    ),
+                    "ambiguous": [name, *aliases],
+                }
+                for place in places
+            ]
+        entry = gazetteer_entry(places[0], name, aliases)
+        best = distinct_places(self.search(query), name)
+        if best and best[0].get("address", {}).get("country_code") != "gb":
+            logger.info(
+                f'"{name}" is better known as {best[0]["display_name"]}.'
+            )
+            entry = {
+                **gazetteer_entry(
+                    places[0],
+                    f"{name}, {qualifier(places[0], name)}",
+                    [name, *aliases],
+                ),
+                "ambiguous": [name],
+            }
+        return [entry]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--sources", default=str(SOURCES_PATH))
+    parser.add_argument("--output", default=str(GAZETTEER_PATH))
+    parser.add_argument("--user-agent", default="ceh_sample_app")
+    args = parser.parse_args()
+
+    with open(args.sources, "r") as f:
+        sources = json.load(f)
+    builder = GazetteerBuilder(args.user_agent)
+    entries = []
+    for source in sources:
+        entries.extend(builder.entries(source))
+        logger.info(f'Looked up "{source["name"]}"')
+    # One place per line keeps diffs of the gazetteer readable.
+    with open(args.output, "w") as f:
+        f.write("[\n")
+        f.write(",\n".join(f"  {json.dumps(entry)}" for entry in entries))
+        f.write("\n]\n")
+    logger.info(f"Wrote {len(entries)} places to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Geocoding of place names for the map app.
+
+Place names are looked up in a bundled UK gazetteer first, then in a
+persistent cache shared by all app processes, and only then with a fallback
+geocoder such as Nominatim. Results from the fallback, including names it
+could not find, are cached with a time to live. Requests to the fallback are
+made concurrently, within a token bucket rate limit shared by every request
+in the process.
+"""
+
+import importlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from typing import Tuple
+
+from map.geometry import calc_geojson_bounds
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = Path(__file__).parent / "uk_gazetteer.json"
+
+Fallback = Callable[[str], Optional["Place"]]
+
+
+@dataclass
+class Place:
+    """
+    A geocoded place, with its GeoJSON geometry and optionally a bounding
+    box of [west, south, east, north] to fit the map to.
+    """
+
+    address: str
+    latitude: float
+    longitude: float
+    geojson: Dict[str, Any]
+    bbox: Optional[List[float]] = None
+
+    def bounds(self) -> List[List[float]]:
+        """
+        Returns the [[west, south], [east, north]] bounds of the place.
+        """
+        if self.bbox:
+            west, south, east, north = self.bbox
+            return [[west, south], [east, north]]
+        return calc_geojson_bounds(self.geojson)
+
+
+def normalise_name(name: str) -> str:
+    """
+    Returns the key place names are looked up by, ignoring case, punctuation
+    and a leading "the".
+    """
+    name = re.sub(r"[^\w\s]", "", name.casefold())
+    name = re.sub(r"\s+", " ", name).strip()
+    return re.sub(r"^the ", "", name)
+
+
+class Gazetteer:
+    """
+    Offline lookup of common UK place names, loaded from a JSON list of
+    places with a name, aliases, latitude, longitude and optionally a
+    bounding box and GeoJSON boundary, as built by `map.build_gazetteer`.
+
+    Names shared by more than one place, or listed as `ambiguous` by a place
+    because they also name a better known place elsewhere, are not resolved,
+    so that the fallback geocoder is asked rather than a place being picked
+    silently. The places can still be found by their qualified names, such
+    as "Newport, Wales".
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        :param path: Path to the gazetteer, or None for the bundled one.
+        """
+        with open(path or GAZETTEER_PATH, "r") as f:
+            entries = json.load(f)
+        candidates: Dict[str, List[Place]] = {}
+        ambiguous = set()
+        for entry in entries:
+            place = Place(
+                address=entry["name"],
+                latitude=entry["latitude"],
+                longitude=entry["longitude"],
+                geojson=entry.get("geometry")
+                or {
+                    "type": "Point",
+                    "coordinates": [entry["longitude"], entry["latitude"]],
+                },
+                bbox=entry.get("bbox"),
+            )
+            names = [entry["name"], *entry.get("aliases", [])]
+            for name in set(map(normalise_name, names)):
+                candidates.setdefault(name, []).append(place)
+            ambiguous.update(map(normalise_name, entry.get("ambiguous", [])))
+        self.places: Dict[str, Place] = {}
+        self.ambiguous: Dict[str, List[Place]] = {}
+        for name, places in candidates.items():
+            if len(places) > 1 or name in ambiguous:
+                self.ambiguous[name] = places
+            else:
+                self.places[name] = places[0]
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def locate(self, query: str) -> Optional[Place]:
+        name = normalise_name(query)
+        if name in self.ambiguous:
+            addresses = [place.address for place in self.ambiguous[name]]
+            logger.info(
+                f'"{query}" is ambiguous, could be {addresses} or elsewhere'
+            )
+        return self.places.get(name)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter, allowing `rate` requests per second
+    on average with bursts of up to `capacity` requests.
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available and takes it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate,
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class GeocodeCache:
+    """
+    Persistent cache of geocoding results, backed by sqlite so that it is
+    shared between app processes and survives restarts. Names that could not
+    be geocoded are cached too, with their own time to live.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = 30 * 24 * 3600,
+        negative_ttl: Optional[float] = 24 * 3600,
+    ) -> None:
+        """
+        :param path: Path to the sqlite database, or None for an in-memory
+            cache.
+        :param ttl: Time to live of found places in seconds, or None to keep
+            them forever.
+        :param negative_ttl: Time to live of names that were not found.
+        """
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path or ":memory:", timeout=30, check_same_thread=False
+        )
+        with self.lock, self.connection:
+            if path:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                "query TEXT PRIMARY KEY, place TEXT, created REAL)"
+            )
+
+    def get(self, query: str) -> Tuple[bool, Optional[Place]]:
+        """
+        Returns whether the query is cached and the cached place, which is
+        None if the query is cached as not found.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT place, created FROM places WHERE query = ?",
+                (normalise_name(query),),
+            ).fetchone()
+        if row is None:
+            return False, None
+        place, created = row
+        ttl = self.ttl if place is not None else self.negative_ttl
+        if ttl is not None and time.time() - created > ttl:
+            return False, None
+        return True, Place(**json.loads(place)) if place else None
+
+    def put(self, query: str, place: Optional[Place]) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO places (query, place, created) "
+                "VALUES (?, ?, ?)",
+                (
+                    normalise_name(query),
+                    json.dumps(asdict(place)) if place else None,
+                    time.time(),
+                ),
+            )
+
+
+class NominatimFallback:
+    """
+    Geocodes place names with Nominatim. Requests are not rate limited here,
+    the geocoder limits them to one per second as required by the Nominatim
+    usage policy.
+    """
+
+    def __init__(
+        self, user_agent: str = "ceh_sample_app", country_codes: str = "gb"
+    ) -> None:
+        from geopy.geocoders import Nominatim
+
+        self.country_codes = country_codes
+        self.geocode = Nominatim(user_agent=user_agent).geocode
+
+    def __call__(self, query: str) -> Optional[Place]:
+        location = self.geocode(
+            query, geometry="geojson", country_codes=self.country_codes
+        )
+        if location is None:
+            return None
+        bbox = None
+        if "boundingbox" in location.raw:
+            south, north, west, east = map(float, location.raw["boundingbox"])
+            bbox = [west, south, east, north]
+        return Place(
+            address=location.address,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            geojson=location.raw["geojson"],
+            bbox=bbox,
+        )
+
+
+def load_fallback(spec: Optional[str]) -> Optional[Fallback]:
+    """
+    Creates the fallback geocoder named in the config: `nominatim`, None for
+    offline geocoding, or the import path of a callable as `module:name`,
+    e.g. a local stub for testing.
+    """
+    if not spec:
+        return None
+    if spec == "nominatim":
+        return NominatimFallback()
+    module, _, name = spec.partition(":")
+    fallback = getattr(importlib.import_module(module), name)
+    return fallback() if isinstance(fallback, type) else fallback
+
+
+class Geocoder:
+    """
+    Geocodes place names from the gazetteer, then the cache, then the
+    fallback geocoder.
+    """
+
+    def __init__(
+        self,
+        gazetteer: Optional[Gazetteer] = None,
+        cache: Optional[GeocodeCache] = None,
+        fallback: Optional[Fallback] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        max_workers: int = 4,
+    ) -> None:
+        """
+        :param gazetteer: Offline gazetteer looked up first.
+        :param cache: Cache of fallback results.
+        :param fallback: Callable geocoding names that are not in the
+            gazetteer or cache, returning a `Place` or None. Geocoding is
+            offline if there is no fallback.
+        :param rate_limiter: Rate limit of requests to the fallback.
+        :param max_workers: Number of concurrent requests to the fallback.
+        """
+        self.gazetteer = gazetteer
+        self.cache = cache
+        self.fallback = fallback
+        self.rate_limiter = rate_limiter
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="geocoder"
+        )
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Geocoder":
+        """
+        Creates a geocoder from the `map-demo.geocoding` section of the config
+        file.
+        """
+        config = config.get("map-demo", {}).get("geocoding", {})
+        gazetteer = config.get("gazetteer", True)
+        cache = config.get("cache")
+        fallback = config.get("fallback", "nominatim")
+        rate_limit = config.get("rate_limit", 1)
+        return cls(
+            gazetteer=(
+                Gazetteer(gazetteer if isinstance(gazetteer, str) else None)
+                if gazetteer
+                else None
+            ),
+            cache=GeocodeCache(**cache) if cache else None,
+            fallback=load_fallback(fallback),
+            rate_limiter=(
+                TokenBucket(rate_limit, config.get("burst", 1))
+                if rate_limit
+                else None
+            ),
+            max_workers=config.get("max_workers", 4),
+        )
+
+    def lookup(self, query: str) -> Tuple[bool, Optional[Place]]:
+        """
+        Looks a name up in the gazetteer and cache only, returning whether it
+        was found and the place, which is None if it is cached as not found.
+        """
+        if self.gazetteer is not None:
+            place = self.gazetteer.locate(query)
+            if place is not None:
+                return True, place
+        if self.cache is not None:
+            return self.cache.get(query)
+        return False, None
+
+    def locate(self, query: str) -> Optional[Place]:
+        found, place = self.lookup(query)
+        if found or self.fallback is None:
+            return place
+        return self.locate_remote(query)
+
+    def locate_remote(self, query: str) -> Optional[Place]:
+        """
+        Geocodes a name with the fallback geocoder, within the rate limit,
+        and caches the result.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        logger.info(f'Geocoding "{query}"')
+        try:
+            place = self.fallback(query)
+        except Exception as e:
+            # Not cached, so that the name is retried on the next lookup.
+            logger.warning(f'Failed to geocode "{query}": {e}')
+            return None
+        if self.cache is not None:
+            self.cache.put(query, place)
+        return place
+
+    def locate_many(
+        self, queries: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[Place]]]:
+        """
+        Geocodes several names, yielding each distinct name with its place as
+        soon as it is resolved. Names in the gazetteer or cache are yielded
+        immediately, and the rest are geocoded concurrently by the fallback.
+        """
+        distinct = {}
+        for query in queries:
+            distinct.setdefault(normalise_name(query), query)
+        hits, futures = [], {}
+        for query in distinct.values():
+            found, place = self.lookup(query)
+            if found or self.fallback is None:
+                hits.append((query, place))
+            else:
+                future = self.executor.submit(self.locate_remote, query)
+                futures[future] = query
+        yield from hits
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -0,0 +1,232 @@
+"""
+Vectorised GeoJSON geometry helpers for the map app.
+
+Coordinates are handled as (n, 2) NumPy arrays of longitude, latitude pairs,
+as in GeoJSON, rather than nested Python lists.
+"""
+
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+# Nesting depth of the coordinate arrays of each GeoJSON geometry type.
+COORDINATE_DEPTH = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+
+def iter_geometries(geojson: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the geometries in a GeoJSON object, unpacking geometry
+    collections, features and feature collections.
+    """
+    match geojson["type"]:
+        case "GeometryCollection":
+            for geometry in geojson["geometries"]:
+                yield from iter_geometries(geometry)
+        case "Feature":
+            if geojson.get("geometry"):
+                yield from iter_geometries(geojson["geometry"])
+        case "FeatureCollection":
+            for feature in geojson["features"]:
+                yield from iter_geometries(feature)
+        case geometry_type if geometry_type in COORDINATE_DEPTH:
+            yield geojson
+        case geometry_type:
+            raise ValueError(f"Unsupported GeoJSON type {geometry_type}.")
+
+
+def iter_parts(coordinates: Any, depth: int) -> Iterator[Any]:
+    """
+    Yields the innermost coordinate sequences (points, lines or rings) of a
+    coordinate array of the given nesting depth.
+    """
+    if depth <= 1:
+        yield coordinates
+    else:
+        for part in coordinates:
+            yield from iter_parts(part, depth - 1)
+
+
+def part_array(part: Any) -> np.ndarray:
+    """
+    Converts a point or a sequence of positions to an (n, 2) array, dropping
+    any altitude values. Sequences are read with `np.fromiter`, which is
+    several times faster than `np.asarray` on nested lists.
+    """
+    if not len(part):
+        return np.empty((0, 2))
+    if not isinstance(part[0], (list, tuple)):
+        return np.asarray(part, dtype=float)[:2].reshape(1, 2)
+    dimensions = len(part[0])
+    try:
+        array = np.fromiter(
+            chain.from_iterable(part),
+            dtype=float,
+            count=dimensions * len(part),
+        ).reshape(-1, dimensions)
+    except ValueError:
+        # Positions with differing numbers of dimensions.
+        array = np.array([position[:2] for position in part], dtype=float)
+    return array[:, :2]
+
+
+def coordinates_array(geojson: Dict[str, Any]) -> np.ndarray:
+    """
+    Returns every coordinate in a GeoJSON object as an (n, 2) array. Any
+    altitude values are dropped.
+    """
+    arrays = []
+    for geometry in iter_geometries(geojson):
+        depth = COORDINATE_DEPTH[geometry["type"]]
+        for part in iter_parts(geometry["coordinates"], depth):
+            arrays.append(part_array(part))
+    if not arrays:
+        return np.empty((0, 2))
+    return np.concatenate(arrays)
+
+
+def bounds_array(coords: np.ndarray) -> np.ndarray:
+    """
+    Returns the [[min x, min y], [max x, max y]] bounds of an (n, 2) array.
+    """
+    coords = np.asarray(coords, dtype=float)
+    return np.stack([coords.min(axis=0), coords.max(axis=0)])
+
+
+def calc_bounds(coords: Iterable[Iterable[float]]) -> List[List[float]]:
+    """
+    Calculates the bounds for a list of coordinates. Returns the most
+    south-westerly point and the most north-easterly point required to
+    encapsulate all the coordinates in a bounding box.
+    """
+    return bounds_array(np.asarray(coords, dtype=float)).tolist()
+
+
+def calc_geojson_bounds(geojson: Dict[str, Any]) -> List[List[float]]:
+    """
+    Calculates a bounding box to enclose the coordinates of any GeoJSON
+    geometry, geometry collection, feature or feature collection.
+    """
+    return bounds_array(coordinates_array(geojson)).tolist()
+
+
+def get_bounds(geojsons: Iterable[Dict[str, Any]]) -> List[List[float]]:
+    """
+    Calculates a bounding box to enclose several GeoJSON objects.
+    """
+    bounds = [bounds_array(coordinates_array(g)) for g in geojsons]
+    return bounds_array(np.concatenate(bounds)).tolist()
+
+
+def flip_coords_lat_long(
+    coords: Iterable[Iterable[float]],
+) -> List[List[float]]:
+    """
+    Swaps longitude, latitude pairs to latitude, longitude, as used by
+    Folium, or back again.
+    """
+    return np.asarray(coords, dtype=float)[:, ::-1].tolist()
+
+
+def simplify_line(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplifies a line with the Douglas-Peucker algorithm, removing points
+    that are closer than tolerance to the simplified line. The distances of
+    all points in a segment are computed at once.
+    """
+    n = len(coords)
+    if n < 3 or tolerance <= 0:
+        return coords
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = coords[end] - coords[start]
+        offsets = coords[start + 1 : end] - coords[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = (
+                np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0])
+                / length
+            )
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return coords[keep]
+
+
+def simplify_ring(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplifies a closed polygon ring, keeping at least four points so that it
+    remains a valid ring.
+    """
+    simplified = simplify_line(coords, tolerance)
+    return simplified if len(simplified) >= 4 else coords
+
+
+def _simplify(coordinates: Any, depth: int, tolerance: float, ring: bool):
+    if depth == 1:
+        coords = part_array(coordinates)
+        if ring:
+            return simplify_ring(coords, tolerance).tolist()
+        return simplify_line(coords, tolerance).tolist()
+    return [
+        _simplify(part, depth - 1, tolerance, ring) for part in coordinates
+    ]
+
+
+def simplify(geojson: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """
+    Returns a copy of a GeoJSON object with its lines and polygon rings
+    simplified to within tolerance, in degrees. Points are left unchanged.
+    """
+    match geojson["type"]:
+        case "GeometryCollection":
+            return {
+                **geojson,
+                "geometries": [
+                    simplify(geometry, tolerance)
+                    for geometry in geojson["geometries"]
+                ],
+            }
+        case "Feature":
+            return {
+                **geojson,
+                "geometry": geojson.get("geometry")
+                and simplify(geojson["geometry"], tolerance),
+            }
+        case "FeatureCollection":
+            return {
+                **geojson,
+                "features": [
+                    simplify(feature, tolerance)
+                    for feature in geojson["features"]
+                ],
+            }
+        case "LineString" | "MultiLineString" | "Polygon" | "MultiPolygon":
+            return {
+                **geojson,
+                "coordinates": _simplify(
+                    geojson["coordinates"],
+                    COORDINATE_DEPTH[geojson["type"]],
+                    tolerance,
+                    ring=geojson["type"] in ("Polygon", "MultiPolygon"),
+                ),
+            }
+        case _:
+            return geojson
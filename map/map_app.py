@@ -1,16 +1,21 @@
 import logging
-from typing import Dict, List
+from typing import List
 
 import folium
-import numpy as np
-import spacy
-import spacy_streamlit
 import streamlit as st
-from geopy.extra.rate_limiter import RateLimiter
-from geopy.geocoders import Nominatim
-from geopy.location import Location
+import yaml
 from streamlit_folium import folium_static
 
+from map.geocoding import Geocoder, Place
+from map.ner import NERService, get_ner_service
+from map.geometry import (  # noqa: F401
+    calc_bounds,
+    calc_geojson_bounds,
+    flip_coords_lat_long,
+    get_bounds,
+    simplify,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format=(
@@ -18,84 +23,66 @@ logging.basicConfig(
     ),
 )
 logger = logging.getLogger(__name__)
-nlp_pipe = spacy.load("en_core_web_md")
-geocoder = Nominatim(user_agent="ceh_sample_app")
-rl_geocode = RateLimiter(geocoder.geocode, min_delay_seconds=1)
-
+# Tolerance in degrees (roughly 100m) boundaries are simplified to before they
+# are drawn, so large boundaries don't slow down the map.
+SIMPLIFY_TOLERANCE = 0.001
+with open("config.yml", "r") as config_file:
+    config = yaml.safe_load(config_file)
 
-@st.cache_data
-def locate(query) -> Location:
-    logger.info(f'Geocoding "{query}"')
-    return rl_geocode(query, geometry="geojson", country_codes="gb")
 
-
-def calc_bounds(coords: List[List[float]]) -> List[List[float]]:
+@st.cache_resource
+def get_geocoder() -> Geocoder:
     """
-    Calculates the bounds for a list of coordinates. Returns the most
-    south-westerly point and the most north-easterly point required to
-    encapsulate all the coordinates in a bounding box.
+    Returns the geocoder shared by all sessions of the app.
     """
-    transposed_coords = np.array(coords).T.tolist()
-    return [
-        [min(transposed_coords[0]), min(transposed_coords[1])],
-        [max(transposed_coords[0]), max(transposed_coords[1])],
-    ]
+    return Geocoder.from_config(config)
 
 
-def calc_geojson_bounds(geojson: Dict) -> List[List[float]]:
+def get_ner() -> NERService:
     """
-    Unpacks the coordinates provided in a geojson object and calculates a
-    bounding box to enclose them. Works with point, polygon and multi-polygon
-    geojson types.
+    Returns the NER service shared by all sessions of the app. The model is
+    loaded when the first query is processed.
     """
-    polygons = geojson["coordinates"]
-    polygon_bounds = []
-    match geojson["type"]:
-        case "MultiPolygon":
-            for polygon in polygons:
-                polygon_bounds.extend(calc_bounds(polygon[0]))
-        case "Polygon":
-            polygon_bounds.extend(calc_bounds(polygons[0]))
-        case "Point":
-            polygon_bounds = [polygons]
-    return calc_bounds(polygon_bounds)
-
-
-def get_bounds(locations: List[Location]) -> List[List[int]]:
-    location_bounds = []
-    for location in locations:
-        location_bounds.extend(calc_geojson_bounds(location.raw["geojson"]))
-    return calc_bounds(location_bounds)
+    return get_ner_service(
+        config.get("map-demo", {}).get("ner-model", "en_core_web_md")
+    )
 
 
-def flip_coord_lat_long(coord: List[float]) -> List[float]:
-    return [coord[1], coord[0]]
-
-
-def flip_coords_lat_long(coords: List[List[float]]) -> List[List[float]]:
-    return [flip_coord_lat_long(coord) for coord in coords]
+def places_bounds(places: List[Place]) -> List[List[float]]:
+    """
+    Calculates a bounding box to enclose the bounds of several places.
+    """
+    return calc_bounds(
+        [corner for place in places for corner in place.bounds()]
+    )
 
 
 def main() -> None:
     st.set_page_config(layout="wide", page_title="NER Spatial Mapping")
     st.title("NER Spatial Mapping")
     left, right = st.columns(2)
-    locations = []
+    names = []
     with left:
         if query := st.text_input("Enter query"):
-            parsed_query = nlp_pipe(query)
+            # Imported here as it imports spacy, which is slow to import.
+            import spacy_streamlit
+
+            ner = get_ner()
+            parsed_query = ner(query)
             spacy_streamlit.visualize_ner(parsed_query, show_table=False)
-            locations = [
-                locate(entity.text)
-                for entity in parsed_query.ents
-                if entity.label_ == "GPE"
-            ]
-            locations = [loc for loc in locations if loc]
+            names = ner.entities(parsed_query)
     with right:
-        if len(locations) < 1:
+        if len(names) < 1:
             return
+        # Places are added to the map as they are geocoded, rather than once
+        # every name has been geocoded.
+        placeholder = st.empty()
         map = folium.Map(location=[0.000000, 0.000000], zoom_start=1)
-        for location in locations:
+        locations = []
+        for _, location in get_geocoder().locate_many(names):
+            if location is None:
+                continue
+            locations.append(location)
             folium.Marker(
                 location=[
                     location.latitude,
@@ -103,12 +90,15 @@ def main() -> None:
                 ],
                 popup=folium.Popup(location.address),
             ).add_to(map)
-            folium.GeoJson(location.raw["geojson"]).add_to(map)
-        bounds = get_bounds(locations)
-        bounds = flip_coords_lat_long(bounds)
-        logger.info(bounds)
-        map.fit_bounds(bounds)
-        folium_static(map)
+            folium.GeoJson(
+                simplify(location.geojson, SIMPLIFY_TOLERANCE)
+            ).add_to(map)
+            bounds = places_bounds(locations)
+            bounds = flip_coords_lat_long(bounds)
+            logger.info(bounds)
+            map.fit_bounds(bounds)
+            with placeholder.container():
+                folium_static(map)
 
 
 if __name__ == "__main__":
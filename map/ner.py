@@ -0,0 +1,96 @@
+"""
+Named entity recognition for the map app.
+
+The spaCy model is loaded the first time it is used rather than on import,
+and only with the components needed for NER, so that importing the map app
+or its geometry helpers is fast and does not need the model installed.
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "en_core_web_md"
+# Components of the en_core_web pipelines that NER does not depend on.
+EXCLUDE = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+
+class NERService:
+    """
+    Lazily loaded spaCy pipeline for extracting named entities, which can be
+    shared between threads and sessions.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        labels: Sequence[str] = ("GPE",),
+        batch_size: int = 32,
+    ) -> None:
+        """
+        :param model: Name or path of the spaCy model.
+        :param labels: Entity labels returned by `entities`.
+        :param batch_size: Number of texts processed at once by `pipe`.
+        """
+        self.model = model
+        self.labels = set(labels)
+        self.batch_size = batch_size
+        self._nlp = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._nlp is not None
+
+    @property
+    def nlp(self):
+        """
+        The spaCy pipeline, loaded on first access.
+        """
+        if self._nlp is None:
+            with self._lock:
+                if self._nlp is None:
+                    import spacy
+
+                    logger.info(f"Loading spaCy model {self.model}")
+                    self._nlp = spacy.load(self.model, exclude=EXCLUDE)
+        return self._nlp
+
+    def __call__(self, text: str):
+        """
+        Processes a single text, returning the spaCy Doc.
+        """
+        return self.nlp(text)
+
+    def pipe(self, texts: Iterable[str]) -> Iterator:
+        """
+        Processes texts in batches, yielding a spaCy Doc for each.
+        """
+        return self.nlp.pipe(texts, batch_size=self.batch_size)
+
+    def entities(self, doc) -> List[str]:
+        """
+        Returns the text of the entities in a Doc with one of the labels.
+        """
+        return [ent.text for ent in doc.ents if ent.label_ in self.labels]
+
+    def extract(self, texts: Iterable[str]) -> Iterator[List[str]]:
+        """
+        Yields the entities with one of the labels in each text.
+        """
+        for doc in self.pipe(texts):
+            yield self.entities(doc)
+
+
+@lru_cache(maxsize=None)
+def get_ner_service(
+    model: str = DEFAULT_MODEL, labels: Sequence[str] = ("GPE",)
+) -> NERService:
+    """
+    Returns the NER service shared by everything in the process for a model
+    and labels.
+    """
+    return NERService(model, tuple(labels))
@@ -0,0 +1,262 @@
+"""
+Semantic cache of RAG answers, keyed by query embedding.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+INDEXED_AT_KEY = "indexed_at"
+
+
+def mark_indexed(document_store) -> None:
+    """
+    Records the time a Chroma collection was last indexed in its metadata, so
+    that caches built on top of it can be invalidated.
+    """
+    collection = document_store._collection
+    metadata = {
+        key: value
+        for key, value in (collection.metadata or {}).items()
+        if not key.startswith("hnsw:")
+    }
+    metadata[INDEXED_AT_KEY] = time.time()
+    collection.modify(metadata=metadata)
+
+
+def collection_fingerprint(document_store) -> str:
+    """
+    Returns a fingerprint of a Chroma collection which changes whenever the
+    collection is re-indexed.
+    """
+    return chroma_collection_fingerprint(
+        document_store._chroma_client.get_collection(
+            document_store._collection_name
+        )
+    )
+
+
+def chroma_collection_fingerprint(collection) -> str:
+    """
+    Returns the fingerprint of a Chroma collection read directly from a
+    chromadb client.
+    """
+    indexed_at = (collection.metadata or {}).get(INDEXED_AT_KEY)
+    return f"{indexed_at}:{collection.count()}"
+
+
+def cache_namespace(collection_name: str, pipeline_config: str) -> str:
+    """
+    Returns the cache namespace of a pipeline: the name of the collection it
+    retrieves from and a hash of its resolved configuration, which includes
+    the prompt. Pipelines sharing a cache only answer from their own entries.
+    """
+    digest = hashlib.sha256(pipeline_config.encode()).hexdigest()[:16]
+    return f"{collection_name}:{digest}"
+
+
+@dataclass
+class CachedAnswer:
+    """
+    An answer returned from the cache.
+    """
+
+    query: str
+    answer: str
+    doc_ids: List[str]
+    datasets: pd.DataFrame
+    similarity: float
+
+
+class SemanticCache:
+    """
+    Persistent cache of generated answers, looked up by the cosine similarity
+    of query embeddings rather than exact query strings.
+
+    Entries are stored in sqlite so that they survive restarts and can be
+    shared between processes. Each pipeline's entries are kept in their own
+    namespace, see `cache_namespace`, and are only invalidated when the
+    fingerprint of that pipeline's collection changes. Entries expire after
+    `ttl` seconds, and the least recently used entries are evicted beyond
+    `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = 0.95,
+        ttl: Optional[float] = None,
+        max_entries: int = 1000,
+    ) -> None:
+        """
+        :param path: Path to the sqlite database, or None for an in-memory
+            cache.
+        :param threshold: Minimum cosine similarity for a cache hit.
+        :param ttl: Time to live of an entry in seconds, or None to keep
+            entries until they are evicted.
+        :param max_entries: Maximum number of entries kept.
+        """
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path or ":memory:", timeout=30, check_same_thread=False
+        )
+        with self.lock, self.connection:
+            columns = [
+                row[1]
+                for row in self.connection.execute(
+                    "PRAGMA table_info(answers)"
+                )
+            ]
+            if columns and "namespace" not in columns:
+                # Entries from before namespaces can't be attributed to a
+                # pipeline, so they are dropped.
+                self.connection.execute("DROP TABLE answers")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT, "
+                "query TEXT, embedding BLOB, doc_ids TEXT, answer TEXT, "
+                "datasets TEXT, fingerprint TEXT, created REAL, "
+                "last_used REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS answers_namespace "
+                "ON answers (namespace)"
+            )
+        self._indexes: Dict[str, Tuple[Tuple, np.ndarray, np.ndarray]] = {}
+
+    @staticmethod
+    def _normalise(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _expire(self, fingerprint: str, namespace: str) -> None:
+        """
+        Deletes the namespace's entries for an old version of its collection,
+        and entries of any namespace past their time to live.
+        """
+        expired_before = time.time() - self.ttl if self.ttl else -1
+        self.connection.execute(
+            "DELETE FROM answers WHERE (namespace = ? AND fingerprint != ?) "
+            "OR created < ?",
+            (namespace, fingerprint, expired_before),
+        )
+
+    def _load_index(self, namespace: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the ids and normalised embeddings of a namespace's entries,
+        loading them into memory if they have changed since they were last
+        loaded.
+        """
+        version = self.connection.execute(
+            "SELECT COUNT(*), MAX(id) FROM answers WHERE namespace = ?",
+            (namespace,),
+        ).fetchone()
+        if namespace in self._indexes:
+            loaded_version, ids, matrix = self._indexes[namespace]
+            if loaded_version == version:
+                return ids, matrix
+        rows = self.connection.execute(
+            "SELECT id, embedding FROM answers WHERE namespace = ?",
+            (namespace,),
+        ).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        matrix = (
+            np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if rows
+            else np.empty((0, 0), dtype=np.float32)
+        )
+        self._indexes[namespace] = (version, ids, matrix)
+        return ids, matrix
+
+    def get(
+        self, embedding, fingerprint: str, namespace: str = ""
+    ) -> Optional[CachedAnswer]:
+        """
+        Returns the cached answer in the namespace with the most similar
+        query embedding, if it is within the similarity threshold.
+        """
+        with self.lock, self.connection:
+            self._expire(fingerprint, namespace)
+            ids, matrix = self._load_index(namespace)
+            if len(ids) == 0:
+                return None
+            similarities = matrix @ self._normalise(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            entry_id = int(ids[best])
+            self.connection.execute(
+                "UPDATE answers SET last_used = ? WHERE id = ?",
+                (time.time(), entry_id),
+            )
+            query, doc_ids, answer, datasets = self.connection.execute(
+                "SELECT query, doc_ids, answer, datasets FROM answers "
+                "WHERE id = ?",
+                (entry_id,),
+            ).fetchone()
+        return CachedAnswer(
+            query=query,
+            answer=answer,
+            doc_ids=json.loads(doc_ids),
+            datasets=pd.read_json(StringIO(datasets), orient="split"),
+            similarity=float(similarities[best]),
+        )
+
+    def put(
+        self,
+        query: str,
+        embedding,
+        doc_ids: List[str],
+        answer: str,
+        datasets: pd.DataFrame,
+        fingerprint: str,
+        namespace: str = "",
+    ) -> None:
+        """
+        Stores an answer in the namespace, evicting the least recently used
+        entries if the cache is full.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO answers (namespace, query, embedding, doc_ids, "
+                "answer, datasets, fingerprint, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    namespace,
+                    query,
+                    self._normalise(embedding).tobytes(),
+                    json.dumps(doc_ids),
+                    answer,
+                    datasets.to_json(orient="split"),
+                    fingerprint,
+                    now,
+                    now,
+                ),
+            )
+            self.connection.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers "
+                "ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """
+        Removes every entry from the cache.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM answers")
@@ -0,0 +1,175 @@
+"""
+Assembly of the retrieved documents into the context of the prompt.
+
+The converter creates a document per metadata field chunk, each starting with
+the same sentence naming the dataset, so several of the retrieved documents
+are often the same dataset or overlapping chunks of the same field. The
+`ContextBudget` component merges them into a single document per dataset and
+trims the context to a token budget, keeping the prompt, and the time the
+LLM spends reading it, small.
+"""
+
+import math
+from haystack import Document, component, logging
+from typing import Dict, List, Optional
+
+from ingestion.converter import content_prefix
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token of the Llama and Mistral tokenizers on English
+# text, used to estimate token counts without loading a tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Returns an estimate of the number of LLM tokens in the text.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def field_text(document: Document) -> str:
+    """
+    Returns the content of a document without the sentence naming its dataset
+    and metadata field.
+    """
+    prefix = content_prefix(
+        document.meta.get("dataset_title", ""),
+        document.meta.get("eidc_metadata_key", ""),
+    )
+    content = document.content or ""
+    return content[len(prefix) :] if content.startswith(prefix) else content
+
+
+def merge_chunks(documents: List[Document]) -> str:
+    """
+    Joins the chunks of a metadata field in the order they appear in the
+    field, dropping the text that consecutive chunks overlap by, and any
+    repeated documents.
+    """
+    located = sorted(
+        (doc for doc in documents if doc.meta.get("chunk_start") is not None),
+        key=lambda doc: doc.meta["chunk_start"],
+    )
+    pieces: List[str] = []
+    end = None
+    for document in located:
+        start = document.meta["chunk_start"]
+        text = field_text(document)
+        if end is not None and start + len(text) <= end:
+            continue
+        if end is not None and start < end:
+            pieces[-1] += text[end - start :]
+        else:
+            pieces.append(text)
+        end = start + len(text)
+    for document in documents:
+        if document.meta.get("chunk_start") is None:
+            text = field_text(document)
+            if text not in pieces:
+                pieces.append(text)
+    return "\n".join(pieces)
+
+
+@component
+class ContextBudget:
+    """
+    Assembles the retrieved documents into the context of the prompt, placed
+    between the retriever and the prompt builder. Documents are grouped by
+    `dataset_id` into a single document per dataset, in the order the
+    datasets were first retrieved, with the chunks of each metadata field
+    merged and deduplicated. Datasets are added until the context reaches
+    `max_tokens`, truncating the last one, and the number of tokens in the
+    context is output with the documents.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        max_datasets: Optional[int] = None,
+        min_tokens: int = 50,
+    ):
+        """
+        :param max_tokens: Token budget of the context.
+        :param max_datasets: Maximum number of datasets in the context, or
+            None for as many as fit in the budget.
+        :param min_tokens: Smallest part of a dataset worth including when
+            it has to be truncated to fit the budget.
+        """
+        self.max_tokens = max_tokens
+        self.max_datasets = max_datasets
+        self.min_tokens = min_tokens
+
+    def dataset_document(self, hits: List[Document]) -> Document:
+        """
+        Merges the documents retrieved for a dataset into a single document,
+        with the metadata and score of the best of them.
+        """
+        fields: Dict[str, List[Document]] = {}
+        for hit in hits:
+            fields.setdefault(
+                hit.meta.get("eidc_metadata_key", ""), []
+            ).append(hit)
+        title = hits[0].meta.get("dataset_title", "")
+        lines = [f'Dataset "{title}":']
+        lines.extend(
+            f"{key}: {merge_chunks(chunks)}" for key, chunks in fields.items()
+        )
+        return Document(
+            content="\n".join(lines),
+            meta={
+                **hits[0].meta,
+                "eidc_metadata_key": ", ".join(fields),
+                "retrieved_documents": len(hits),
+            },
+            score=hits[0].score,
+        )
+
+    def truncate(self, text: str, tokens: int) -> str:
+        """
+        Cuts text at a word boundary to fit within a number of tokens.
+        """
+        text = text[: tokens * CHARS_PER_TOKEN - 3]
+        return text.rsplit(maxsplit=1)[0] + "..."
+
+    @component.output_types(documents=List[Document], tokens=int)
+    def run(self, documents: List[Document]):
+        """
+        :param documents: The retrieved documents, best first.
+        :returns: A dictionary with the following keys:
+            - `documents`: A document for each dataset in the context.
+            - `tokens`: Estimated number of tokens in the context.
+        """
+        groups: Dict[str, List[Document]] = {}
+        for document in documents:
+            dataset_id = document.meta.get("dataset_id", document.id)
+            groups.setdefault(dataset_id, []).append(document)
+
+        context, used = [], 0
+        for hits in groups.values():
+            if self.max_datasets and len(context) >= self.max_datasets:
+                break
+            document = self.dataset_document(hits)
+            tokens = estimate_tokens(document.content)
+            remaining = self.max_tokens - used
+            if tokens > remaining:
+                if remaining < self.min_tokens:
+                    break
+                document = Document(
+                    content=self.truncate(document.content, remaining),
+                    meta=document.meta,
+                    score=document.score,
+                )
+                tokens = estimate_tokens(document.content)
+            context.append(document)
+            used += tokens
+
+        logger.info(
+            "Context of {datasets} datasets from {documents} documents, "
+            "{tokens} tokens",
+            datasets=len(context),
+            documents=len(documents),
+            tokens=used,
+        )
+        return {"documents": context, "tokens": used}
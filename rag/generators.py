@@ -0,0 +1,44 @@
+"""
+LLM generators for the RAG pipelines.
+"""
+
+from typing import Any, Dict, Optional
+
+from haystack import component
+from haystack_integrations.components.generators.ollama import OllamaGenerator
+
+
+@component
+class KeepAliveOllamaGenerator(OllamaGenerator):
+    """
+    Generates text like `OllamaGenerator`, but sends `keep_alive` with every
+    request, which the Ollama integration doesn't. Ollama unloads a model
+    once it has been idle for the `keep_alive` of the last request, or the
+    server's `OLLAMA_KEEP_ALIVE` (five minutes by default) if none was given,
+    so sending it only when warming up doesn't keep the model loaded past
+    the first query.
+    """
+
+    def __init__(self, keep_alive: Optional[str] = None, **kwargs):
+        """
+        :param keep_alive: How long Ollama keeps the model loaded after each
+            generation, e.g. "30m", or None for the server's default.
+        :param kwargs: Parameters of `OllamaGenerator`.
+        """
+        OllamaGenerator.__init__(self, **kwargs)
+        self.keep_alive = keep_alive
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = OllamaGenerator.to_dict(self)
+        data["init_parameters"]["keep_alive"] = self.keep_alive
+        return data
+
+    def _create_json_payload(
+        self, prompt: str, stream: bool, generation_kwargs=None
+    ) -> Dict[str, Any]:
+        payload = OllamaGenerator._create_json_payload(
+            self, prompt, stream, generation_kwargs
+        )
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
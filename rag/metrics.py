@@ -0,0 +1,157 @@
+"""
+In-process metrics of pipeline runs, such as the latency of each stage.
+
+Observations are kept in a rolling window per metric and label set, from
+which percentiles are calculated, and are exported in the Prometheus text
+format as summaries with p50, p95 and p99 quantiles. The Prometheus Python
+client does not calculate quantiles for summaries, and the same percentiles
+are shown in the RAG app's debug panel, so they are calculated here.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+HELP = {
+    "component_seconds": "Time taken by a pipeline component.",
+    "component_documents": "Number of documents output by a component.",
+    "query_seconds": "Time taken to answer a query.",
+    "prompt_tokens": "Estimated number of tokens in the prompt.",
+    "llm_prompt_tokens": "Number of prompt tokens evaluated by the LLM.",
+    "llm_prefill_seconds": "Time the LLM took to evaluate the prompt.",
+    "llm_decode_seconds": "Time the LLM took to generate the answer.",
+    "llm_tokens_per_second": "Rate the LLM generated answer tokens at.",
+}
+
+
+class Series:
+    """
+    Observations of a metric with one set of labels: a rolling window of the
+    latest values, and the count and sum of every value observed.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.values: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.values.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self) -> List[float]:
+        if not self.values:
+            return [math.nan] * len(QUANTILES)
+        return np.quantile(np.fromiter(self.values, float), QUANTILES).tolist()
+
+
+class Metrics:
+    """
+    Thread-safe registry of the metrics observed by the pipeline wrappers
+    in a process.
+    """
+
+    def __init__(self, window: int = 1000, namespace: str = "rag") -> None:
+        """
+        :param window: Number of latest observations percentiles are
+            calculated from.
+        :param namespace: Prefix of the exported metric names.
+        """
+        self.window = window
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.series: Dict[str, Dict[Labels, Series]] = {}
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Records an observation of a metric with the given labels.
+        """
+        key = tuple(sorted((label, str(v)) for label, v in labels.items()))
+        with self.lock:
+            series = self.series.setdefault(name, {})
+            if key not in series:
+                series[key] = Series(self.window)
+            series[key].observe(value)
+
+    def summary(self, name: Optional[str] = None) -> pd.DataFrame:
+        """
+        Returns a row for each metric and label set, or of a single metric,
+        with the number of observations, their mean and percentiles.
+        """
+        rows = []
+        with self.lock:
+            for metric, series in sorted(self.series.items()):
+                if name is not None and metric != name:
+                    continue
+                for labels, values in series.items():
+                    p50, p95, p99 = values.quantiles()
+                    rows.append(
+                        {
+                            "metric": metric,
+                            **dict(labels),
+                            "count": values.count,
+                            "mean": values.sum / values.count,
+                            "p50": p50,
+                            "p95": p95,
+                            "p99": p99,
+                        }
+                    )
+        return pd.DataFrame(rows)
+
+    def to_prometheus(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for metric, series in sorted(self.series.items()):
+                name = f"{self.namespace}_{metric}"
+                if metric in HELP:
+                    lines.append(f"# HELP {name} {HELP[metric]}")
+                lines.append(f"# TYPE {name} summary")
+                for labels, values in series.items():
+                    for quantile, value in zip(QUANTILES, values.quantiles()):
+                        quantile_labels = labels + (
+                            ("quantile", str(quantile)),
+                        )
+                        lines.append(
+                            f"{name}{format_labels(quantile_labels)} {value}"
+                        )
+                    lines.append(
+                        f"{name}_sum{format_labels(labels)} {values.sum}"
+                    )
+                    lines.append(
+                        f"{name}_count{format_labels(labels)} {values.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self.lock:
+            self.series.clear()
+
+
+def format_labels(labels: Labels) -> str:
+    """
+    Formats labels as a Prometheus label set, e.g. `{component="retriever"}`.
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (label, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for label, value in labels
+    )
+    return (
+        "{" + ",".join(f'{label}="{value}"' for label, value in escaped) + "}"
+    )
+
+
+METRICS = Metrics()
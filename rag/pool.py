@@ -0,0 +1,262 @@
+"""
+Async pool of RAG pipelines for serving concurrent requests.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+import pandas as pd
+
+from rag.cache import SemanticCache
+from rag.wrappers import RagPipelineWrapper, batch_datasets
+
+Event = Tuple[str, Any]
+T = TypeVar("T")
+
+
+class PoolFullError(Exception):
+    """
+    Raised when a query is submitted to a pool whose queue is full.
+    """
+
+
+def normalise_query(query: str) -> str:
+    """
+    Returns the key used to coalesce identical queries, ignoring case and
+    whitespace.
+    """
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class Generation:
+    """
+    A single pipeline run shared by every request for the same query. Events
+    are recorded as they are published, so requests that join late are
+    replayed the events they missed.
+    """
+
+    def __init__(self) -> None:
+        self.events: List[Optional[Event]] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, event: Optional[Event]) -> None:
+        """
+        Publishes an event to all subscribers, or None once the run is done.
+        Must be called from the event loop.
+        """
+        self.events.append(event)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait(event)
+
+    async def subscribe(self) -> AsyncIterator[Event]:
+        """
+        Yields every event of the run, raising any error from the pipeline.
+        """
+        subscriber = asyncio.Queue()
+        for event in self.events:
+            subscriber.put_nowait(event)
+        self.subscribers.add(subscriber)
+        try:
+            while (event := await subscriber.get()) is not None:
+                if event[0] == "error":
+                    raise event[1]
+                yield event
+        finally:
+            self.subscribers.discard(subscriber)
+
+    async def result(self) -> Tuple[str, pd.DataFrame]:
+        """
+        Waits for the run to finish and returns the generated answer and the
+        datasets retrieved.
+        """
+        answer, datasets = None, None
+        async for event, value in self.subscribe():
+            if event == "datasets":
+                datasets = value
+            elif event == "answer":
+                answer = value
+        return answer, datasets
+
+
+class RagPipelinePool:
+    """
+    Serves queries from asyncio code using a fixed number of pipeline
+    instances, each run in its own worker thread so the event loop is never
+    blocked by retrieval or generation.
+
+    Identical queries that arrive while a query is in flight share its
+    generation rather than starting a new one. At most `size` queries run at
+    once and up to `max_queue` more wait for a free pipeline; further queries
+    are rejected with `PoolFullError` so that callers can shed load.
+    """
+
+    def __init__(
+        self,
+        yml_file: str,
+        size: int = 2,
+        max_queue: int = 16,
+        cache: Optional[SemanticCache] = None,
+        **config,
+    ) -> None:
+        """
+        :param yml_file: Pipeline yaml file, as for `RagPipelineWrapper`.
+        :param size: Number of pipeline instances, i.e. concurrent queries.
+        :param max_queue: Number of queries allowed to wait for a pipeline.
+        :param cache: Semantic cache shared by all pipeline instances.
+        """
+        self.size = size
+        self.max_queue = max_queue
+        self.wrappers = [
+            RagPipelineWrapper(yml_file, cache=cache, **config)
+            for _ in range(size)
+        ]
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix="rag-pipeline"
+        )
+        self._available = None
+        self._generations: Dict[str, Generation] = {}
+
+    def warm_up(self, **kwargs) -> List[threading.Thread]:
+        """
+        Warms up every pipeline instance in the background, see
+        `RagPipelineWrapper.warm_up`, returning the warm-up threads.
+        """
+        return [
+            wrapper.warm_up_in_background(**kwargs)
+            for wrapper in self.wrappers
+        ]
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of distinct queries running or waiting for a pipeline.
+        """
+        return len(self._generations)
+
+    def submit(self, query: str) -> Generation:
+        """
+        Returns the in-flight generation for a query, starting one if there
+        is none. Raises `PoolFullError` if the queue is full.
+        """
+        key = normalise_query(query)
+        generation = self._generations.get(key)
+        if generation is not None:
+            self.logger.info(f'Coalesced query "{query}"')
+            return generation
+        if self.pending >= self.size + self.max_queue:
+            raise PoolFullError(
+                f"{self.pending} queries in flight, try again later."
+            )
+        generation = Generation()
+        self._generations[key] = generation
+        task = asyncio.get_running_loop().create_task(
+            self._run(query, generation)
+        )
+        task.add_done_callback(lambda _: self._generations.pop(key, None))
+        return generation
+
+    async def _run_on_wrapper(
+        self, function: Callable[[RagPipelineWrapper], T]
+    ) -> T:
+        """
+        Waits for a free pipeline instance and calls function with it in a
+        worker thread.
+        """
+        if self._available is None:
+            self._available = asyncio.Queue()
+            for wrapper in self.wrappers:
+                self._available.put_nowait(wrapper)
+        wrapper = await self._available.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, function, wrapper
+            )
+        finally:
+            self._available.put_nowait(wrapper)
+
+    async def _run(self, query: str, generation: Generation) -> None:
+        loop = asyncio.get_running_loop()
+
+        def run(wrapper: RagPipelineWrapper) -> None:
+            for event in wrapper.stream(query):
+                loop.call_soon_threadsafe(generation.publish, event)
+
+        try:
+            await self._run_on_wrapper(run)
+        except Exception as e:
+            generation.publish(("error", e))
+        finally:
+            generation.publish(None)
+
+    async def stream(self, query: str) -> AsyncIterator[Event]:
+        """
+        Queries a pipeline, yielding the events of `RagPipelineWrapper.stream`
+        as they happen. Raises `PoolFullError` if the queue is full.
+        """
+        generation = self.submit(query)
+        async for event in generation.subscribe():
+            yield event
+
+    async def query(self, query: str) -> Tuple[str, pd.DataFrame]:
+        """
+        Queries a pipeline and returns the generated answer and the datasets
+        retrieved. Raises `PoolFullError` if the queue is full.
+        """
+        return await self.submit(query).result()
+
+    async def query_batch(
+        self, queries: List[str], max_concurrency: Optional[int] = None
+    ) -> Tuple[List[str], pd.DataFrame]:
+        """
+        Queries the pipelines with several queries at once. The queries are
+        embedded and retrieved together by `RagPipelineWrapper.retrieve_batch`,
+        then each runs through the rest of a pipeline instance of its own, so
+        that up to `max_concurrency`, by default the pool size, generations
+        are sent to the LLM concurrently. Batched queries wait for a free
+        pipeline like other queries, but are not counted against the queue.
+
+        Returns the answers in the order of the queries, and the datasets
+        retrieved for every query in a single dataframe with a row for each
+        query and dataset.
+        """
+        if not queries:
+            return [], batch_datasets([], [])
+        embeddings, documents = await self._run_on_wrapper(
+            lambda wrapper: wrapper.retrieve_batch(queries)
+        )
+        limit = asyncio.Semaphore(max_concurrency or self.size)
+
+        async def run(query, embedding, retrieved):
+            async with limit:
+                return await self._run_on_wrapper(
+                    lambda wrapper: wrapper.query(query, embedding, retrieved)
+                )
+
+        results = await asyncio.gather(
+            *(run(*query) for query in zip(queries, embeddings, documents))
+        )
+        return (
+            [answer for answer, _ in results],
+            batch_datasets(queries, [datasets for _, datasets in results]),
+        )
+
+    def close(self) -> None:
+        """
+        Shuts down the worker threads once running queries have finished.
+        """
+        self._executor.shutdown()
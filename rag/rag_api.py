@@ -2,49 +2,127 @@
 API that serves up a RAG pipeline for performing queries on a chroma instance.
 """
 
+import json
 import logging
-from typing import Union
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
-from fastapi import FastAPI
-from haystack import Pipeline
+import yaml
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from ingestion import stores
+from rag.cache import SemanticCache
+from rag.metrics import Metrics
+from rag.pool import Generation, PoolFullError, RagPipelinePool
 
 logging.getLogger().setLevel(logging.INFO)
 
+with open("config.yml", "r") as config_file:
+    config = yaml.safe_load(config_file)
+stores.configure(config)
+
+cache_config = config["rag-demo"].get("cache")
+metrics = Metrics(
+    window=config["rag-demo"].get("metrics", {}).get("window", 1000)
+)
+pool = RagPipelinePool(
+    f"{config['pipelines-dir']}/{config['rag-demo']['pipeline']}",
+    cache=SemanticCache(**cache_config) if cache_config else None,
+    chroma_path=config["vector-db"]["path"],
+    collection=config["vector-db"]["collection"],
+    prompt=config["rag-demo"]["prompt"],
+    keep_alive=config["rag-demo"].get("keep_alive"),
+    metrics=metrics,
+    **config["rag-demo"].get("api", {}),
+)
+warm_up_config = config["rag-demo"].get("warm-up", {})
 
-def stream_callback(chunk):
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-    Basic callback for streaming responses from an llm or generator.
+    Warms up the pipelines in the background as the server starts, so that
+    requests are accepted straight away and the first query doesn't pay for
+    loading the pipeline and models, and shuts down the pool's worker
+    threads as it stops.
     """
-    print(chunk.content, end="", flush=True)
+    if warm_up_config.get("enabled", True):
+        pool.warm_up()
+    yield
+    pool.close()
+
 
+app = FastAPI(lifespan=lifespan)
 
-def load_rag_pipeline(file):
+
+def submit(query_string: str) -> Generation:
     """
-    Loads a pipeline for haystack from a yaml file.
+    Submits a query to the pipeline pool, responding with 400 Bad Request if
+    the query is empty and 429 Too Many Requests if the pool's queue is full.
     """
-    logging.info(f"Loading {file} as RAG pipeline source.")
-    with open(file) as f:
-        return Pipeline.loads(f.read())
+    if not query_string.strip():
+        raise HTTPException(status_code=400, detail="The query is empty.")
+    try:
+        return pool.submit(query_string)
+    except PoolFullError as e:
+        logging.warning(f'Rejected query: "{query_string}". {e}')
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "5"}
+        )
 
 
-file = "llama3-rag-pipe.yml"
-# file = 'flan-t5-rag-pipe.yml'
-pipeline = load_rag_pipeline(file)
-app = FastAPI()
+async def server_sent_events(generation: Generation) -> AsyncIterator[str]:
+    """
+    Formats the events streamed from the pipeline as server-sent events, with
+    the event data encoded as json.
+    """
+    try:
+        async for event, value in generation.subscribe():
+            if event == "datasets":
+                value = value.to_dict(orient="records")
+            yield f"event: {event}\ndata: {json.dumps(value)}\n\n"
+    except Exception as e:
+        logging.exception("Streaming query failed.")
+        yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
 
 
 @app.get("/query")
-def query(query_string: Union[str, None] = None):
+async def query(query_string: str):
     """
     Query the API with a prompt. This method will run the RAG pipeline and
     return the result.
     """
     logging.info(f'Received query: "{query_string}"')
-    results = pipeline.run(
-        {
-            "retriever": {"query": query_string},
-            "prompt_builder": {"query": query_string},
-            "answer_builder": {"query": query_string},
-        }
+    answer, datasets = await submit(query_string).result()
+    return {
+        "query": query_string,
+        "answer": answer,
+        "datasets": datasets.to_dict(orient="records"),
+    }
+
+
+@app.get("/query/stream")
+async def query_stream(query_string: str):
+    """
+    Query the API with a prompt, streaming the result as server-sent events.
+    A `datasets` event is sent once the documents have been retrieved, then a
+    `token` event for each generated token and finally an `answer` event with
+    the full answer.
+    """
+    logging.info(f'Received streaming query: "{query_string}"')
+    return StreamingResponse(
+        server_sent_events(submit(query_string)),
+        media_type="text/event-stream",
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Metrics of the pipeline runs in the Prometheus text format, including the
+    p50, p95 and p99 time taken by each component.
+    """
+    return PlainTextResponse(
+        metrics.to_prometheus(), media_type="text/plain; version=0.0.4"
     )
-    return {"query": query_string, "results": results}
@@ -4,15 +4,20 @@ Basic streamlit application to demonstrate retrieval augmented generative
 """
 
 import logging
+from typing import Any, Iterator
 
 import pandas as pd
 import streamlit as st
 import yaml
 
+from ingestion import stores
+from rag.cache import SemanticCache
+from rag.metrics import Metrics
 from rag.wrappers import RagPipelineWrapper
 
 with open("config.yml", "r") as config_file:
     config = yaml.safe_load(config_file)
+stores.configure(config)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,20 +28,63 @@ pipeline_file = f"{config["pipelines-dir"]}/{config["rag-demo"]["pipeline"]}"
 chroma_path = config["vector-db"]["path"]
 collection = config["vector-db"]["collection"]
 prompt = config["rag-demo"]["prompt"]
-rag_pipe = RagPipelineWrapper(
-    pipeline_file,
-    chroma_path=chroma_path,
-    collection=collection,
-    prompt=prompt,
-)
+cache_config = config["rag-demo"].get("cache")
+warm_up_config = config["rag-demo"].get("warm-up", {})
+metrics_config = config["rag-demo"].get("metrics", {})
+
+
+@st.cache_resource
+def get_rag_pipe() -> RagPipelineWrapper:
+    """
+    Returns the pipeline wrapper shared by all sessions of the app, created
+    once per process rather than on every rerun. It is warmed up in the
+    background, so the page loads while the pipeline and models do.
+    """
+    wrapper = RagPipelineWrapper(
+        pipeline_file,
+        cache=SemanticCache(**cache_config) if cache_config else None,
+        chroma_path=chroma_path,
+        collection=collection,
+        prompt=prompt,
+        keep_alive=config["rag-demo"].get("keep_alive"),
+        metrics=Metrics(window=metrics_config.get("window", 1000)),
+    )
+    if warm_up_config.get("enabled", True):
+        wrapper.warm_up_in_background()
+    return wrapper
+
+
+rag_pipe = get_rag_pipe()
 example_prompts = config["rag-demo"]["examples"]
+debug_panel = metrics_config.get("panel", False)
 
 
-@st.cache_data
 def query(query: str) -> tuple[str, pd.DataFrame]:
     return rag_pipe.query(query)
 
 
+def stream(query: str) -> Iterator[tuple[str, Any]]:
+    return rag_pipe.stream(query)
+
+
+def metrics_panel() -> None:
+    """
+    Shows the percentiles of the time taken by each stage of the pipeline
+    and the other metrics recorded by the pipeline wrapper in this process.
+    """
+    summary = rag_pipe.metrics.summary()
+    if summary.empty:
+        st.info("No queries have been run yet.")
+        return
+    stages = summary[summary["metric"] == "component_seconds"]
+    if not stages.empty:
+        st.markdown("Seconds per stage at p50, p95 and p99")
+        st.line_chart(stages.set_index("component")[["p50", "p95", "p99"]].T)
+    st.dataframe(
+        summary.drop(columns=["pipeline"], errors="ignore"), hide_index=True
+    )
+
+
 def setup_css() -> None:
     """
     Modifies css for primary button types to display as textual links.
@@ -115,6 +163,7 @@ def main() -> None:
                 st.session_state.messages.append(
                     {"role": "user", "content": example, "avatar": USER_AVATAR}
                 )
+        show_metrics = st.toggle("Show pipeline metrics", value=debug_panel)
 
     for message in st.session_state.messages:
         with st.chat_message(message["role"], avatar=message["avatar"]):
@@ -129,18 +178,36 @@ def main() -> None:
 
     if st.session_state.messages[-1]["role"] != "llm":
         with st.chat_message("llm", avatar=LLM_AVATAR):
-            with st.spinner("Thinking..."):
-                answer, scores = query(
+            datasets = []
+
+            def tokens():
+                # Cached answers are not streamed, so yield them whole.
+                streamed = False
+                for event, value in stream(
                     st.session_state.messages[-1]["content"]
-                )
-                st.write(answer)
-                message = {
-                    "role": "llm",
-                    "content": answer,
-                    "avatar": LLM_AVATAR,
-                }
-                st.session_state.messages.append(message)
-                st.dataframe(scores, hide_index=True)
+                ):
+                    if event == "datasets":
+                        datasets.append(value)
+                    elif event == "token":
+                        streamed = True
+                        yield value
+                    elif event == "answer" and not streamed:
+                        yield value
+
+            with st.spinner("Thinking..."):
+                answer = st.write_stream(tokens())
+            message = {
+                "role": "llm",
+                "content": answer,
+                "avatar": LLM_AVATAR,
+            }
+            st.session_state.messages.append(message)
+            if datasets:
+                st.dataframe(datasets[-1], hide_index=True)
+
+    if show_metrics:
+        with st.expander("Pipeline metrics", expanded=True):
+            metrics_panel()
 
 
 if __name__ == "__main__":
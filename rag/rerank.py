@@ -0,0 +1,113 @@
+"""
+Cross-encoder re-ranking of retrieved documents.
+
+The retriever over-fetches candidates by vector similarity, which is fast but
+approximate, and a small cross-encoder re-scores each candidate against the
+query on the CPU, so that only the few most relevant documents are passed on
+to the prompt.
+"""
+
+import time
+from haystack import Document, component, default_to_dict, logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@component
+class CrossEncoderRanker:
+    """
+    Re-ranks documents by the score a sentence-transformers cross-encoder
+    gives each (query, document) pair, keeping the `top_k` best. Pairs are
+    scored in batches of `batch_size`. The model is loaded by `warm_up`,
+    which the pipeline calls before its first run.
+    """
+
+    def __init__(
+        self,
+        model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        top_k: int = 5,
+        batch_size: int = 16,
+        device: str = "cpu",
+        max_length: int = 512,
+    ):
+        """
+        :param model: Name or path of the cross-encoder model.
+        :param top_k: Number of documents to keep.
+        :param batch_size: Number of pairs scored at once.
+        :param device: Device the model runs on.
+        :param max_length: Maximum number of tokens in a pair, longer pairs
+            are truncated.
+        """
+        self.model_name = model
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.device = device
+        self.max_length = max_length
+        self.model = None
+
+    def to_dict(self):
+        return default_to_dict(
+            self,
+            model=self.model_name,
+            top_k=self.top_k,
+            batch_size=self.batch_size,
+            device=self.device,
+            max_length=self.max_length,
+        )
+
+    def warm_up(self):
+        if self.model is None:
+            from sentence_transformers import CrossEncoder
+
+            self.model = CrossEncoder(
+                self.model_name,
+                device=self.device,
+                max_length=self.max_length,
+            )
+
+    @component.output_types(documents=List[Document])
+    def run(
+        self,
+        query: str,
+        documents: List[Document],
+        top_k: Optional[int] = None,
+    ):
+        """
+        :param query: The query the documents are ranked against.
+        :param documents: The candidate documents.
+        :param top_k: Number of documents to keep, defaults to the `top_k`
+            given to the constructor.
+        :returns: A dictionary with the following keys:
+            - `documents`: The best documents, with the cross-encoder score,
+              highest first.
+        """
+        if not documents:
+            return {"documents": []}
+        self.warm_up()
+        start = time.perf_counter()
+        scores = self.model.predict(
+            [(query, doc.content or "") for doc in documents],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        ranked = sorted(
+            zip(documents, scores), key=lambda pair: pair[1], reverse=True
+        )
+        logger.info(
+            "Re-ranked {documents} documents in {seconds:.3f}s",
+            documents=len(documents),
+            seconds=time.perf_counter() - start,
+        )
+        return {
+            "documents": [
+                Document(
+                    id=doc.id,
+                    content=doc.content,
+                    meta=doc.meta,
+                    embedding=doc.embedding,
+                    score=float(score),
+                )
+                for doc, score in ranked[: top_k or self.top_k]
+            ]
+        }
@@ -0,0 +1,254 @@
+from concurrent.futures import ThreadPoolExecutor
+from haystack import Document, component, default_from_dict, default_to_dict
+from haystack_integrations.components.retrievers.chroma import (
+    ChromaQueryTextRetriever,
+)
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+from ingestion.bm25 import BM25Index
+from ingestion.stores import document_store_from_dict
+from typing import Any, Dict, List, Optional
+
+
+def similarity(distance: float, space: str = "l2") -> float:
+    """
+    Converts a Chroma distance to a similarity, higher for closer documents,
+    like the scores of the other retrievers and rankers. For normalised
+    embeddings, as made by the default embedding function, this is the cosine
+    similarity in every distance space: Chroma's `l2` space is the squared
+    euclidean distance, 2 - 2 cos, while `cosine` and `ip` are 1 - cos.
+    """
+    return 1 - distance / 2 if space == "l2" else 1 - distance
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]], k: int = 60
+) -> List[Document]:
+    """
+    Fuses rankings of documents by reciprocal rank, scoring each document by
+    the sum of 1 / (k + rank) over the rankings it appears in. Returns the
+    documents highest scoring first, with the fused score.
+    """
+    scores, documents = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc.id] = scores.get(doc.id, 0.0) + 1 / (k + rank)
+            documents.setdefault(doc.id, doc)
+    fused = []
+    for doc_id in sorted(scores, key=scores.get, reverse=True):
+        doc = documents[doc_id]
+        fused.append(
+            Document(
+                id=doc.id,
+                content=doc.content,
+                meta=doc.meta,
+                embedding=doc.embedding,
+                score=scores[doc_id],
+            )
+        )
+    return fused
+
+
+@component
+class ChromaWhereRetriever(ChromaQueryTextRetriever):
+    """
+    Retrieves documents like `ChromaQueryTextRetriever`, but passes filters to
+    the Chroma collection as a `where` filter as they are. The document
+    store's own filter handling turns every list value into an `$or` of its
+    items, so filters combining conditions with `$and` or `$or`, such as the
+    spatial filter, cannot be given to `ChromaQueryTextRetriever`. The
+    document store is the shared one of `ingestion.stores`.
+
+    Documents are scored by their similarity to the query rather than
+    Chroma's distance, so that higher scores are better, as they are for the
+    hybrid retriever and the re-ranker.
+    """
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChromaWhereRetriever":
+        init_params = data["init_parameters"]
+        init_params["document_store"] = document_store_from_dict(
+            init_params["document_store"]
+        )
+        return default_from_dict(cls, data)
+
+    @component.output_types(documents=List[Document])
+    def run(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+    ):
+        """
+        :param query: The plain-text query.
+        :param filters: Chroma `where` filter, or None to use the filters
+            given to the constructor.
+        :param top_k: The maximum number of documents to retrieve.
+        :returns: A dictionary with the following keys:
+            - `documents`: The retrieved documents.
+        """
+        return {"documents": self.run_batch([query], filters, top_k)[0]}
+
+    def run_batch(
+        self,
+        queries: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        query_embeddings: Optional[List[List[float]]] = None,
+    ) -> List[List[Document]]:
+        """
+        Retrieves the documents of several queries with a single query of
+        the Chroma collection, embedding the queries in one call unless their
+        embeddings are given.
+
+        :param queries: The plain-text queries.
+        :param filters: Chroma `where` filter applied to every query, or None
+            to use the filters given to the constructor.
+        :param top_k: The maximum number of documents to retrieve per query.
+        :param query_embeddings: Embeddings of the queries, if already
+            calculated.
+        :returns: The retrieved documents of each query, scored by
+            similarity.
+        """
+        if not queries:
+            return []
+        filters = filters if filters is not None else self.filters
+        document_store = self.document_store
+        search = (
+            {"query_texts": queries}
+            if query_embeddings is None
+            else {"query_embeddings": query_embeddings}
+        )
+        result = document_store._collection.query(
+            **search,
+            n_results=top_k or self.top_k,
+            where=filters or None,
+            include=["embeddings", "documents", "metadatas", "distances"],
+        )
+        space = (document_store._collection.metadata or {}).get(
+            "hnsw:space", "l2"
+        )
+        batch = document_store._query_result_to_documents(result)
+        for documents in batch:
+            for doc in documents:
+                doc.score = similarity(doc.score, space)
+        return batch
+
+
+@component
+class HybridRetriever(ChromaWhereRetriever):
+    """
+    Retrieves documents with both dense vector search in Chroma and BM25
+    keyword search in a `BM25Index` built alongside the collection during
+    ingestion. The two searches run in parallel, each fetching `candidates`
+    documents, and their rankings are fused with reciprocal rank fusion, so
+    that exact terms such as acronyms and species names are found without
+    increasing `top_k`.
+    """
+
+    def __init__(
+        self,
+        document_store: ChromaDocumentStore,
+        bm25_index: str,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        candidates: int = 20,
+        rrf_k: int = 60,
+    ):
+        """
+        :param document_store: An instance of `ChromaDocumentStore`.
+        :param bm25_index: Path to the BM25 index of the collection.
+        :param filters: Chroma `where` filter applied to both searches.
+        :param top_k: The maximum number of documents to retrieve.
+        :param candidates: Number of documents fetched by each search.
+        :param rrf_k: Constant k of reciprocal rank fusion, larger values
+            give lower ranked documents more weight.
+        """
+        # Not super(), as the component decorator recreates the class.
+        ChromaWhereRetriever.__init__(
+            self, document_store, filters=filters, top_k=top_k
+        )
+        self.bm25_index = bm25_index
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.bm25 = BM25Index(bm25_index)
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="bm25"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            document_store=self.document_store.to_dict(),
+            bm25_index=self.bm25_index,
+            filters=self.filters,
+            top_k=self.top_k,
+            candidates=self.candidates,
+            rrf_k=self.rrf_k,
+        )
+
+    def keyword_search(
+        self, query: str, filters: Optional[Dict[str, Any]]
+    ) -> List[Document]:
+        """
+        Searches the BM25 index for the best `candidates` documents that
+        match the filters, which are applied to the metadata stored in the
+        index so that filtering doesn't leave fewer candidates.
+        """
+        return self.bm25.search(query, self.candidates, filters)
+
+    @component.output_types(documents=List[Document])
+    def run(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+    ):
+        """
+        :param query: The plain-text query.
+        :param filters: Chroma `where` filter, or None to use the filters
+            given to the constructor.
+        :param top_k: The maximum number of documents to retrieve.
+        :returns: A dictionary with the following keys:
+            - `documents`: The retrieved documents, with their fused score.
+        """
+        return {"documents": self.run_batch([query], filters, top_k)[0]}
+
+    def run_batch(
+        self,
+        queries: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        query_embeddings: Optional[List[List[float]]] = None,
+    ) -> List[List[Document]]:
+        """
+        Retrieves the documents of several queries, with one dense search of
+        the Chroma collection for all of them while the BM25 index is
+        searched for each in turn.
+
+        :param queries: The plain-text queries.
+        :param filters: Chroma `where` filter applied to every query, or None
+            to use the filters given to the constructor.
+        :param top_k: The maximum number of documents to retrieve per query.
+        :param query_embeddings: Embeddings of the queries, if already
+            calculated.
+        :returns: The retrieved documents of each query, with their fused
+            score.
+        """
+        filters = filters if filters is not None else self.filters
+        keyword = [
+            self.executor.submit(self.keyword_search, query, filters)
+            for query in queries
+        ]
+        dense = ChromaWhereRetriever.run_batch(
+            self,
+            queries,
+            filters=filters,
+            top_k=max(self.candidates, top_k or 0),
+            query_embeddings=query_embeddings,
+        )
+        return [
+            reciprocal_rank_fusion([documents, search.result()], self.rrf_k)[
+                : top_k or self.top_k
+            ]
+            for documents, search in zip(dense, keyword)
+        ]
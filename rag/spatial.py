@@ -0,0 +1,120 @@
+"""
+Spatial pre-filtering of retrieval by the places named in a query.
+
+Places are found with the map app's NER service and geocoded with its
+geocoder, by default offline from the bundled gazetteer only, and turned into
+a Chroma metadata filter matching the documents of datasets whose extent,
+stored by `EIDCJSONToDocument` at ingestion, intersects one of the places,
+along with datasets that have no extent at all.
+"""
+
+from haystack import component, default_to_dict, logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from ingestion.converter import EXTENT_KEYS
+from map.geocoding import Geocoder
+from map.ner import DEFAULT_MODEL, get_ner_service
+
+logger = logging.getLogger(__name__)
+
+
+def extent_filter(
+    bboxes: Sequence[Sequence[float]], include_without_extent: bool = False
+) -> Optional[Dict]:
+    """
+    Returns a Chroma `where` filter matching documents whose extent
+    intersects any of the [west, south, east, north] bounding boxes, and
+    optionally documents of datasets without an extent, or None if there are
+    no bounding boxes.
+    """
+    west, south, east, north = EXTENT_KEYS
+    conditions = [
+        {
+            "$and": [
+                {west: {"$lte": box_east}},
+                {east: {"$gte": box_west}},
+                {south: {"$lte": box_north}},
+                {north: {"$gte": box_south}},
+            ]
+        }
+        for box_west, box_south, box_east, box_north in bboxes
+    ]
+    if not conditions:
+        return None
+    if include_without_extent:
+        conditions.append({"has_extent": False})
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$or": conditions}
+
+
+@component
+class SpatialFilter:
+    """
+    Finds the places named in a query and outputs a filter for a
+    `ChromaWhereRetriever` restricting it to datasets that cover them, or None
+    if the query names no place that could be geocoded. Datasets without a
+    spatial extent, which may cover the place as well as any other, are kept
+    unless `include_without_extent` is False.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        labels: Optional[List[str]] = None,
+        geocoding: Optional[Dict[str, Any]] = None,
+        include_without_extent: bool = True,
+    ):
+        """
+        :param model: spaCy model used to find place names.
+        :param labels: Entity labels of place names, GPE and LOC by default.
+        :param geocoding: Geocoder settings, as in the `map-demo.geocoding`
+            section of the config file. Defaults to the gazetteer only, so
+            that retrieval makes no network requests.
+        :param include_without_extent: Whether the filter also matches the
+            datasets that have no spatial extent.
+        """
+        self.model = model
+        self.labels = labels or ["GPE", "LOC"]
+        self.geocoding = geocoding or {"gazetteer": True, "fallback": None}
+        self.include_without_extent = include_without_extent
+        self.ner = get_ner_service(model, tuple(self.labels))
+        self.geocoder = Geocoder.from_config(
+            {"map-demo": {"geocoding": self.geocoding}}
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(
+            self,
+            model=self.model,
+            labels=self.labels,
+            geocoding=self.geocoding,
+            include_without_extent=self.include_without_extent,
+        )
+
+    @component.output_types(filters=Optional[Dict[str, Any]], places=List[str])
+    def run(self, query: str):
+        """
+        :param query: The query to find place names in.
+        :returns: A dictionary with the following keys:
+            - `filters`: Chroma filter on the dataset extents, or None.
+            - `places`: Addresses of the places the filter covers.
+        """
+        names = self.ner.entities(self.ner(query))
+        places = [
+            place
+            for _, place in self.geocoder.locate_many(names)
+            if place is not None
+        ]
+        if places:
+            logger.info(
+                "Filtering retrieval to {places}",
+                places=[place.address for place in places],
+            )
+        return {
+            "filters": extent_filter(
+                [[*place.bounds()[0], *place.bounds()[1]] for place in places],
+                self.include_without_extent,
+            ),
+            "places": [place.address for place in places],
+        }
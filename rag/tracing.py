@@ -0,0 +1,115 @@
+"""
+Observes the components of pipeline runs through Haystack's tracing, which
+opens a span around each component a pipeline runs, rather than by wrapping
+the components' run methods.
+
+The tracer is enabled process-wide, on top of any tracer already enabled,
+such as OpenTelemetry's, which still receives every span. Listeners are
+registered per thread, as a pipeline runs its components on the thread that
+called `Pipeline.run`, so concurrent runs each only see their own components.
+"""
+
+import contextlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from haystack import tracing
+from haystack.tracing import Span, Tracer
+
+COMPONENT_RUN = "haystack.component.run"
+COMPONENT_INPUT = "haystack.component.input"
+COMPONENT_OUTPUT = "haystack.component.output"
+
+Listener = Callable[[str, Dict[str, Any], Dict[str, Any], float], None]
+
+_lock = threading.Lock()
+
+
+class ComponentSpan(Span):
+    """
+    Span of a component run that keeps the component's inputs and outputs,
+    which Haystack sets as content tags, and passes every tag on to the span
+    of the underlying tracer.
+    """
+
+    def __init__(self, span: Span) -> None:
+        self.span = span
+        self.content: Dict[str, Any] = {}
+
+    def set_tag(self, key: str, value: Any) -> None:
+        self.span.set_tag(key, value)
+
+    def set_content_tag(self, key: str, value: Any) -> None:
+        self.content[key] = value
+        self.span.set_content_tag(key, value)
+
+    def raw_span(self) -> Any:
+        return self.span.raw_span()
+
+    def get_correlation_data_for_logs(self) -> Dict[str, Any]:
+        return self.span.get_correlation_data_for_logs()
+
+
+class ComponentTracer(Tracer):
+    """
+    Tracer that calls the listener registered by the current thread with
+    `listen` after each component of a pipeline run, as
+    `listener(name, inputs, outputs, seconds)`.
+    """
+
+    def __init__(self, tracer: Tracer) -> None:
+        """
+        :param tracer: Tracer every span is also passed to.
+        """
+        self.tracer = tracer
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def trace(
+        self, operation_name: str, tags: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Span]:
+        listener = getattr(self.local, "listener", None)
+        with self.tracer.trace(operation_name, tags=tags) as span:
+            if listener is None or operation_name != COMPONENT_RUN:
+                yield span
+                return
+            span = ComponentSpan(span)
+            start = time.perf_counter()
+            yield span
+            listener(
+                tags["haystack.component.name"],
+                span.content.get(COMPONENT_INPUT, {}),
+                span.content.get(COMPONENT_OUTPUT, {}),
+                time.perf_counter() - start,
+            )
+
+    def current_span(self) -> Optional[Span]:
+        return self.tracer.current_span()
+
+    @contextlib.contextmanager
+    def listen(self, listener: Listener) -> Iterator[None]:
+        """
+        Registers a listener for the components run by the current thread
+        until the context exits.
+        """
+        previous = getattr(self.local, "listener", None)
+        self.local.listener = listener
+        try:
+            yield
+        finally:
+            self.local.listener = previous
+
+
+def component_tracer() -> ComponentTracer:
+    """
+    Returns the component tracer, enabling it as Haystack's tracer on top of
+    the one already enabled if it isn't, e.g. the first time it is used or
+    after another tracer has been enabled.
+    """
+    with _lock:
+        tracer = tracing.tracer.actual_tracer
+        if not isinstance(tracer, ComponentTracer):
+            tracer = ComponentTracer(tracer)
+            tracing.enable_tracing(tracer)
+        return tracer
@@ -1,10 +1,40 @@
+import importlib
 import logging
-from haystack import Pipeline
-from typing import Optional, List
+from haystack import Document, Pipeline
+from haystack.core.serialization import component_from_dict
+from haystack.dataclasses import ByteStream
+from haystack.dataclasses import StreamingChunk
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, List
+from typing import Tuple, Union
+import queue
+import threading
 import time
+import numpy as np
 import pandas as pd
+import requests
+import yaml
 
-DEFAULT_URL = "https://catalogue.ceh.ac.uk/eidc/documents?page=1&rows=2000&term=state%3Apublished+AND+view%3Apublic+AND+recordType%3ADataset"
+from ingestion.stores import (
+    SharedChromaDocumentStore,
+    document_store_from_dict,
+)
+from ingestion.writer import IncrementalDocumentWriter
+from rag.cache import (
+    SemanticCache,
+    cache_namespace,
+    collection_fingerprint,
+    mark_indexed,
+)
+from rag.context import estimate_tokens
+from rag.metrics import METRICS, Metrics
+from rag.tracing import component_tracer
+
+DEFAULT_URL = "https://catalogue.ceh.ac.uk/eidc/documents?term=state%3Apublished+AND+view%3Apublic+AND+recordType%3ADataset"
+DATASET_COLUMNS = ["dataset", "metadata", "documents", "score"]
+# Components of an index pipeline that stream the documents it indexes.
+SOURCE_COMPONENTS = ("fetcher", "converter")
 
 
 class PipelineWrapper:
@@ -12,51 +42,328 @@ class PipelineWrapper:
     Simple wrapper class for haystack pipelines
     """
 
-    def __init__(self, yml_file: str, **config) -> None:
+    def __init__(
+        self, yml_file: str, metrics: Optional[Metrics] = None, **config
+    ) -> None:
         """
         Constructor which takes a yaml file as a configuration for a haystack
-        pipeline.
+        pipeline, and optionally the registry metrics of its runs are
+        recorded in, by default the one shared by the whole process.
         """
         self.pipeline = None
         self.file = yml_file
+        self.name = Path(yml_file).stem
+        self.metrics = metrics if metrics is not None else METRICS
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.hooks = threading.local()
+        self.timings = threading.local()
+        self.lock = threading.Lock()
 
-    def load_pipeline(self) -> Pipeline:
+    def read_pipeline_config(self) -> str:
         """
-        Loads a pipeline for haystack from a yaml file.
+        Reads the pipeline yaml file, filling in the wrapper's configuration.
         """
-        self.logger.info(f"Loading {self.file} as pipeline source.")
         with open(self.file) as f:
-            pipeline_config = f.read().format(**self.config)
-            self.logger.debug(pipeline_config)
-            return Pipeline.loads(pipeline_config)
+            return f.read().format(**self.config)
+
+    def load_pipeline(self, exclude: Iterable[str] = ()) -> Pipeline:
+        """
+        Loads a pipeline for haystack from a yaml file, optionally without
+        the components named in `exclude` and their connections, leaving the
+        inputs they were connected to as inputs of the pipeline.
+        """
+        self.logger.info(f"Loading {self.file} as pipeline source.")
+        pipeline_config = self.read_pipeline_config()
+        self.logger.debug(pipeline_config)
+        data = yaml.safe_load(pipeline_config)
+        if exclude:
+            data["components"] = {
+                name: component
+                for name, component in data["components"].items()
+                if name not in exclude
+            }
+            data["connections"] = [
+                connection
+                for connection in data.get("connections", [])
+                if connection["sender"].split(".")[0] not in exclude
+                and connection["receiver"].split(".")[0] not in exclude
+            ]
+        pipeline = Pipeline.from_dict(data)
+        self.share_components(pipeline)
+        self.add_hooks(pipeline)
+        return pipeline
+
+    def share_components(self, pipeline: Pipeline) -> None:
+        """
+        Replaces any document stores of the pipeline's components that are
+        not already shared, e.g. those of components that create a
+        `ChromaDocumentStore` themselves, with the shared ones of
+        `ingestion.stores`.
+        """
+        for _, instance in pipeline.walk():
+            store = getattr(instance, "document_store", None)
+            if isinstance(store, ChromaDocumentStore) and not isinstance(
+                store, SharedChromaDocumentStore
+            ):
+                instance.document_store = document_store_from_dict(
+                    store.to_dict()
+                )
+
+    def add_hooks(self, pipeline: Pipeline) -> None:
+        """
+        Prepares the components of a newly loaded pipeline for the wrapper,
+        e.g. connecting callbacks, in subclasses.
+        """
+
+    def run_pipeline(
+        self, pipeline: Pipeline, data: Dict[str, Any], **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Runs a pipeline, observing its components with the component tracer
+        so that hooks registered by the current thread with `set_hooks` are
+        called with each component's inputs and outputs, and the time each
+        component takes is recorded for `stage_timings` and in the metrics.
+        Hooks and timings are per thread, so concurrent runs of the same
+        pipeline each only see their own components.
+        """
+        with component_tracer().listen(self.on_component):
+            return pipeline.run(data, **kwargs)
+
+    def on_component(
+        self,
+        name: str,
+        inputs: Dict[str, Any],
+        outputs: Dict[str, Any],
+        seconds: float,
+    ) -> None:
+        timings = getattr(self.timings, "current", None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+        self.record_component(name, outputs, seconds)
+        for hook in getattr(self.hooks, "components", []):
+            hook(name, inputs, outputs)
+
+    def record_component(
+        self, name: str, outputs: Dict[str, Any], seconds: float
+    ) -> None:
+        """
+        Records the time a component took and the number of documents it
+        output in the metrics.
+        """
+        labels = {"pipeline": self.name, "component": name}
+        self.metrics.observe("component_seconds", seconds, **labels)
+        if isinstance(outputs, dict) and isinstance(
+            outputs.get("documents"), list
+        ):
+            self.metrics.observe(
+                "component_documents", len(outputs["documents"]), **labels
+            )
+
+    def set_hooks(self, components: List[Callable] = (), **hooks) -> None:
+        """
+        Registers hooks for pipeline runs on the current thread. Component
+        hooks are called as `hook(name, inputs, outputs)` after each
+        component runs; other hooks are looked up by name by subclasses.
+        """
+        self.hooks.components = list(components)
+        for name, hook in hooks.items():
+            setattr(self.hooks, name, hook)
+
+    def clear_hooks(self) -> None:
+        """
+        Removes all hooks registered by the current thread.
+        """
+        self.hooks.__dict__.clear()
+
+    def start_timings(self) -> None:
+        """
+        Starts recording the time taken by each component in pipeline runs
+        on the current thread.
+        """
+        self.timings.current = {}
+
+    def stage_timings(self) -> Dict[str, float]:
+        """
+        Returns the seconds taken by each component since `start_timings` was
+        last called on the current thread, in the order they ran.
+        """
+        return dict(getattr(self.timings, "current", None) or {})
+
+    def load_component(self, name: str) -> Any:
+        """
+        Creates a single component from the pipeline yaml file without
+        loading the rest of the pipeline, e.g. without connecting to the
+        document store.
+        """
+        data = yaml.safe_load(self.read_pipeline_config())["components"][name]
+        module, class_name = data["type"].rsplit(".", 1)
+        cls = getattr(importlib.import_module(module), class_name)
+        return component_from_dict(cls, data, name)
 
     def get_pipeline(self) -> Pipeline:
         """
-        Retrieves the pipeline, or creates it if it doesn't exist.
+        Retrieves the pipeline, or creates it if it doesn't exist. A query
+        arriving while the pipeline is being loaded, e.g. by `warm_up`,
+        waits for it rather than loading another.
         """
         if self.pipeline is None:
-            self.pipeline = self.load_pipeline()
+            with self.lock:
+                if self.pipeline is None:
+                    self.pipeline = self.load_pipeline()
         return self.pipeline
 
+    def warm_up(self) -> None:
+        """
+        Loads and validates the pipeline and warms up its components, such
+        as loading their models, so that the first query doesn't have to.
+        """
+        start = time.perf_counter()
+        self.get_pipeline().warm_up()
+        self.logger.info(
+            f"Warmed up {self.file} in {time.perf_counter() - start:.2f}s"
+        )
+
+    def warm_up_in_background(self, **kwargs) -> threading.Thread:
+        """
+        Runs `warm_up` with the given arguments on a daemon thread, logging
+        rather than raising any error, and returns the thread.
+        """
+
+        def run():
+            try:
+                self.warm_up(**kwargs)
+            except Exception:
+                self.logger.exception(f"Failed to warm up {self.file}")
+
+        thread = threading.Thread(
+            target=run, daemon=True, name=f"warm-up-{self.name}"
+        )
+        thread.start()
+        return thread
+
+    def get_component(self, name: str):
+        """
+        Retrieves a component from the pipeline, or None if the pipeline has
+        no component with that name.
+        """
+        pipeline = self.get_pipeline()
+        if name not in pipeline.graph.nodes:
+            return None
+        return pipeline.get_component(name)
+
 
 class IndexPipelineWrapper(PipelineWrapper):
     """
-    Warpper for an index pipeline.
+    Warpper for an index pipeline. The fetcher and converter of the pipeline
+    stream the catalogue in batches of documents, and the rest of the
+    pipeline is run on each batch.
     """
 
+    def __init__(self, yml_file: str, **config) -> None:
+        super().__init__(yml_file, **config)
+        self.source_components = {}
+
+    def load_pipeline(self, exclude: Iterable[str] = ()) -> Pipeline:
+        """
+        Loads the pipeline without the fetcher and converter, leaving the
+        inputs the converter's documents were connected to as inputs of the
+        pipeline.
+        """
+        return super().load_pipeline(exclude={*exclude, *SOURCE_COMPONENTS})
+
+    def get_source_component(self, name: str) -> Any:
+        """
+        Retrieves the fetcher or converter of the pipeline, or creates it if
+        it doesn't exist.
+        """
+        if name not in self.source_components:
+            self.source_components[name] = self.load_component(name)
+        return self.source_components[name]
+
+    def batch_inputs(
+        self, documents: List[Document]
+    ) -> Dict[str, Dict[str, List[Document]]]:
+        """
+        Returns the pipeline inputs for a batch of converted documents, which
+        are passed to every component with an unconnected `documents` input,
+        such as the hash filter or, without one, the embedder.
+        """
+        return {
+            name: {"documents": documents}
+            for name, sockets in self.get_pipeline().inputs().items()
+            if "documents" in sockets
+        }
+
     def index(
         self,
         url: Optional[str] = DEFAULT_URL,
         metadata_fields: Optional[List[str]] = None,
-    ):
-        self.get_pipeline().run(
-            data={
-                "fetcher": {"urls": [url]},
-                "converter": {"metadata_fields": metadata_fields},
-            }
-        )
+    ) -> int:
+        """
+        Fetches the catalogue page by page and converts and writes each page
+        as soon as it arrives, rather than waiting for the whole catalogue.
+        """
+        fetcher = self.get_source_component("fetcher")
+        return self.index_sources(fetcher.iter_pages(url), metadata_fields)
+
+    def index_sources(
+        self,
+        sources: Iterable[Union[str, Path, ByteStream]],
+        metadata_fields: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Converts catalogue responses, either fetched pages or files saved to
+        disk, and runs the pipeline on each batch of documents, returning the
+        number of documents indexed. With an incremental writer, documents
+        that are no longer in the catalogue are deleted once every source has
+        been written, unless a source could not be converted, as its datasets
+        would be deleted too.
+        """
+        pipeline = self.get_pipeline()
+        converter = self.get_source_component("converter")
+        embedder = self.get_component("embedder")
+        writer = self.get_component("writer")
+        total = 0
+        failed = []
+        for source in sources:
+            indexed = 0
+            for documents in converter.iter_batches(
+                [source],
+                metadata_fields=metadata_fields,
+                failed_sources=failed,
+            ):
+                indexed += len(documents)
+                self.run_pipeline(pipeline, self.batch_inputs(documents))
+            name = source.meta["url"] if hasattr(source, "meta") else source
+            self.logger.info(f"Indexed {indexed} documents from {name}")
+            total += indexed
+        if isinstance(writer, IncrementalDocumentWriter):
+            if failed:
+                self.logger.warning(
+                    f"Not deleting missing documents as {len(failed)} "
+                    "sources could not be converted."
+                )
+                writer.reset()
+            else:
+                writer.delete_missing_documents()
+        mark_indexed(writer.document_store)
+        stages = self.metrics.summary("component_seconds")
+        for stage in stages.itertuples():
+            if stage.pipeline == self.name:
+                self.logger.info(
+                    f"{stage.component}: {stage.count} batches, "
+                    f"p50 {stage.p50:.3f}s, p95 {stage.p95:.3f}s, "
+                    f"p99 {stage.p99:.3f}s"
+                )
+        if embedder is not None:
+            stats = embedder.stats
+            self.logger.info(
+                f"Embedded {stats['documents']} documents at "
+                f"{stats['documents'] / (stats['seconds'] or 1):.1f} docs/s, "
+                f"{stats['cache_hits']} from cache"
+            )
+        return total
 
 
 class RagPipelineWrapper(PipelineWrapper):
@@ -64,36 +371,459 @@ class RagPipelineWrapper(PipelineWrapper):
     Wrapper class to provide easy access to a haystack pipeline.
     """
 
-    def query(self, query: str) -> tuple[str, pd.DataFrame]:
+    def __init__(
+        self,
+        yml_file: str,
+        cache: Optional[SemanticCache] = None,
+        keep_alive: Optional[str] = None,
+        **config,
+    ) -> None:
+        """
+        Constructor which takes a yaml file as a configuration for a haystack
+        pipeline, and optionally a semantic cache for answers and how long
+        Ollama keeps the LLM loaded after each generation, e.g. "30m",
+        overriding the pipeline's `keep_alive`.
+        """
+        super().__init__(yml_file, **config)
+        self.cache = cache
+        self.keep_alive = keep_alive
+        self.retrieved_pipeline = None
+        self._cache_namespace = None
+
+    def add_hooks(self, pipeline: Pipeline) -> None:
+        """
+        Makes the generator stream its tokens to the `token` hook of the
+        thread running the pipeline, and sets the generator's `keep_alive`
+        if the wrapper has one.
+        """
+        super().add_hooks(pipeline)
+        if "llm" in pipeline.graph.nodes:
+            llm = pipeline.get_component("llm")
+            if hasattr(llm, "streaming_callback"):
+                llm.streaming_callback = self._stream_token
+            if self.keep_alive is not None and hasattr(llm, "keep_alive"):
+                llm.keep_alive = self.keep_alive
+
+    def _stream_token(self, chunk: StreamingChunk) -> None:
+        if chunk.meta.get("done"):
+            self.record_generation(chunk.meta)
+        hook = getattr(self.hooks, "token", None)
+        if hook is not None and chunk.content:
+            hook(chunk.content)
+
+    def record_component(
+        self, name: str, outputs: Dict[str, Any], seconds: float
+    ) -> None:
+        """
+        Also records the size of the prompt, and the generation statistics
+        of generators that do not stream.
+        """
+        super().record_component(name, outputs, seconds)
+        if name == "prompt_builder" and "prompt" in outputs:
+            self.metrics.observe(
+                "prompt_tokens",
+                estimate_tokens(outputs["prompt"]),
+                pipeline=self.name,
+            )
+        for meta in outputs.get("meta", []) if name == "llm" else []:
+            if "eval_count" in meta:
+                self.record_generation(meta)
+
+    def record_generation(self, meta: Dict[str, Any]) -> None:
+        """
+        Records the prefill and decode statistics reported by Ollama at the
+        end of a generation, with durations in nanoseconds.
+        """
+        labels = {"pipeline": self.name}
+        if "prompt_eval_count" in meta:
+            self.metrics.observe(
+                "llm_prompt_tokens", meta["prompt_eval_count"], **labels
+            )
+        if "prompt_eval_duration" in meta:
+            self.metrics.observe(
+                "llm_prefill_seconds",
+                meta["prompt_eval_duration"] / 1e9,
+                **labels,
+            )
+        if meta.get("eval_duration"):
+            seconds = meta["eval_duration"] / 1e9
+            self.metrics.observe("llm_decode_seconds", seconds, **labels)
+            self.metrics.observe(
+                "llm_tokens_per_second",
+                meta.get("eval_count", 0) / seconds,
+                **labels,
+            )
+
+    def warm_up(self) -> None:
+        """
+        Also embeds a query, loading the embedding model of the retriever's
+        document store, and has the LLM loaded with `warm_up_llm`.
+        """
+        super().warm_up()
+        retriever = self.get_component("retriever")
+        if hasattr(retriever, "document_store"):
+            self.embed_query("warm up")
+        self.warm_up_llm()
+
+    def warm_up_llm(self) -> None:
+        """
+        Sends Ollama a request with an empty prompt, which loads the model
+        into memory without generating anything, with the generation options
+        of the pipeline so the model is not reloaded for the first query,
+        and its `keep_alive` so it stays loaded until then. Does nothing for
+        generators other than Ollama's.
+        """
+        llm = self.get_component("llm")
+        if llm is None or not hasattr(llm, "url"):
+            return
+        keep_alive = getattr(llm, "keep_alive", self.keep_alive)
+        payload = {
+            "model": llm.model,
+            "prompt": "",
+            "stream": False,
+            "options": llm.generation_kwargs,
+        }
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        start = time.perf_counter()
+        try:
+            response = requests.post(
+                llm.url, json=payload, timeout=llm.timeout
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.logger.warning(f"Could not warm up {llm.model}: {e}")
+            return
+        self.logger.info(
+            f"Loaded {llm.model} in {time.perf_counter() - start:.2f}s"
+        )
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeds queries in a single call to the embedding function of the
+        retriever's document store.
+        """
+        document_store = self.get_component("retriever").document_store
+        embeddings = document_store._collection._embedding_function(queries)
+        return [np.asarray(embedding).tolist() for embedding in embeddings]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_queries([query])[0]
+
+    def query_inputs(self, query: str) -> Dict[str, Dict[str, str]]:
+        """
+        Returns the pipeline inputs for a query, which is passed to every
+        component with an unconnected `query` input, such as the retriever,
+        prompt builder and answer builder, and optional stages like the
+        spatial filter.
+        """
+        return {
+            name: {"query": query}
+            for name, sockets in self.get_pipeline().inputs().items()
+            if "query" in sockets
+        }
+
+    def get_retrieved_pipeline(self) -> Pipeline:
+        """
+        Retrieves the pipeline without its retriever, or creates and warms it
+        up if it doesn't exist, for queries whose documents have already been
+        retrieved, e.g. by `retrieve_batch`. It is a separate instance of the
+        pipeline's other components, so is only loaded once needed.
+        """
+        if self.retrieved_pipeline is None:
+            with self.lock:
+                if self.retrieved_pipeline is None:
+                    pipeline = self.load_pipeline(exclude={"retriever"})
+                    pipeline.warm_up()
+                    self.retrieved_pipeline = pipeline
+        return self.retrieved_pipeline
+
+    def retrieved_inputs(
+        self, query: str, documents: List[Document]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the inputs of the pipeline without its retriever for a query
+        and the documents retrieved for it, which are passed to the
+        components the retriever's documents are connected to.
+        """
+        inputs = self.query_inputs(query)
+        inputs.pop("retriever", None)
+        for _, receiver, edge in self.get_pipeline().graph.out_edges(
+            "retriever", data=True
+        ):
+            if edge["from_socket"].name == "documents":
+                inputs.setdefault(receiver, {})[edge["to_socket"].name] = (
+                    documents
+                )
+        return inputs
+
+    def cache_namespace(self) -> str:
+        """
+        Returns the namespace of the pipeline's answers in the cache, from its
+        collection and its pipeline file filled in with the configuration.
+        """
+        if self._cache_namespace is None:
+            document_store = self.get_component("retriever").document_store
+            self._cache_namespace = cache_namespace(
+                document_store._collection_name, self.read_pipeline_config()
+            )
+        return self._cache_namespace
+
+    def query(
+        self,
+        query: str,
+        embedding: Optional[List[float]] = None,
+        documents: Optional[List[Document]] = None,
+    ) -> tuple[str, pd.DataFrame]:
         """
         Queries the pipeline and return the generated answer and the datasets
-        retrieved by the pipeline.
-        """
-        start = time.time()
-        results = self.get_pipeline().run(
-            {
-                "retriever": {"query": query},
-                "prompt_builder": {"query": query},
-                "answer_builder": {"query": query},
-            },
-            include_outputs_from={"prompt_builder"},
+        retrieved by the pipeline. If a semantic cache is configured, the
+        answer to a sufficiently similar previous query is returned instead,
+        looked up by the query's embedding, which is calculated unless given.
+        If the query's documents have already been retrieved, e.g. by
+        `retrieve_batch`, the pipeline is run without its retriever.
+        """
+        start = time.perf_counter()
+        if self.cache is not None:
+            if embedding is None:
+                embedding = self.embed_query(query)
+            fingerprint = collection_fingerprint(
+                self.get_component("retriever").document_store
+            )
+            namespace = self.cache_namespace()
+            cached = self.cache.get(embedding, fingerprint, namespace)
+            if cached is not None:
+                self.logger.info(
+                    f'Answered from cache "{cached.query}" '
+                    f"(similarity {cached.similarity:.3f})"
+                )
+                self.metrics.observe(
+                    "query_seconds",
+                    time.perf_counter() - start,
+                    pipeline=self.name,
+                    cached="true",
+                )
+                return cached.answer, cached.datasets
+
+        self.start_timings()
+        if documents is None:
+            pipeline = self.get_pipeline()
+            inputs = self.query_inputs(query)
+        else:
+            pipeline = self.get_retrieved_pipeline()
+            inputs = self.retrieved_inputs(query, documents)
+        results = self.run_pipeline(
+            pipeline, inputs, include_outputs_from={"prompt_builder"}
+        )
+        end = time.perf_counter()
+        self.metrics.observe(
+            "query_seconds", end - start, pipeline=self.name, cached="false"
+        )
+        stages = ", ".join(
+            f"{name} {seconds:.3f}s"
+            for name, seconds in self.stage_timings().items()
+        )
+        self.logger.info(
+            f"Queried in {(end - start):.3f}s ({stages}) with a prompt of "
+            f"about {estimate_tokens(results['prompt_builder']['prompt'])} "
+            "tokens"
         )
-        end = time.time()
-        self.logger.info(f"Queried in {(end - start):.3f}s")
         self.logger.debug(f"{results['prompt_builder']}")
         answer = results["answer_builder"]["answers"][0]
-        return answer.data, self.extract_datasets(answer)
+        datasets = self.extract_datasets(answer)
+        if self.cache is not None:
+            self.cache.put(
+                query,
+                embedding,
+                [doc.id for doc in answer.documents],
+                answer.data,
+                datasets,
+                fingerprint,
+                namespace,
+            )
+        return answer.data, datasets
+
+    def stream(self, query: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Queries the pipeline, yielding events as they happen rather than
+        waiting for the whole answer:
+        - `("datasets", DataFrame)` once the documents for the prompt have
+          been retrieved,
+        - `("token", str)` for each token as it is generated,
+        - `("answer", str)` with the full answer once generation finishes.
+        Answers from the cache produce no token events.
+        """
+        events = queue.Queue()
+
+        def on_component(name, inputs, outputs):
+            if name == "prompt_builder" and "documents" in inputs:
+                events.put(
+                    (
+                        "datasets",
+                        self.documents_to_datasets(inputs["documents"]),
+                    )
+                )
+
+        def run():
+            self.set_hooks(
+                components=[on_component],
+                token=lambda token: events.put(("token", token)),
+            )
+            try:
+                answer, datasets = self.query(query)
+                events.put(("result", (answer, datasets)))
+            except Exception as e:
+                events.put(("error", e))
+            finally:
+                self.clear_hooks()
+                events.put(None)
+
+        threading.Thread(target=run, daemon=True).start()
+        sent_datasets = False
+        while (event := events.get()) is not None:
+            name, value = event
+            if name == "error":
+                raise value
+            if name == "result":
+                answer, datasets = value
+                if not sent_datasets:
+                    yield "datasets", datasets
+                yield "answer", answer
+                continue
+            sent_datasets = sent_datasets or name == "datasets"
+            yield event
 
     def extract_datasets(self, answer) -> pd.DataFrame:
         """
         Extracts the datasets from the pipelines return object and returns
         them in a dataframe with their scores.
         """
-        docs = [doc.meta["dataset_title"] for doc in answer.documents]
-        fields = [doc.meta["eidc_metadata_key"] for doc in answer.documents]
-        scores = [doc.score for doc in answer.documents]
-        df = pd.DataFrame(
-            {"dataset": docs, "metadata": fields, "score": scores}
+        return self.documents_to_datasets(answer.documents)
+
+    def documents_to_datasets(self, documents) -> pd.DataFrame:
+        """
+        Returns the datasets of the given documents in a dataframe with their
+        scores.
+        """
+        frame = pd.DataFrame.from_records(
+            [
+                (
+                    doc.meta.get("dataset_id", doc.meta["dataset_title"]),
+                    doc.meta["dataset_title"],
+                    doc.meta["eidc_metadata_key"],
+                    doc.meta.get("retrieved_documents", 1),
+                    doc.score,
+                )
+                for doc in documents
+            ],
+            columns=["dataset_id", *DATASET_COLUMNS],
+        )
+        return aggregate_datasets(frame)
+
+    def retrieve_batch(
+        self, queries: List[str]
+    ) -> Tuple[List[Optional[List[float]]], List[Optional[List[Document]]]]:
+        """
+        Embeds several queries in one call and, if the retriever supports it,
+        retrieves their documents with one query of Chroma, for `query`.
+        Returns the embedding and the documents of each
+        query, or None for those that could not be calculated ahead of the
+        pipeline run.
+        """
+        retriever = self.get_component("retriever")
+        embeddings = None
+        if getattr(retriever, "document_store", None) is not None:
+            embeddings = self.embed_queries(queries)
+        documents = [None] * len(queries)
+        # Queries can only share a retrieval if they share its filters, so
+        # not when the filters are made per query, e.g. by the spatial filter.
+        per_query_filters = any(
+            edge["to_socket"].name == "filters"
+            for *_, edge in self.get_pipeline().graph.in_edges(
+                "retriever", data=True
+            )
+        )
+        if hasattr(retriever, "run_batch") and not per_query_filters:
+            start = time.perf_counter()
+            documents = retriever.run_batch(
+                queries, query_embeddings=embeddings
+            )
+            self.logger.info(
+                f"Retrieved documents for {len(queries)} queries in "
+                f"{time.perf_counter() - start:.3f}s"
+            )
+        return embeddings or [None] * len(queries), documents
+
+    def query_batch(
+        self, queries: List[str]
+    ) -> Tuple[List[str], pd.DataFrame]:
+        """
+        Queries the pipeline with several queries, embedding and retrieving
+        them together with `retrieve_batch` and then running the rest of the
+        pipeline for one query at a time, as a pipeline instance can only
+        run one query at once. Use `RagPipelinePool.query_batch` to send the
+        generations to the LLM concurrently.
+
+        Returns the answers in the order of the queries, and the datasets
+        retrieved for every query in a single dataframe with a row for each
+        query and dataset.
+        """
+        if not queries:
+            return [], batch_datasets([], [])
+        embeddings, documents = self.retrieve_batch(queries)
+        results = [
+            self.query(*query) for query in zip(queries, embeddings, documents)
+        ]
+        return (
+            [answer for answer, _ in results],
+            batch_datasets(queries, [datasets for _, datasets in results]),
+        )
+
+
+def batch_datasets(
+    queries: List[str], datasets: List[pd.DataFrame]
+) -> pd.DataFrame:
+    """
+    Combines the datasets retrieved for each of several queries into a single
+    dataframe with a row for each query and dataset.
+    """
+    if not queries:
+        return pd.DataFrame(columns=["query", *DATASET_COLUMNS])
+    combined = pd.concat(
+        [frame.assign(query=query) for query, frame in zip(queries, datasets)],
+        ignore_index=True,
+    )
+    return combined[["query", *DATASET_COLUMNS]]
+
+
+def aggregate_datasets(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates a dataframe with a row for each retrieved document into a row
+    for each dataset, by `dataset_id`, with the best score of its documents,
+    the number of documents and the metadata fields they came from. Rows are
+    sorted by score, highest first, as every retriever and ranker scores
+    documents higher the more relevant they are.
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=DATASET_COLUMNS)
+    datasets = frame.groupby("dataset_id", sort=False).agg(
+        dataset=("dataset", "first"),
+        metadata=("metadata", join_fields),
+        documents=("documents", "sum"),
+        score=("score", "max"),
+    )
+    return datasets.sort_values("score", ascending=False, ignore_index=True)[
+        DATASET_COLUMNS
+    ]
+
+
+def join_fields(fields: pd.Series) -> str:
+    """
+    Joins metadata field names, some of which may already be joined, without
+    repeating any.
+    """
+    return ", ".join(
+        dict.fromkeys(
+            name for value in fields for name in str(value).split(", ")
         )
-        df.sort_values("score", inplace=True, ascending=False)
-        return df
+    )
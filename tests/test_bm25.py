@@ -0,0 +1,116 @@
+"""
+Unit tests for the BM25 keyword index.
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from haystack import Document
+
+from ingestion.bm25 import BM25Index, keyword_query, where_clause
+
+
+def make_document(id, content, content_hash=None, **meta):
+    return Document(
+        id=id,
+        content=content,
+        meta={
+            "dataset_title": id,
+            "content_hash": content_hash or content,
+            **meta,
+        },
+    )
+
+
+class TestBM25Index(TestCase):
+    """
+    Test class for the persistent BM25 index.
+    """
+
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.write(
+            [
+                make_document("cs", "Countryside Survey soil carbon"),
+                make_document("lcm", "Land Cover Map (LCM) of Great Britain"),
+                make_document(
+                    "bees", "Bombus terrestris neonicotinoid trials"
+                ),
+            ]
+        )
+
+    def test_keyword_query(self):
+        assert keyword_query("What is the LCM?") == '"lcm"'
+        assert keyword_query('soil "NOT" NEAR(') == '"soil" OR "not" OR "near"'
+        assert keyword_query("Where is the data?") is None
+
+    def test_search(self):
+        results = self.index.search("Which datasets mention LCM?")
+        assert [doc.id for doc in results] == ["lcm"]
+        assert results[0].meta["dataset_title"] == "lcm"
+        assert results[0].score > 0
+        results = self.index.search("bombus soils")
+        assert sorted(doc.id for doc in results) == ["bees", "cs"]
+        assert self.index.search("the") == []
+
+    def test_filtered_search(self):
+        self.index.write(
+            [
+                make_document("soil", "Soil moisture", west=-3.0, east=-1.0),
+                make_document("peat", "Peat soil", west=1.0, east=2.0),
+                make_document("clay", "Clay soil", has_extent=False),
+            ]
+        )
+        # The top match is filtered out before the results are cut, so the
+        # best matching document inside the box is still returned.
+        results = self.index.search(
+            "soil", top_k=1, filters={"west": {"$gte": 0.0}}
+        )
+        assert [doc.id for doc in results] == ["peat"]
+        results = self.index.search(
+            "soil",
+            filters={
+                "$or": [
+                    {
+                        "$and": [
+                            {"west": {"$lte": -2.0}},
+                            {"east": {"$gte": -2.0}},
+                        ]
+                    },
+                    {"has_extent": False},
+                ]
+            },
+        )
+        assert sorted(doc.id for doc in results) == ["clay", "soil"]
+        results = self.index.search(
+            "soil", filters={"dataset_title": {"$in": ["cs", "peat"]}}
+        )
+        assert sorted(doc.id for doc in results) == ["cs", "peat"]
+        results = self.index.search("soil", filters={"dataset_title": "cs"})
+        assert [doc.id for doc in results] == ["cs"]
+
+    def test_where_clause(self):
+        assert where_clause({}) == ("1", [])
+        assert where_clause({"a": {"$ne": 1}}) == (
+            "json_extract(documents.meta, ?) != ?",
+            ['$."a"', 1],
+        )
+        with self.assertRaises(ValueError):
+            where_clause({"a": {"$like": "x"}})
+
+    def test_write_replaces_and_delete(self):
+        self.index.write([make_document("cs", "Butterfly monitoring")])
+        assert self.index.search("soil") == []
+        assert [doc.id for doc in self.index.search("butterfly")] == ["cs"]
+        self.index.delete(["cs"])
+        assert self.index.search("butterfly") == []
+        assert len(self.index) == 2
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bm25.sqlite")
+            BM25Index(path).write([make_document("a", "Hedgehog survey")])
+            index = BM25Index(path)
+            assert index.hashes() == {"a": "Hedgehog survey"}
+            assert [doc.id for doc in index.search("hedgehogs")] == ["a"]
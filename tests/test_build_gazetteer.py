@@ -0,0 +1,58 @@
+"""
+Unit tests for building the gazetteer from Nominatim results.
+"""
+
+from unittest import TestCase
+
+from map.build_gazetteer import distinct_places, gazetteer_entry, qualifier
+
+
+def result(name, importance, bbox, place_class="boundary", **address):
+    west, south, east, north = bbox
+    return {
+        "display_name": f"{name}, {', '.join(address.values())}",
+        "class": place_class,
+        "importance": importance,
+        "boundingbox": [str(south), str(north), str(west), str(east)],
+        "address": address,
+        "lat": str((south + north) / 2),
+        "lon": str((west + east) / 2),
+        "osm_type": "relation",
+        "osm_id": 1,
+        "geojson": {
+            "type": "Polygon",
+            "coordinates": [
+                [[west, south], [east, south], [east, north], [west, south]]
+            ],
+        },
+    }
+
+
+class TestDistinctPlaces(TestCase):
+    """
+    Test class for finding the places a name could refer to.
+    """
+
+    def test_distinct_places(self):
+        wales = result("Newport", 0.6, [-3.1, 51.5, -2.9, 51.6], state="Wales")
+        results = [
+            # The town node within the city's boundary is the same place.
+            result("Newport", 0.5, [-3.0, 51.55, -3.0, 51.55], "place"),
+            result("Newport", 0.4, [-1.3, 50.6, -1.2, 50.7], county="IoW"),
+            result("Newport Road", 0.6, [-3.2, 51.4, -3.1, 51.5], "highway"),
+            result("Newport", 0.1, [-2.4, 52.7, -2.3, 52.8]),
+            wales,
+        ]
+        places = distinct_places(results, "Newport")
+        assert [qualifier(place, "Newport") for place in places] == [
+            "Wales",
+            "IoW",
+        ]
+
+    def test_gazetteer_entry(self):
+        entry = gazetteer_entry(
+            result("Perth", 0.5, [-3.5, 56.3, -3.4, 56.4]), "Perth", []
+        )
+        assert entry["bbox"] == [-3.5, 56.3, -3.4, 56.4]
+        assert entry["geometry"]["type"] == "Polygon"
+        assert entry["source"] == "OpenStreetMap relation 1"
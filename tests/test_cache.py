@@ -0,0 +1,127 @@
+"""
+Unit tests for the semantic answer cache.
+"""
+
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import pandas as pd
+from haystack import Document
+from haystack.dataclasses import GeneratedAnswer
+
+from rag.cache import SemanticCache, cache_namespace
+from rag.wrappers import RagPipelineWrapper
+
+
+class TestSemanticCache(TestCase):
+    """
+    Test class for the semantic cache.
+    """
+
+    def setUp(self):
+        self.datasets = pd.DataFrame(
+            {"dataset": ["test_dataset_name"], "score": [0.5]}
+        )
+
+    def put(self, cache, query, embedding, fingerprint="v1", namespace=""):
+        cache.put(
+            query,
+            embedding,
+            ["doc1"],
+            f"answer {query}",
+            self.datasets,
+            fingerprint,
+            namespace,
+        )
+
+    def test_similar_queries_hit(self):
+        cache = SemanticCache(threshold=0.9)
+        self.put(cache, "q1", [1.0, 0.0])
+        hit = cache.get([0.99, 0.05], "v1")
+        assert hit.answer == "answer q1"
+        assert hit.doc_ids == ["doc1"]
+        pd.testing.assert_frame_equal(hit.datasets, self.datasets)
+        assert cache.get([0.0, 1.0], "v1") is None
+
+    def test_invalidated_by_fingerprint(self):
+        cache = SemanticCache()
+        self.put(cache, "q1", [1.0, 0.0])
+        assert cache.get([1.0, 0.0], "v2") is None
+        assert cache.get([1.0, 0.0], "v1") is None
+
+    def test_namespaces(self):
+        cache = SemanticCache()
+        a = cache_namespace("collection-a", "prompt: one")
+        b = cache_namespace("collection-b", "prompt: one")
+        c = cache_namespace("collection-a", "prompt: two")
+        assert len({a, b, c}) == 3
+        self.put(cache, "qa", [1.0, 0.0], "a1", a)
+        self.put(cache, "qb", [1.0, 0.0], "b1", b)
+        assert cache.get([1.0, 0.0], "a1", a).query == "qa"
+        assert cache.get([1.0, 0.0], "a1", c) is None
+        # Re-indexing collection b only invalidates its own entries.
+        assert cache.get([1.0, 0.0], "b2", b) is None
+        assert cache.get([1.0, 0.0], "a1", a).query == "qa"
+
+    def test_ttl(self):
+        cache = SemanticCache(ttl=60)
+        with mock.patch("rag.cache.time.time", return_value=1000):
+            self.put(cache, "q1", [1.0, 0.0])
+        with mock.patch("rag.cache.time.time", return_value=1030):
+            assert cache.get([1.0, 0.0], "v1") is not None
+        with mock.patch("rag.cache.time.time", return_value=1061):
+            assert cache.get([1.0, 0.0], "v1") is None
+
+    def test_lru_eviction(self):
+        cache = SemanticCache(max_entries=2)
+        with mock.patch("rag.cache.time.time", side_effect=range(10)):
+            self.put(cache, "q1", [1.0, 0.0, 0.0])
+            self.put(cache, "q2", [0.0, 1.0, 0.0])
+            cache.get([1.0, 0.0, 0.0], "v1")
+            self.put(cache, "q3", [0.0, 0.0, 1.0])
+            assert cache.get([1.0, 0.0, 0.0], "v1").query == "q1"
+            assert cache.get([0.0, 1.0, 0.0], "v1") is None
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "answers.sqlite")
+            self.put(SemanticCache(path), "q1", [1.0, 0.0])
+            assert SemanticCache(path).get([1.0, 0.0], "v1").query == "q1"
+
+
+class TestRagPipelineWrapperCache(TestCase):
+    """
+    Test the RAG wrapper only runs the pipeline on cache misses.
+    """
+
+    @mock.patch("rag.wrappers.collection_fingerprint", return_value="v1")
+    @mock.patch.object(
+        RagPipelineWrapper, "read_pipeline_config", return_value="pipe"
+    )
+    @mock.patch.object(RagPipelineWrapper, "get_component")
+    @mock.patch.object(RagPipelineWrapper, "embed_query")
+    @mock.patch.object(RagPipelineWrapper, "get_pipeline")
+    def test_query_cached(self, get_pipeline, embed_query, *_):
+        document = Document(
+            content="content",
+            meta={
+                "dataset_title": "title",
+                "eidc_metadata_key": "description",
+            },
+            score=0.5,
+        )
+        answer = GeneratedAnswer(
+            data="answer", query="q", documents=[document], meta={}
+        )
+        get_pipeline.return_value.run.return_value = {
+            "answer_builder": {"answers": [answer]},
+            "prompt_builder": {"prompt": "prompt"},
+        }
+        embed_query.side_effect = [[1.0, 0.0], [0.99, 0.01]]
+        wrapper = RagPipelineWrapper("pipe.yml", cache=SemanticCache())
+        assert wrapper.query("question?")[0] == "answer"
+        answer_text, datasets = wrapper.query("question")
+        assert answer_text == "answer"
+        assert datasets["dataset"].to_list() == ["title"]
+        assert get_pipeline.return_value.run.call_count == 1
@@ -0,0 +1,56 @@
+"""
+Unit tests for field-aware chunking of metadata fields.
+"""
+
+from unittest import TestCase
+
+from ingestion.chunking import FieldChunker, count_tokens
+
+
+class TestFieldChunker(TestCase):
+    """
+    Test class for the field chunker.
+    """
+
+    def test_prose_windows_overlap(self):
+        text = " ".join(f"Sentence number {i} is here." for i in range(10))
+        # Each sentence is 8 tokens, as "Sentence" and "number" count twice.
+        chunks = FieldChunker(max_tokens=16, overlap=8).chunk("desc", text)
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk.text.split()) <= 10
+            assert text[chunk.start : chunk.end] == chunk.text
+        assert chunks[0].text.endswith("Sentence number 1 is here.")
+        assert chunks[1].text.startswith("Sentence number 1 is here.")
+        assert chunks[-1].end == len(text)
+
+    def test_count_tokens(self):
+        assert count_tokens("Soil moisture, 2019-2020.") == 8
+        assert count_tokens("") == 0
+
+    def test_reserve(self):
+        text = " ".join(f"w{i}" for i in range(20))
+        chunks = FieldChunker(max_tokens=15, overlap=0).chunk(
+            "desc", text, reserve=5
+        )
+        assert [len(chunk.text.split()) for chunk in chunks] == [10, 10]
+
+    def test_long_sentence_split_on_tokens(self):
+        text = " ".join(f"w{i}" for i in range(25))
+        chunks = FieldChunker(max_tokens=10, overlap=0).chunk("desc", text)
+        assert [len(chunk.text.split()) for chunk in chunks] == [10, 10, 5]
+
+    def test_structured_fields_flattened(self):
+        value = {"a": {"b": 1}, "keywords": [{"value": "x"}, {"value": "y"}]}
+        chunks = FieldChunker().chunk("meta", value)
+        assert [chunk.text for chunk in chunks] == [
+            "a.b: 1\nkeywords[0].value: x\nkeywords[1].value: y"
+        ]
+
+    def test_field_policies(self):
+        chunker = FieldChunker(
+            max_tokens=2, fields={"title": "whole", "desc": {"max_tokens": 4}}
+        )
+        assert len(chunker.chunk("title", "one two three")) == 1
+        assert len(chunker.chunk("desc", "one two three four")) == 1
+        assert len(chunker.chunk("other", 12345)) == 1
@@ -0,0 +1,84 @@
+"""
+Unit tests for assembling the prompt context.
+"""
+
+from unittest import TestCase
+
+from haystack import Document
+
+from ingestion.converter import content_prefix
+from rag.context import ContextBudget, estimate_tokens, merge_chunks
+
+
+def make_document(dataset, key, text, start=None, score=1.0):
+    meta = {
+        "dataset_id": dataset,
+        "dataset_title": f"Title {dataset}",
+        "eidc_metadata_key": key,
+    }
+    if start is not None:
+        meta["chunk_start"] = start
+    return Document(
+        content=content_prefix(f"Title {dataset}", key) + text,
+        meta=meta,
+        score=score,
+    )
+
+
+class TestContextBudget(TestCase):
+    """
+    Test class for the context budget component.
+    """
+
+    def test_merge_chunks(self):
+        field = "First sentence. Second sentence. Third sentence."
+        chunks = [
+            make_document("a", "description", field[16:48], start=16),
+            make_document("a", "description", field[:32], start=0),
+            make_document("a", "description", field[:32], start=0),
+        ]
+        assert merge_chunks(chunks) == field
+        assert (
+            merge_chunks(
+                [
+                    make_document("a", "lineage", "One"),
+                    make_document("a", "lineage", "One"),
+                    make_document("a", "lineage", "Two"),
+                ]
+            )
+            == "One\nTwo"
+        )
+
+    def test_groups_by_dataset(self):
+        documents = [
+            make_document("a", "description", "Soil moisture.", score=0.9),
+            make_document("b", "description", "Rainfall.", score=0.8),
+            make_document("a", "lineage", "Probes.", score=0.7),
+        ]
+        result = ContextBudget().run(documents=documents)
+        context = result["documents"]
+        assert [doc.meta["dataset_id"] for doc in context] == ["a", "b"]
+        assert context[0].content == (
+            'Dataset "Title a":\ndescription: Soil moisture.\nlineage: Probes.'
+        )
+        assert context[0].meta["eidc_metadata_key"] == "description, lineage"
+        assert context[0].score == 0.9
+        assert result["tokens"] == sum(
+            estimate_tokens(doc.content) for doc in context
+        )
+
+    def test_budget(self):
+        documents = [
+            make_document(dataset, "description", "word " * 100)
+            for dataset in "abc"
+        ]
+        result = ContextBudget(max_tokens=200, min_tokens=50).run(
+            documents=documents
+        )
+        context = result["documents"]
+        assert len(context) == 2
+        assert context[1].content.endswith("...")
+        assert result["tokens"] <= 200
+        assert (
+            len(ContextBudget(max_datasets=1).run(documents)["documents"]) == 1
+        )
@@ -1,6 +1,191 @@
-from unittest import TestCase
+"""
+Unit tests for the EIDC JSON converter.
+"""
 
+import json
+from pathlib import Path
+from unittest import TestCase, skipUnless
+
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+from haystack.dataclasses import ByteStream
+
+from ingestion.chunking import count_tokens
+from ingestion.converter import (
+    EXTENT_KEYS,
+    EIDCJSONToDocument,
+    document_id,
+)
+from rag.wrappers import IndexPipelineWrapper
+
+
+# Tokens read by the default embedding model, including its two special
+# tokens, and the tokenizer it uses once downloaded.
+MODEL_MAX_TOKENS = 256
+MODEL_TOKENIZER = (
+    Path(ONNXMiniLM_L6_V2.DOWNLOAD_PATH)
+    / ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME
+    / "tokenizer.json"
+)
+LONG_DESCRIPTION = " ".join(
+    f"Sample {i} of the hydrogeological survey (2019-2020) measured "
+    f"soil moisture at 0.{i}m depth, c. {i * 37} mm/yr; see doi:10.5285/"
+    f"{i:08x}-acde."
+    for i in range(60)
+)
+
+
+class TestEIDCJSONToDocument(TestCase):
+    """
+    Test class for the EIDC JSON converter component.
+    """
+
+    def setUp(self):
+        self.response = {
+            "results": [
+                {
+                    "identifier": "id1",
+                    "title": "title1",
+                    "description": "description1",
+                    "lineage": "lineage1",
+                },
+                {
+                    "identifier": "id2",
+                    "title": "title2",
+                    "description": "description2",
+                    "lineage": "lineage2",
+                },
+            ]
+        }
+
+    def convert(self, response, metadata_fields=None):
+        source = ByteStream(data=json.dumps(response).encode("utf-8"))
+        return EIDCJSONToDocument().run(
+            sources=[source], metadata_fields=metadata_fields
+        )["documents"]
 
-class TestMapApp(TestCase):
     def test_run(self):
-        pass
+        docs = self.convert(self.response, ["description"])
+        assert len(docs) == 2
+        assert docs[0].meta["dataset_id"] == "id1"
+        assert docs[0].meta["eidc_metadata_key"] == "description"
+        assert "description1" in docs[0].content
+
+    def test_stable_ids_and_hashes(self):
+        docs = self.convert(self.response, ["description", "lineage"])
+        assert docs[0].id == document_id("id1", "description")
+        assert len({doc.id for doc in docs}) == 4
+
+        self.response["results"][0]["description"] = "changed"
+        changed = self.convert(self.response, ["description", "lineage"])
+        assert [doc.id for doc in changed] == [doc.id for doc in docs]
+        hashes = [doc.meta["content_hash"] for doc in docs]
+        changed_hashes = [doc.meta["content_hash"] for doc in changed]
+        assert changed_hashes[0] != hashes[0]
+        assert changed_hashes[1:] == hashes[1:]
+
+    def test_iter_batches(self):
+        source = ByteStream(data=json.dumps(self.response).encode("utf-8"))
+        batches = list(
+            EIDCJSONToDocument(batch_size=3).iter_batches(
+                [source], ["description", "lineage"]
+            )
+        )
+        assert [len(batch) for batch in batches] == [3, 1]
+        streamed = [doc.id for batch in batches for doc in batch]
+        converted = self.convert(self.response, ["description", "lineage"])
+        assert streamed == [doc.id for doc in converted]
+
+    def test_iter_batches_records_failed_sources(self):
+        data = json.dumps(self.response).encode("utf-8")
+        truncated = ByteStream(data=data[:-10])
+        failed = []
+        batches = list(
+            EIDCJSONToDocument().iter_batches(
+                [truncated, ByteStream(data=data)],
+                ["description"],
+                failed_sources=failed,
+            )
+        )
+        assert failed == [truncated]
+        assert sum(len(batch) for batch in batches) > 0
+
+    def test_chunking(self):
+        self.response["results"][0]["description"] = "First. Second. Third."
+        converter = EIDCJSONToDocument(chunking={"max_tokens": 1})
+        source = ByteStream(data=json.dumps(self.response).encode("utf-8"))
+        docs = converter.run(
+            sources=[source], metadata_fields=["description"]
+        )["documents"]
+        first = [doc for doc in docs if doc.meta["dataset_id"] == "id1"]
+        assert [doc.meta["chunk_index"] for doc in first] == [0, 1, 2]
+        assert first[1].meta["chunk_start"] == 7
+        assert first[1].content.endswith("Second.")
+        assert first[0].id == document_id("id1", "description")
+        assert len({doc.id for doc in docs}) == len(docs)
+
+    def test_extent(self):
+        self.response["results"][0]["boundingBoxes"] = [
+            {
+                "westBoundLongitude": -3.5,
+                "eastBoundLongitude": -2.0,
+                "southBoundLatitude": 54.0,
+                "northBoundLatitude": 55.0,
+            },
+            {
+                "westBoundLongitude": -1.0,
+                "eastBoundLongitude": 1.5,
+                "southBoundLatitude": 51.0,
+                "northBoundLatitude": 52.0,
+            },
+        ]
+        self.response["results"][1]["locations"] = [
+            "POLYGON((-1.2 51.5, -1.0 51.5, -1.0 51.7, -1.2 51.5))",
+            "POINT(-1.5e0 5.18E+1)",
+        ]
+        docs = self.convert(self.response, ["description"])
+        assert [docs[0].meta[key] for key in EXTENT_KEYS] == [
+            -3.5,
+            51.0,
+            1.5,
+            55.0,
+        ]
+        assert [docs[1].meta[key] for key in EXTENT_KEYS] == [
+            -1.5,
+            51.5,
+            -1.0,
+            51.8,
+        ]
+        assert docs[1].meta["has_extent"]
+        del self.response["results"][1]["locations"]
+        docs = self.convert(self.response, ["description"])
+        assert not set(EXTENT_KEYS) & set(docs[1].meta)
+        assert docs[1].meta["has_extent"] is False
+
+    def pipeline_documents(self):
+        """
+        Converts a long description with the chunking of the index pipeline.
+        """
+        converter = IndexPipelineWrapper(
+            "pipelines/index-pipe.yml", chroma_path="unused", collection="c"
+        ).load_component("converter")
+        self.response["results"][0]["title"] = " ".join(["Long title"] * 15)
+        self.response["results"][0]["description"] = LONG_DESCRIPTION
+        source = ByteStream(data=json.dumps(self.response).encode("utf-8"))
+        docs = converter.run(
+            sources=[source], metadata_fields=["description"]
+        )["documents"]
+        assert len(docs) > 5
+        return docs
+
+    def test_chunks_fit_model(self):
+        for doc in self.pipeline_documents():
+            assert count_tokens(doc.content) + 2 <= MODEL_MAX_TOKENS
+
+    @skipUnless(MODEL_TOKENIZER.exists(), "Embedding model not downloaded")
+    def test_chunks_fit_model_tokenizer(self):
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_file(str(MODEL_TOKENIZER))
+        for doc in self.pipeline_documents():
+            tokens = len(tokenizer.encode(doc.content).ids)
+            assert tokens <= MODEL_MAX_TOKENS
@@ -0,0 +1,96 @@
+"""
+Unit tests for the cached document embedder.
+"""
+
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from haystack import Document
+
+from ingestion.embedder import (
+    CachedDocumentEmbedder,
+    shared_embedding_function,
+)
+
+
+class CountingEmbeddingFunction:
+    """
+    Fake embedding function recording the texts it is asked to embed.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class TestCachedDocumentEmbedder(TestCase):
+    """
+    Test class for the cached document embedder component.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "cache.sqlite")
+        self.function = CountingEmbeddingFunction()
+        patcher = mock.patch(
+            "ingestion.embedder.get_embedding_function",
+            return_value=self.function,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        shared = mock.patch.dict(
+            "ingestion.embedder._embedding_functions", clear=True
+        )
+        shared.start()
+        self.addCleanup(shared.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def embedder(self, **kwargs):
+        return CachedDocumentEmbedder(
+            batch_size=2, cache_path=self.cache_path, **kwargs
+        )
+
+    def test_embeds_in_batches(self):
+        docs = [Document(content=text) for text in ["a", "bb", "ccc", "bb"]]
+        result = self.embedder().run(documents=docs)["documents"]
+        assert [doc.embedding for doc in result] == [
+            [1.0, 1.0],
+            [2.0, 1.0],
+            [3.0, 1.0],
+            [2.0, 1.0],
+        ]
+        assert sorted(self.function.calls) == [["a", "bb"], ["ccc"]]
+
+    def test_reuses_cache_between_runs(self):
+        self.embedder().run(documents=[Document(content="a")])
+        embedder = self.embedder()
+        docs = [Document(content="a"), Document(content="new")]
+        embedder.run(documents=docs)
+        assert self.function.calls == [["a"], ["new"]]
+        assert embedder.stats["cache_hits"] == 1
+        assert docs[0].embedding == [1.0, 1.0]
+
+    def test_cache_keyed_by_model(self):
+        self.embedder().run(documents=[Document(content="a")])
+        self.embedder(model_name="other").run(
+            documents=[Document(content="a")]
+        )
+        assert self.function.calls == [["a"], ["a"]]
+
+    def test_embedding_function_shared(self):
+        first, second = self.embedder(), self.embedder()
+        first.warm_up()
+        second.warm_up()
+        assert first._function is second._function
+        assert shared_embedding_function("default") is first._function
+        with mock.patch(
+            "ingestion.embedder.get_embedding_function",
+            side_effect=lambda *args, **kwargs: CountingEmbeddingFunction(),
+        ):
+            other = self.embedder(model_name="other")
+            other.warm_up()
+        assert other._function is not first._function
@@ -0,0 +1,94 @@
+"""
+Unit tests for the paged EIDC fetcher, served by a local fixture server.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import parse_qs, urlsplit
+
+from ingestion.fetcher import EIDCPagedFetcher
+
+TOTAL = 23
+
+
+class CataloguePageHandler(BaseHTTPRequestHandler):
+    """
+    Serves canned catalogue pages of TOTAL datasets, failing the first
+    request for each page listed in `failures`.
+    """
+
+    failures = set()
+    requests = []
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        page, rows = int(query["page"][0]), int(query["rows"][0])
+        self.requests.append(page)
+        if page in self.failures:
+            self.failures.discard(page)
+            self.send_response(503)
+            self.end_headers()
+            return
+        start = (page - 1) * rows
+        results = [
+            {"identifier": f"id{i}", "title": f"title{i}"}
+            for i in range(start, min(start + rows, TOTAL))
+        ]
+        body = json.dumps({"numFound": TOTAL, "results": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestEIDCPagedFetcher(TestCase):
+    """
+    Test class for the paged fetcher component.
+    """
+
+    def setUp(self):
+        CataloguePageHandler.failures = set()
+        CataloguePageHandler.requests = []
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), CataloguePageHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = (
+            f"http://127.0.0.1:{self.server.server_port}/documents?term=x"
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def identifiers(self, streams):
+        return sorted(
+            dataset["identifier"]
+            for stream in streams
+            for dataset in json.loads(stream.data)["results"]
+        )
+
+    def test_fetches_all_pages(self):
+        fetcher = EIDCPagedFetcher(rows=5, max_workers=3)
+        streams = fetcher.run(urls=[self.url])["streams"]
+        assert len(streams) == 5
+        assert self.identifiers(streams) == sorted(
+            f"id{i}" for i in range(TOTAL)
+        )
+
+    def test_retries_failed_pages(self):
+        CataloguePageHandler.failures = {3}
+        fetcher = EIDCPagedFetcher(rows=5, backoff=0)
+        streams = list(fetcher.iter_pages(self.url))
+        assert len(streams) == 5
+        assert CataloguePageHandler.requests.count(3) == 2
+
+    def test_page_url_overrides_paging(self):
+        fetcher = EIDCPagedFetcher(rows=10)
+        url = fetcher.page_url("http://host/docs?page=1&rows=2000&term=a", 4)
+        assert url == "http://host/docs?term=a&page=4&rows=10"
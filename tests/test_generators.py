@@ -0,0 +1,40 @@
+"""
+Unit tests for the LLM generators.
+"""
+
+from unittest import TestCase, mock
+
+from rag.generators import KeepAliveOllamaGenerator
+
+
+class TestKeepAliveOllamaGenerator(TestCase):
+    """
+    Test class for the Ollama generator that sends `keep_alive`.
+    """
+
+    def test_payload(self):
+        llm = KeepAliveOllamaGenerator(keep_alive="30m", model="llama3.1")
+        payload = llm._create_json_payload("prompt", False, {"num_ctx": 8})
+        assert payload["keep_alive"] == "30m"
+        assert payload["options"] == {"num_ctx": 8}
+        assert "keep_alive" not in KeepAliveOllamaGenerator(
+            model="llama3.1"
+        )._create_json_payload("prompt", False)
+
+    @mock.patch("requests.post")
+    def test_run(self, post):
+        post.return_value.json.return_value = {
+            "response": "The answer.",
+            "done": True,
+        }
+        llm = KeepAliveOllamaGenerator(keep_alive="30m", model="llama3.1")
+        assert llm.run("prompt")["replies"] == ["The answer."]
+        assert post.call_args.kwargs["json"]["keep_alive"] == "30m"
+
+    def test_serialisation(self):
+        llm = KeepAliveOllamaGenerator(keep_alive="30m", model="llama3.1")
+        data = llm.to_dict()
+        assert data["init_parameters"]["keep_alive"] == "30m"
+        restored = KeepAliveOllamaGenerator.from_dict(data)
+        assert restored.keep_alive == "30m"
+        assert restored.model == "llama3.1"
@@ -0,0 +1,178 @@
+"""
+Unit tests for geocoding place names in the map app.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase, mock
+
+from map.geocoding import (
+    Gazetteer,
+    GeocodeCache,
+    Geocoder,
+    Place,
+    TokenBucket,
+)
+
+
+def stub_place(query):
+    return Place(
+        address=f"{query}, UK",
+        latitude=51.0,
+        longitude=-1.0,
+        geojson={"type": "Point", "coordinates": [-1.0, 51.0]},
+    )
+
+
+class TestGazetteer(TestCase):
+    """
+    Test class for the bundled UK gazetteer.
+    """
+
+    def test_locate(self):
+        gazetteer = Gazetteer()
+        assert gazetteer.locate("london").address == "London"
+        wales = gazetteer.locate("Cymru")
+        assert wales.address == "Wales"
+        assert wales.bounds()[0][0] < wales.longitude < wales.bounds()[1][0]
+        assert gazetteer.locate("the U.K.").address == "United Kingdom"
+        assert gazetteer.locate("Atlantis") is None
+
+    def test_ambiguous_names(self):
+        gazetteer = Gazetteer()
+        # Names of several places, or of better known places outside the
+        # UK, are left to the fallback geocoder.
+        assert gazetteer.locate("Newport") is None
+        assert gazetteer.locate("Perth") is None
+        newport = gazetteer.locate("Newport, Wales")
+        assert newport.address == "Newport, Wales"
+        assert gazetteer.locate("perth scotland").address == "Perth, Scotland"
+        assert len(gazetteer.ambiguous["newport"]) == 3
+
+    def test_boundary_geometry(self):
+        polygon = {
+            "type": "Polygon",
+            "coordinates": [[[-1, 51], [-0.5, 51], [-0.5, 52], [-1, 51]]],
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "gazetteer.json")
+            with open(path, "w") as f:
+                json.dump(
+                    [
+                        {
+                            "name": "Somewhere",
+                            "latitude": 51.5,
+                            "longitude": -0.75,
+                            "geometry": polygon,
+                        }
+                    ],
+                    f,
+                )
+            place = Gazetteer(path).locate("somewhere")
+        assert place.geojson == polygon
+        assert place.bounds() == [[-1, 51], [-0.5, 52]]
+
+
+class TestGeocodeCache(TestCase):
+    """
+    Test class for the persistent geocoding cache.
+    """
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "places.sqlite")
+            GeocodeCache(path).put("Wallingford", stub_place("Wallingford"))
+            found, place = GeocodeCache(path).get("wallingford")
+        assert found
+        assert place == stub_place("Wallingford")
+
+    def test_ttl_and_negative_ttl(self):
+        cache = GeocodeCache(ttl=100, negative_ttl=10)
+        with mock.patch("map.geocoding.time.time", return_value=1000):
+            cache.put("found", stub_place("found"))
+            cache.put("missing", None)
+        with mock.patch("map.geocoding.time.time", return_value=1005):
+            assert cache.get("missing") == (True, None)
+        with mock.patch("map.geocoding.time.time", return_value=1050):
+            assert cache.get("missing") == (False, None)
+            assert cache.get("found")[0]
+        with mock.patch("map.geocoding.time.time", return_value=1101):
+            assert cache.get("found") == (False, None)
+
+
+class TestGeocoder(TestCase):
+    """
+    Test class for geocoding through the gazetteer, cache and fallback.
+    """
+
+    def test_lookup_order(self):
+        fallback = mock.Mock(side_effect=[stub_place("Crowmarsh"), None])
+        geocoder = Geocoder(Gazetteer(), GeocodeCache(), fallback)
+        assert geocoder.locate("Edinburgh").address == "Edinburgh"
+        assert geocoder.locate("Crowmarsh").address == "Crowmarsh, UK"
+        assert geocoder.locate("Crowmarsh").address == "Crowmarsh, UK"
+        assert geocoder.locate("Nowhere") is None
+        assert geocoder.locate("Nowhere") is None
+        assert fallback.call_count == 2
+
+    def test_fallback_errors_not_cached(self):
+        fallback = mock.Mock(side_effect=[OSError("offline"), None])
+        geocoder = Geocoder(cache=GeocodeCache(), fallback=fallback)
+        assert geocoder.locate("Crowmarsh") is None
+        assert geocoder.locate("Crowmarsh") is None
+        assert fallback.call_count == 2
+
+    def test_from_config_with_stub_fallback(self):
+        geocoder = Geocoder.from_config(
+            {
+                "map-demo": {
+                    "geocoding": {
+                        "gazetteer": False,
+                        "fallback": "tests.test_geocoding:stub_place",
+                    }
+                }
+            }
+        )
+        assert geocoder.gazetteer is None
+        assert geocoder.locate("London").address == "London, UK"
+
+    def test_locate_many(self):
+        release = threading.Event()
+        calls = []
+
+        def fallback(query):
+            calls.append(query)
+            release.wait(5)
+            return None if query == "Nowhere" else stub_place(query)
+
+        geocoder = Geocoder(Gazetteer(), GeocodeCache(), fallback)
+        results = geocoder.locate_many(
+            ["Crowmarsh", "London", "crowmarsh", "Nowhere", "london"]
+        )
+        # Gazetteer hits are yielded before the fallback has returned.
+        assert next(results)[1].address == "London"
+        release.set()
+        remaining = dict(results)
+        assert remaining["Crowmarsh"].address == "Crowmarsh, UK"
+        assert remaining["Nowhere"] is None
+        assert sorted(calls) == ["Crowmarsh", "Nowhere"]
+
+
+class TestTokenBucket(TestCase):
+    """
+    Test class for the geocoding rate limiter.
+    """
+
+    def test_rate_limited_across_threads(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+        start = time.monotonic()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Two tokens are available at once, the other four at 20 per second.
+        assert 0.18 <= time.monotonic() - start < 1
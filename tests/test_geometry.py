@@ -0,0 +1,95 @@
+"""
+Unit tests for the map app geometry helpers.
+"""
+
+from unittest import TestCase
+
+import numpy as np
+
+from map.geometry import (
+    calc_bounds,
+    calc_geojson_bounds,
+    coordinates_array,
+    flip_coords_lat_long,
+    get_bounds,
+    simplify,
+    simplify_line,
+)
+
+
+class TestGeometry(TestCase):
+    """
+    Test class for bounds and simplification of GeoJSON geometries.
+    """
+
+    def test_calc_bounds(self):
+        data = [[-9.0234247, 57.829], [-8.153736, 56.18254824]]
+        assert calc_bounds(data) == [
+            [-9.0234247, 56.18254824],
+            [-8.153736, 57.829],
+        ]
+
+    def test_geojson_bounds_all_types(self):
+        geometries = {
+            "Point": [1, 2],
+            "MultiPoint": [[1, 2], [3, 4]],
+            "LineString": [[1, 2], [3, 4]],
+            "MultiLineString": [[[1, 2]], [[3, 4]]],
+            "Polygon": [[[1, 2], [3, 2], [3, 4], [1, 2]]],
+            "MultiPolygon": [[[[1, 2], [1, 3], [1, 2]]], [[[3, 4], [3, 4]]]],
+        }
+        for geometry_type, coordinates in geometries.items():
+            geojson = {"type": geometry_type, "coordinates": coordinates}
+            expected = [[1, 2], [1, 2]] if geometry_type == "Point" else None
+            assert calc_geojson_bounds(geojson) == (
+                expected or [[1, 2], [3, 4]]
+            ), geometry_type
+
+        collection = {
+            "type": "GeometryCollection",
+            "geometries": [
+                {"type": "Point", "coordinates": [0, 5, 100]},
+                {"type": "LineString", "coordinates": [[1, 2], [3, 4]]},
+            ],
+        }
+        assert calc_geojson_bounds(collection) == [[0, 2], [3, 5]]
+
+    def test_get_bounds_and_flip(self):
+        bounds = get_bounds(
+            [
+                {"type": "Point", "coordinates": [-3, 55]},
+                {"type": "LineString", "coordinates": [[-1, 51], [0, 52]]},
+            ]
+        )
+        assert bounds == [[-3, 51], [0, 55]]
+        assert flip_coords_lat_long(bounds) == [[51, -3], [55, 0]]
+
+    def test_simplify_line(self):
+        line = np.array([[0, 0], [1, 0.001], [2, -0.001], [3, 0], [4, 5]])
+        simplified = simplify_line(line, 0.01)
+        np.testing.assert_array_equal(simplified, [[0, 0], [3, 0], [4, 5]])
+
+    def test_simplify_polygon_keeps_rings_valid(self):
+        angles = np.linspace(0, 2 * np.pi, 1000)
+        ring = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        ring[-1] = ring[0]
+        polygon = {
+            "type": "MultiPolygon",
+            "coordinates": [[ring.tolist()], [[[5, 5], [5, 6], [6, 6]] * 2]],
+        }
+        simplified = simplify(polygon, 0.01)
+        rings = [part[0] for part in simplified["coordinates"]]
+        assert 4 <= len(rings[0]) < 100
+        assert rings[0][0] == rings[0][-1]
+        assert len(rings[1]) >= 4
+        np.testing.assert_allclose(
+            calc_geojson_bounds(simplified),
+            calc_geojson_bounds(polygon),
+            atol=0.01,
+        )
+        point = {"type": "Point", "coordinates": [1, 2]}
+        assert simplify(point, 0.01) == point
+
+    def test_coordinates_array_empty_parts(self):
+        geojson = {"type": "MultiLineString", "coordinates": [[], [[1, 2]]]}
+        assert coordinates_array(geojson).tolist() == [[1, 2]]
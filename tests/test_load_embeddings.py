@@ -0,0 +1,46 @@
+"""
+Unit tests for the ingestion command line interface.
+"""
+
+from unittest import TestCase
+
+from load_embeddings import collection_specs
+
+
+class TestCollectionSpecs(TestCase):
+    """
+    Test class for building collection specs from config and arguments.
+    """
+
+    def setUp(self):
+        self.config = {
+            "ingestion": {
+                "pipeline": "index.yml",
+                "metadata": ["description"],
+            },
+            "vector-db": {"collection": "default-collection"},
+        }
+
+    def test_default_collection(self):
+        assert collection_specs(self.config, None) == [
+            {
+                "pipeline": "index.yml",
+                "collection": "default-collection",
+                "metadata": ["description"],
+            }
+        ]
+
+    def test_config_collections(self):
+        self.config["ingestion"]["collections"] = [
+            {"collection": "all-fields", "metadata": None},
+            {"collection": "other", "metadata": ["a"], "pipeline": "x.yml"},
+        ]
+        specs = collection_specs(self.config, None)
+        assert [spec["pipeline"] for spec in specs] == ["index.yml", "x.yml"]
+
+    def test_command_line_collections(self):
+        specs = collection_specs(self.config, ["one", "two:a,b"])
+        assert [(spec["collection"], spec["metadata"]) for spec in specs] == [
+            ("one", None),
+            ("two", ["a", "b"]),
+        ]
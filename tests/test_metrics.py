@@ -0,0 +1,48 @@
+"""
+Unit tests for the pipeline metrics registry.
+"""
+
+from unittest import TestCase
+
+from rag.metrics import Metrics, format_labels
+
+
+class TestMetrics(TestCase):
+    """
+    Test class for recording and exporting metrics.
+    """
+
+    def setUp(self):
+        self.metrics = Metrics(window=100)
+        for value in range(1, 201):
+            self.metrics.observe(
+                "component_seconds", value / 100, component="retriever"
+            )
+        self.metrics.observe("component_seconds", 5.0, component="llm")
+
+    def test_summary(self):
+        summary = self.metrics.summary("component_seconds").set_index(
+            "component"
+        )
+        retriever = summary.loc["retriever"]
+        # Counts are cumulative, percentiles are over the rolling window.
+        assert retriever["count"] == 200
+        assert retriever["mean"] == 1.005
+        assert 1.49 < retriever["p50"] < 1.51
+        assert 1.94 < retriever["p95"] < 1.96
+        assert summary.loc["llm", "p99"] == 5.0
+        assert self.metrics.summary("missing").empty
+
+    def test_to_prometheus(self):
+        text = self.metrics.to_prometheus()
+        assert "# TYPE rag_component_seconds summary" in text
+        assert (
+            'rag_component_seconds{component="llm",quantile="0.95"} 5.0'
+            in (text)
+        )
+        assert 'rag_component_seconds_count{component="retriever"} 200' in (
+            text
+        )
+        assert format_labels((("query", 'say "hi"'),)) == (
+            '{query="say \\"hi\\""}'
+        )
@@ -0,0 +1,54 @@
+"""
+Unit tests for the map app NER service.
+"""
+
+import importlib
+from unittest import TestCase, mock
+
+import spacy
+
+from map.ner import EXCLUDE, NERService
+
+
+def fake_model(*args, **kwargs):
+    """
+    Blank English pipeline tagging a few place names, standing in for the
+    trained model.
+    """
+    nlp = spacy.blank("en")
+    ruler = nlp.add_pipe("entity_ruler")
+    ruler.add_patterns(
+        [
+            {"label": "GPE", "pattern": "Wales"},
+            {"label": "GPE", "pattern": "Cumbria"},
+            {"label": "ORG", "pattern": "UKCEH"},
+        ]
+    )
+    return nlp
+
+
+class TestNERService(TestCase):
+    """
+    Test class for the lazily loaded NER service.
+    """
+
+    def test_import_does_not_load_model(self):
+        import map.map_app
+
+        with mock.patch("spacy.load") as load:
+            importlib.reload(map.map_app)
+        load.assert_not_called()
+
+    @mock.patch("spacy.load", side_effect=fake_model)
+    def test_lazy_load_and_pipe(self, load):
+        ner = NERService("model")
+        assert not ner.loaded
+        load.assert_not_called()
+
+        assert ner.entities(ner("Rainfall in Wales by UKCEH")) == ["Wales"]
+        assert list(ner.extract(["Cumbria and Wales", "UKCEH", ""])) == [
+            ["Cumbria", "Wales"],
+            [],
+            [],
+        ]
+        load.assert_called_once_with("model", exclude=EXCLUDE)
@@ -0,0 +1,122 @@
+"""
+Unit tests for the async RAG pipeline pool.
+"""
+
+import asyncio
+import threading
+from unittest import TestCase, mock
+
+import pandas as pd
+
+from rag.pool import PoolFullError, RagPipelinePool
+from rag.wrappers import RagPipelineWrapper
+
+
+class TestRagPipelinePool(TestCase):
+    """
+    Test class for the RAG pipeline pool, with the pipeline stream patched
+    out by one that blocks until released.
+    """
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.datasets = pd.DataFrame({"dataset": ["title"], "score": [0.5]})
+        patcher = mock.patch.object(
+            RagPipelineWrapper, "stream", side_effect=self.stream
+        )
+        self.stream_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, query):
+        yield "datasets", self.datasets
+        self.release.wait(5)
+        yield "token", "answer "
+        yield "answer", f"answer {query}"
+
+    def test_identical_queries_coalesced(self):
+        pool = RagPipelinePool("pipe.yml", size=2)
+
+        async def run():
+            first = asyncio.create_task(pool.query("Question?"))
+            second = asyncio.create_task(pool.query(" question? "))
+            await asyncio.sleep(0.1)
+            self.release.set()
+            return await asyncio.gather(first, second)
+
+        results = asyncio.run(run())
+        assert [answer for answer, _ in results] == ["answer Question?"] * 2
+        assert self.stream_mock.call_count == 1
+        assert pool.pending == 0
+
+    def test_queue_full(self):
+        pool = RagPipelinePool("pipe.yml", size=1, max_queue=1)
+
+        async def run():
+            running = asyncio.create_task(pool.query("q1"))
+            queued = asyncio.create_task(pool.query("q2"))
+            await asyncio.sleep(0.1)
+            with self.assertRaises(PoolFullError):
+                pool.submit("q3")
+            # Identical queries join the in-flight run rather than queueing.
+            coalesced = asyncio.create_task(pool.query("q2"))
+            self.release.set()
+            return await asyncio.gather(running, queued, coalesced)
+
+        results = asyncio.run(run())
+        assert [answer for answer, _ in results] == [
+            "answer q1",
+            "answer q2",
+            "answer q2",
+        ]
+        assert self.stream_mock.call_count == 2
+
+    def test_stream_error(self):
+        self.stream_mock.side_effect = RuntimeError("ollama unavailable")
+        pool = RagPipelinePool("pipe.yml")
+
+        async def run():
+            return await pool.query("q1")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+
+    def test_query_batch(self):
+        pool = RagPipelinePool("pipe.yml", size=2)
+        running = threading.Barrier(2, timeout=5)
+        wrappers = []
+
+        def query(wrapper, query, embedding, documents):
+            # Both queries must be running at once to pass the barrier.
+            wrappers.append(wrapper)
+            running.wait()
+            return f"answer {query}", pd.DataFrame(
+                {
+                    "dataset": documents,
+                    "metadata": "description",
+                    "documents": 1,
+                    "score": 0.5,
+                }
+            )
+
+        with (
+            mock.patch.object(
+                RagPipelineWrapper,
+                "retrieve_batch",
+                return_value=([None, None], [["d1"], ["d2"]]),
+            ) as retrieve_batch,
+            mock.patch.object(
+                RagPipelineWrapper,
+                "query",
+                autospec=True,
+                side_effect=query,
+            ),
+        ):
+            answers, datasets = asyncio.run(pool.query_batch(["q1", "q2"]))
+        retrieve_batch.assert_called_once_with(["q1", "q2"])
+        assert answers == ["answer q1", "answer q2"]
+        assert datasets[["query", "dataset"]].values.tolist() == [
+            ["q1", "d1"],
+            ["q2", "d2"],
+        ]
+        # Each query ran on a pipeline instance of its own.
+        assert set(map(id, wrappers)) == set(map(id, pool.wrappers))
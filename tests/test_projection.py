@@ -0,0 +1,142 @@
+"""
+Unit tests for the precomputed visualisation projections.
+"""
+
+import tempfile
+import uuid
+from unittest import TestCase, mock
+
+import chromadb
+import numpy as np
+
+from visualisation import projection
+from visualisation.projection import ProjectionStore, read_points
+
+
+class TestProjectionStore(TestCase):
+    """
+    Test class for computing, storing and reloading projections.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.collection = chromadb.EphemeralClient().create_collection(
+            f"test-{uuid.uuid4().hex[:8]}"
+        )
+        rng = np.random.default_rng(0)
+        self.add(range(20), rng.normal(size=(20, 8)))
+
+    def add(self, ids, embeddings, content_hash="h"):
+        ids = list(ids)
+        self.collection.upsert(
+            ids=[f"doc{i}" for i in ids],
+            embeddings=np.asarray(embeddings).tolist(),
+            documents=[f"description {i}" for i in ids],
+            metadatas=[
+                {
+                    "eidc_metadata_key": "description",
+                    "dataset_id": f"id{i}",
+                    "dataset_title": f"title {i}",
+                    "content_hash": content_hash,
+                    "chunk_index": 0,
+                }
+                for i in ids
+            ],
+        )
+
+    def store(self, **settings):
+        return ProjectionStore(
+            self.tmp.name, {"pca_components": 4, **settings}
+        )
+
+    def test_read_points_skips_other_fields_and_chunks(self):
+        self.collection.add(
+            ids=["title0", "doc0-1"],
+            embeddings=[[0.0] * 8, [0.0] * 8],
+            metadatas=[
+                {"eidc_metadata_key": "title"},
+                {"eidc_metadata_key": "description", "chunk_index": 1},
+            ],
+        )
+        points = read_points(self.collection, include_embeddings=True)
+        assert sorted(points.ids) == sorted(f"doc{i}" for i in range(20))
+        assert points.embeddings.shape == (20, 8)
+
+    def test_project_and_reload(self):
+        store = self.store(reducer="tsne", params={"max_iter": 250})
+        first = store.get(self.collection)
+        assert first.xy.shape == (20, 2)
+        assert store.artifact_path(self.collection.name).exists()
+
+        with mock.patch.object(projection, "reduce") as reduce:
+            second = self.store(reducer="tsne", params={"max_iter": 250}).get(
+                self.collection
+            )
+        reduce.assert_not_called()
+        assert second.ids == first.ids
+        np.testing.assert_array_equal(second.xy, first.xy)
+
+    def test_clusters_stored(self):
+        store = ProjectionStore(self.tmp.name, {"reducer": "pca"}, clusters=3)
+        first = store.get(self.collection)
+        assert first.labels.shape == (20,)
+        assert first.centroids.shape == (3, 2)
+        assert set(first.labels) <= {0, 1, 2}
+        reloaded = store.load(self.collection.name)
+        np.testing.assert_array_equal(reloaded.labels, first.labels)
+        np.testing.assert_array_equal(reloaded.centroids, first.centroids)
+
+        # Only the clusters are recomputed when their number changes.
+        store.clusters = 4
+        with mock.patch.object(projection, "reduce") as reduce:
+            second = store.get(self.collection)
+        reduce.assert_not_called()
+        np.testing.assert_array_equal(second.xy, first.xy)
+        assert second.centroids.shape == (4, 2)
+        assert store.load(self.collection.name).centroids.shape == (4, 2)
+
+    def test_recomputed_when_content_or_settings_change(self):
+        store = self.store(reducer="pca")
+        first = store.get(self.collection)
+        self.add([3], [np.ones(8)], content_hash="changed")
+        second = store.get(self.collection)
+        assert second.fingerprint != first.fingerprint
+        third = self.store(reducer="tsne").get(self.collection)
+        assert third.settings["reducer"] == "tsne"
+
+    def test_unknown_reducer(self):
+        with self.assertRaises(ValueError):
+            self.store(reducer="unknown").get(self.collection)
+
+    def test_new_documents_placed_incrementally(self):
+        store = self.store(reducer="tsne", params={"max_iter": 250})
+        first = store.get(self.collection)
+        embeddings = self.collection.get(ids=["doc0"], include=["embeddings"])
+        self.add([20], embeddings["embeddings"])
+
+        with mock.patch.object(projection, "reduce") as reduce:
+            second = store.get(self.collection)
+        reduce.assert_not_called()
+        assert second.placed == 1
+        positions = dict(zip(second.ids, second.xy.tolist()))
+        for doc_id, xy in zip(first.ids, first.xy.tolist()):
+            assert positions[doc_id] == xy
+        np.testing.assert_allclose(
+            positions["doc20"], positions["doc0"], atol=1e-3
+        )
+
+    def test_relayout_when_drift_exceeds_threshold(self):
+        store = self.store(reducer="pca")
+        store.get(self.collection)
+        rng = np.random.default_rng(1)
+        self.add(range(20, 25), rng.normal(size=(5, 8)))
+
+        with mock.patch.object(
+            projection, "reduce", return_value=np.zeros((25, 2))
+        ) as reduce:
+            updated = store.get(self.collection)
+        reduce.assert_called_once()
+        assert updated.placed == 0
+        # The full layout is initialised from the previous positions.
+        assert reduce.call_args.args[2].shape == (25, 2)
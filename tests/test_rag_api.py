@@ -0,0 +1,70 @@
+"""
+Unit tests for the RAG API.
+"""
+
+from unittest import TestCase, mock
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from rag.cache import SemanticCache
+
+# The API creates its answer cache as it is imported, so it is kept in memory
+# rather than written to the answer-cache directory.
+with mock.patch(
+    "rag.cache.SemanticCache",
+    lambda **config: SemanticCache(**{**config, "path": None}),
+):
+    from rag.rag_api import app, pool
+
+
+class TestRagApi(TestCase):
+    """
+    Test class for the RAG API, with the pipeline pool patched out. The
+    client is not used as a context manager, so the pipelines are not warmed
+    up.
+    """
+
+    def setUp(self):
+        self.client = TestClient(app)
+        patcher = mock.patch.object(pool, "submit")
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_query(self):
+        generation = mock.Mock()
+        generation.result = mock.AsyncMock(
+            return_value=("An answer.", pd.DataFrame({"dataset": ["d"]}))
+        )
+        self.submit.return_value = generation
+        response = self.client.get("/query", params={"query_string": "Q?"})
+        assert response.status_code == 200
+        assert response.json() == {
+            "query": "Q?",
+            "answer": "An answer.",
+            "datasets": [{"dataset": "d"}],
+        }
+
+    def test_lifespan(self):
+        with (
+            mock.patch.object(pool, "warm_up") as warm_up,
+            mock.patch.object(pool, "close") as close,
+        ):
+            with TestClient(app):
+                warm_up.assert_called_once_with()
+                close.assert_not_called()
+            close.assert_called_once_with()
+
+    def test_missing_query(self):
+        for path in ["/query", "/query/stream"]:
+            assert self.client.get(path).status_code == 422
+        self.submit.assert_not_called()
+
+    def test_empty_query(self):
+        for path in ["/query", "/query/stream"]:
+            for query in ["", "  \n"]:
+                response = self.client.get(
+                    path, params={"query_string": query}
+                )
+                assert response.status_code == 400
+        self.submit.assert_not_called()
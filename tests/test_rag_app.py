@@ -2,12 +2,17 @@
 Unit tests for the RAG application.
 """
 
+import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import patch
 
 import pandas as pd
 from streamlit.testing.v1 import AppTest
 
+from rag.cache import SemanticCache
+from rag.metrics import Metrics
+
 
 class TestRagApp(TestCase):
     """
@@ -16,8 +21,24 @@ class TestRagApp(TestCase):
 
     def setUp(self):
         """
-        Create mock response objects to use in tests.
+        Create mock response objects to use in tests, stop the app warming
+        up the real pipeline and LLM in the background and keep its answer
+        cache in a temporary directory.
         """
+        patcher = patch(
+            "rag.wrappers.RagPipelineWrapper.warm_up_in_background"
+        )
+        self.warm_up = patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache_path = os.path.join(tmp.name, "answers.sqlite")
+        patcher = patch(
+            "rag.cache.SemanticCache",
+            lambda **config: SemanticCache(**{**config, "path": cache_path}),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.question = "Test question?"
         self.answer = "This is a test answer."
         self.scores = pd.DataFrame(
@@ -35,3 +56,20 @@ class TestRagApp(TestCase):
         at = AppTest.from_file("rag/rag_app.py").run(timeout=10)
         at.chat_input[0].set_value(self.question).run(timeout=10)
         assert at.chat_message[1].markdown[0].value == self.question
+
+    def test_metrics_panel(self):
+        """
+        Test the debug panel shows the metrics recorded in the process.
+        """
+        metrics = Metrics()
+        metrics.observe(
+            "component_seconds", 0.5, pipeline="test", component="retriever"
+        )
+        # The app records metrics in a registry of its own, with the window
+        # set in config.yml.
+        with patch("rag.metrics.Metrics.summary", metrics.summary):
+            at = AppTest.from_file("rag/rag_app.py").run(timeout=10)
+            assert not at.expander
+            at.toggle[0].set_value(True).run(timeout=10)
+        assert at.expander[0].label == "Pipeline metrics"
+        assert at.expander[0].markdown[0].value.startswith("Seconds per stage")
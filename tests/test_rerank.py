@@ -0,0 +1,64 @@
+"""
+Unit tests for cross-encoder re-ranking.
+"""
+
+from unittest import TestCase
+
+from haystack import Document
+from haystack.core.serialization import component_from_dict
+
+from rag.rerank import CrossEncoderRanker
+
+
+class FakeCrossEncoder:
+    """
+    Scores pairs by the number of query words in the document, recording
+    the batch size it was called with.
+    """
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.batch_size = batch_size
+        return [
+            sum(word in document for word in query.split())
+            for query, document in pairs
+        ]
+
+
+class TestCrossEncoderRanker(TestCase):
+    """
+    Test class for the cross-encoder ranker component.
+    """
+
+    def setUp(self):
+        self.ranker = CrossEncoderRanker(top_k=2, batch_size=8)
+        self.ranker.model = FakeCrossEncoder()
+
+    def test_run(self):
+        documents = [
+            Document(content="rainfall", score=0.9),
+            Document(content="soil moisture rainfall", score=0.5),
+            Document(content="bees", score=0.1),
+            Document(content="soil", score=0.2),
+        ]
+        result = self.ranker.run(query="soil rainfall", documents=documents)[
+            "documents"
+        ]
+        assert [doc.content for doc in result] == [
+            "soil moisture rainfall",
+            "rainfall",
+        ]
+        assert result[0].score == 2.0
+        assert documents[1].score == 0.5
+        assert self.ranker.model.batch_size == 8
+        assert (
+            len(self.ranker.run("soil", documents, top_k=3)["documents"]) == 3
+        )
+        assert self.ranker.run("soil", [])["documents"] == []
+
+    def test_serialisation(self):
+        restored = component_from_dict(
+            CrossEncoderRanker, self.ranker.to_dict(), "ranker"
+        )
+        assert restored.model_name == "cross-encoder/ms-marco-MiniLM-L-6-v2"
+        assert (restored.top_k, restored.batch_size) == (2, 8)
+        assert restored.model is None
@@ -0,0 +1,165 @@
+"""
+Unit tests for the RAG retrievers.
+"""
+
+import os
+import tempfile
+import uuid
+from unittest import TestCase
+
+from haystack import Document
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+from ingestion.bm25 import BM25Index
+from rag.retrievers import (
+    ChromaWhereRetriever,
+    HybridRetriever,
+    reciprocal_rank_fusion,
+)
+from rag.wrappers import RagPipelineWrapper
+
+
+def make_document(doc_id, content, embedding):
+    return Document(
+        id=doc_id,
+        content=content,
+        meta={"dataset_title": doc_id, "content_hash": content},
+        embedding=embedding,
+    )
+
+
+class TestReciprocalRankFusion(TestCase):
+    """
+    Test class for fusing rankings by reciprocal rank.
+    """
+
+    def test_fusion(self):
+        a, b, c = (Document(id=i, content=i) for i in "abc")
+        fused = reciprocal_rank_fusion([[a, b], [c, b]], k=1)
+        assert [doc.id for doc in fused] == ["b", "a", "c"]
+        assert fused[0].score == 1 / 3 + 1 / 3
+        assert fused[1].score == 1 / 2
+
+
+class TestChromaWhereRetriever(TestCase):
+    """
+    Test class for dense retrieval scored by similarity.
+    """
+
+    def setUp(self):
+        self.store = ChromaDocumentStore(
+            collection_name=f"test-{uuid.uuid4().hex}"
+        )
+        chunks = [
+            ("soil", "soil-1", [1.0, 0.0, 0.0]),
+            ("soil", "soil-2", [0.0, 1.0, 0.0]),
+            ("rain", "rain-1", [0.6, 0.8, 0.0]),
+            ("lcm", "lcm-1", [0.0, 0.0, 1.0]),
+        ]
+        self.store.write_documents(
+            [
+                Document(
+                    id=doc_id,
+                    content=doc_id,
+                    meta={
+                        "dataset_id": dataset,
+                        "dataset_title": dataset,
+                        "eidc_metadata_key": doc_id,
+                    },
+                    embedding=embedding,
+                )
+                for dataset, doc_id, embedding in chunks
+            ]
+        )
+        self.store._collection._embedding_function = lambda input: [
+            [1.0, 0.0, 0.0] for _ in input
+        ]
+
+    def test_scores_are_similarities(self):
+        documents = ChromaWhereRetriever(self.store, top_k=4).run(
+            query="Soil moisture"
+        )["documents"]
+        # Chroma's squared euclidean distances of 0, 0.8, 2 and 2.
+        assert [doc.id for doc in documents[:2]] == ["soil-1", "rain-1"]
+        assert [round(doc.score, 6) for doc in documents] == [1, 0.6, 0, 0]
+
+    def test_datasets_ranked_by_best_document(self):
+        documents = ChromaWhereRetriever(self.store, top_k=4).run(
+            query="Soil moisture"
+        )["documents"]
+        datasets = RagPipelineWrapper("pipe.yml").documents_to_datasets(
+            documents
+        )
+        assert datasets["dataset"].to_list() == ["soil", "rain", "lcm"]
+        assert datasets["documents"].to_list() == [2, 1, 1]
+        assert round(datasets["score"].iloc[0], 6) == 1
+
+
+class TestHybridRetriever(TestCase):
+    """
+    Test class for hybrid dense and BM25 retrieval.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "bm25.sqlite")
+        self.store = ChromaDocumentStore(
+            collection_name=f"test-{uuid.uuid4().hex}"
+        )
+        documents = [
+            make_document("soil", "Soil moisture", [1.0, 0.0, 0.0]),
+            make_document("rain", "Rainfall", [0.9, 0.1, 0.0]),
+            make_document("lcm", "Land Cover Map (LCM)", [0.0, 0.0, 1.0]),
+        ]
+        self.store.write_documents(documents)
+        BM25Index(self.path).write(documents)
+        # Embeds every query close to the soil moisture document.
+        self.store._collection._embedding_function = lambda input: [
+            [1.0, 0.0, 0.0] for _ in input
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_keyword_match_is_retrieved(self):
+        retriever = HybridRetriever(self.store, self.path, top_k=2)
+        documents = retriever.run(query="What is the LCM?")["documents"]
+        assert [doc.id for doc in documents] == ["lcm", "soil"]
+        assert documents[0].meta["dataset_title"] == "lcm"
+
+    def test_filters_apply_to_keyword_search(self):
+        retriever = HybridRetriever(self.store, self.path, top_k=3)
+        documents = retriever.run(
+            query="What is the LCM?",
+            filters={"dataset_title": {"$ne": "lcm"}},
+        )["documents"]
+        assert [doc.id for doc in documents] == ["soil", "rain"]
+
+    def test_filters_apply_before_candidates_are_cut(self):
+        # The best keyword match is filtered out, which must not leave the
+        # keyword search without candidates.
+        retriever = HybridRetriever(
+            self.store, self.path, top_k=3, candidates=1
+        )
+        documents = retriever.keyword_search(
+            "Land Cover Map of rainfall", {"dataset_title": {"$ne": "lcm"}}
+        )
+        assert [doc.id for doc in documents] == ["rain"]
+
+    def test_run_batch(self):
+        retriever = HybridRetriever(self.store, self.path, top_k=2)
+        batch = retriever.run_batch(
+            ["What is the LCM?", "Rainfall"],
+            query_embeddings=[[0.0, 0.0, 1.0], [0.0, 1.0, 0.0]],
+        )
+        assert [[doc.id for doc in documents] for documents in batch] == [
+            ["lcm", "rain"],
+            ["rain", "soil"],
+        ]
+        assert retriever.run_batch([]) == []
+
+    def test_serialisation(self):
+        retriever = HybridRetriever(self.store, self.path, candidates=5)
+        restored = HybridRetriever.from_dict(retriever.to_dict())
+        assert restored.bm25_index == self.path
+        assert restored.candidates == 5
@@ -0,0 +1,80 @@
+"""
+Unit tests for spatial pre-filtering of retrieval.
+"""
+
+import uuid
+from unittest import TestCase, mock
+
+from haystack import Document
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+from rag.retrievers import ChromaWhereRetriever
+from rag.spatial import SpatialFilter, extent_filter
+from tests.test_ner import fake_model
+
+
+def make_document(dataset_id, extent=None):
+    meta = {"dataset_id": dataset_id, "has_extent": extent is not None}
+    if extent is not None:
+        meta.update(
+            zip(["bbox_west", "bbox_south", "bbox_east", "bbox_north"], extent)
+        )
+    return Document(
+        id=dataset_id,
+        content=f"Rainfall {dataset_id}",
+        meta=meta,
+        embedding=[0.1, 0.2, 0.3],
+    )
+
+
+class TestSpatialFilter(TestCase):
+    """
+    Test class for filtering retrieval by the places named in a query.
+    """
+
+    def setUp(self):
+        self.store = ChromaDocumentStore(
+            collection_name=f"test-{uuid.uuid4().hex}"
+        )
+        self.store.write_documents(
+            [
+                make_document("wales", [-5.3, 51.4, -2.6, 53.4]),
+                make_document("scotland", [-7.6, 54.6, -0.7, 60.9]),
+                make_document("uk", [-8.6, 49.9, 1.8, 60.9]),
+                make_document("unknown"),
+            ]
+        )
+        # Embeds the query without the default embedding model.
+        self.store._collection._embedding_function = lambda input: [
+            [0.1, 0.2, 0.3] for _ in input
+        ]
+        self.retriever = ChromaWhereRetriever(self.store, top_k=10)
+
+    def search(self, filters):
+        documents = self.retriever.run(query="rainfall", filters=filters)
+        return sorted(doc.id for doc in documents["documents"])
+
+    def test_extent_filter(self):
+        assert extent_filter([]) is None
+        wales = extent_filter([[-4.0, 52.0, -3.0, 53.0]])
+        assert self.search(wales) == ["uk", "wales"]
+        both = extent_filter(
+            [[-4.0, 52.0, -3.0, 53.0], [-4.3, 55.8, -4.2, 55.9]]
+        )
+        assert self.search(both) == ["scotland", "uk", "wales"]
+        with_unknown = extent_filter([[-4.0, 52.0, -3.0, 53.0]], True)
+        assert self.search(with_unknown) == ["uk", "unknown", "wales"]
+
+    @mock.patch("spacy.load", side_effect=fake_model)
+    def test_run(self, load):
+        spatial_filter = SpatialFilter(model="spatial-test-model")
+        result = spatial_filter.run(query="Rainfall in Wales")
+        assert result["places"] == ["Wales"]
+        assert self.search(result["filters"]) == ["uk", "unknown", "wales"]
+        spatial_filter.include_without_extent = False
+        result = spatial_filter.run(query="Rainfall in Wales")
+        assert self.search(result["filters"]) == ["uk", "wales"]
+
+        result = spatial_filter.run(query="Rainfall by UKCEH")
+        assert result == {"filters": None, "places": []}
+        assert len(self.search(result["filters"])) == 4
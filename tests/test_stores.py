@@ -0,0 +1,112 @@
+"""
+Unit tests for the shared Chroma store access layer.
+"""
+
+import tempfile
+from unittest import TestCase, mock
+
+from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+from ingestion import stores
+from rag.retrievers import ChromaWhereRetriever
+from rag.wrappers import RagPipelineWrapper
+from tests.test_wrappers import fake_pipeline
+
+
+class TestStores(TestCase):
+    """
+    Test class for the shared clients and document stores.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name in ["_clients", "_document_stores"]:
+            patcher = mock.patch.dict(f"ingestion.stores.{name}", clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("ingestion.stores._server", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_shared(self):
+        client = stores.get_client(self.tmp.name)
+        assert stores.get_client(self.tmp.name) is client
+        assert stores.get_client(None) is not client
+
+    def test_document_store_shared(self):
+        store = stores.get_document_store("shared", persist_path=self.tmp.name)
+        assert (
+            stores.get_document_store("shared", persist_path=self.tmp.name)
+            is store
+        )
+        other = stores.get_document_store("other", persist_path=self.tmp.name)
+        assert other is not store
+        assert other._chroma_client is store._chroma_client
+        assert (
+            other._collection._embedding_function
+            is store._collection._embedding_function
+        )
+
+    def test_matches_chroma_document_store(self):
+        # The shared store is built by ChromaDocumentStore's constructor, so
+        # it must have the same attributes and serialise the same way, with
+        # only the client and collection swapped for the shared ones.
+        store = stores.get_document_store("shared", persist_path=self.tmp.name)
+        plain = ChromaDocumentStore("plain", persist_path=self.tmp.name)
+        assert vars(store).keys() == vars(plain).keys()
+        assert store.to_dict()["init_parameters"] == {
+            **plain.to_dict()["init_parameters"],
+            "collection_name": "shared",
+        }
+        # Every client and collection the store holds is the shared one.
+        client = stores.get_client(self.tmp.name)
+        for value in vars(store).values():
+            if isinstance(value, ClientAPI):
+                assert value is client
+            if isinstance(value, Collection):
+                assert value.name == "shared"
+                assert value._client is client._server
+        assert store.count_documents() == 0
+
+    @mock.patch("chromadb.HttpClient")
+    @mock.patch("chromadb.PersistentClient")
+    def test_server_store_opens_no_files(self, persistent_client, _):
+        stores.configure({"vector-db": {"host": "chroma", "port": 8001}})
+        store = stores.get_document_store("shared", persist_path=self.tmp.name)
+        persistent_client.assert_not_called()
+        assert store._chroma_client is stores.get_client(self.tmp.name)
+
+    def test_from_dict(self):
+        store = stores.get_document_store("shared", persist_path=self.tmp.name)
+        retriever = ChromaWhereRetriever.from_dict(
+            ChromaWhereRetriever(store, top_k=3).to_dict()
+        )
+        assert retriever.document_store is store
+        assert retriever.top_k == 3
+
+    def test_wrapper_shares_plain_stores(self):
+        wrapper = RagPipelineWrapper("pipe.yml")
+        pipeline = fake_pipeline()
+        retriever = pipeline.get_component("retriever")
+        retriever.document_store = ChromaDocumentStore(
+            "shared", persist_path=self.tmp.name
+        )
+        wrapper.share_components(pipeline)
+        assert retriever.document_store is stores.get_document_store(
+            "shared", persist_path=self.tmp.name
+        )
+
+    @mock.patch("chromadb.HttpClient")
+    def test_server(self, http_client):
+        stores.configure({"vector-db": {"host": "chroma", "port": 8001}})
+        client = stores.get_client(self.tmp.name)
+        http_client.assert_called_once_with(host="chroma", port=8001)
+        assert client is stores.get_client("another-path")
+        # Reconfiguring with the same settings keeps the client.
+        stores.configure({"vector-db": {"host": "chroma", "port": 8001}})
+        assert stores.get_client(self.tmp.name) is client
+        stores.configure({"vector-db": {"path": self.tmp.name}})
+        assert stores.get_client(self.tmp.name) is not client
@@ -0,0 +1,45 @@
+"""
+Unit tests for the incremental JSON array parser.
+"""
+
+import io
+import json
+from unittest import TestCase
+
+from ingestion.streaming import iter_json_array
+
+
+class TestIterJsonArray(TestCase):
+    """
+    Test class for streaming the items of a top level JSON array.
+    """
+
+    def setUp(self):
+        self.response = {
+            "numFound": 12345,
+            "facets": [{"results": ["not", "these"]}],
+            "results": [
+                {"identifier": "id1", "title": "Ærøskøbing ☔", "n": 1.5},
+                {"identifier": "id2", "values": [1, 22, 333, None, True]},
+                "text",
+                4567,
+            ],
+            "page": 1,
+        }
+
+    def test_small_chunks(self):
+        data = json.dumps(self.response, ensure_ascii=False).encode("utf-8")
+        for chunk_size in (1, 3, 7, 64):
+            items = list(
+                iter_json_array(io.BytesIO(data), "results", chunk_size)
+            )
+            assert items == self.response["results"], chunk_size
+
+    def test_missing_and_empty_arrays(self):
+        assert list(iter_json_array(io.BytesIO(b"{}"), "results")) == []
+        empty = io.BytesIO(b'{"results": [ ], "numFound": 0}')
+        assert list(iter_json_array(empty, "results")) == []
+
+    def test_invalid_json(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.BytesIO(b'{"results": [1 2]}'), "results"))
@@ -0,0 +1,90 @@
+"""
+Unit tests for observing pipeline components through Haystack's tracing.
+"""
+
+import contextlib
+from typing import List
+from unittest import TestCase
+
+from haystack import Pipeline, component, tracing
+from haystack.tracing import Tracer
+from haystack.tracing.tracer import NullSpan
+
+from rag.tracing import ComponentTracer, component_tracer
+
+
+@component
+class Doubler:
+    @component.output_types(value=int)
+    def run(self, value: int):
+        return {"value": value * 2}
+
+
+class RecordingTracer(Tracer):
+    """
+    Tracer that records the names of the operations it traces.
+    """
+
+    def __init__(self):
+        self.operations = []
+
+    @contextlib.contextmanager
+    def trace(self, operation_name, tags=None):
+        self.operations.append(operation_name)
+        yield NullSpan()
+
+    def current_span(self):
+        return None
+
+
+class TestComponentTracer(TestCase):
+    """
+    Test class for the component tracer.
+    """
+
+    def setUp(self):
+        previous = tracing.tracer.actual_tracer
+        self.addCleanup(tracing.enable_tracing, previous)
+        self.recording = RecordingTracer()
+        tracing.enable_tracing(self.recording)
+        self.pipeline = Pipeline()
+        self.pipeline.add_component("first", Doubler())
+        self.pipeline.add_component("second", Doubler())
+        self.pipeline.connect("first.value", "second.value")
+
+    def listen(self) -> List[tuple]:
+        calls = []
+        with component_tracer().listen(lambda *call: calls.append(call)):
+            assert self.pipeline.run({"first": {"value": 1}}) == {
+                "second": {"value": 4}
+            }
+        return calls
+
+    def test_listener(self):
+        calls = self.listen()
+        assert [call[:3] for call in calls] == [
+            ("first", {"value": 1}, {"value": 2}),
+            ("second", {"value": 2}, {"value": 4}),
+        ]
+        assert all(seconds >= 0 for *_, seconds in calls)
+
+    def test_wraps_enabled_tracer(self):
+        tracer = component_tracer()
+        assert isinstance(tracer, ComponentTracer)
+        assert tracer.tracer is self.recording
+        assert component_tracer() is tracer
+        self.listen()
+        # The tracer that was enabled still sees every span.
+        assert self.recording.operations == [
+            "haystack.pipeline.run",
+            "haystack.component.run",
+            "haystack.component.run",
+        ]
+
+    def test_not_observed_outside_listen(self):
+        calls = []
+        tracer = component_tracer()
+        with tracer.listen(lambda *call: calls.append(call)):
+            pass
+        self.pipeline.run({"first": {"value": 1}})
+        assert calls == []
@@ -4,10 +4,16 @@ Unit tets for the visualisation application.
 
 from unittest import TestCase, mock
 
+import numpy as np
 import pandas as pd
 from streamlit.testing.v1 import AppTest
 
-from visualisation.visualisation_app import create_figure
+from visualisation.visualisation_app import (
+    create_cluster_figure,
+    create_figure,
+    extract_details,
+    summarise_clusters,
+)
 
 
 class TestRagApp(TestCase):
@@ -26,8 +32,12 @@ class TestRagApp(TestCase):
                 "topic_number": [1, 2],
                 "doc_id": ["id1", "id2"],
                 "title": ["stitle1", "stitle2"],
+                "cluster": [0, 0],
             }
         )
+        self.clusters = pd.DataFrame(
+            {"cluster": [0], "x": [1.5], "y": [10.5], "count": [2]}
+        )
 
     def test_app_starts(self):
         """
@@ -36,9 +46,15 @@ class TestRagApp(TestCase):
         Note: current support for streamlit testing doesn;t currently allow to
         mimic user interactions with the visualisation.
         """
-        with mock.patch(
-            "visualisation.visualisation_app.get_embeddings",
-            return_value=self.data,
+        # The app runs as a script of its own, so the shared Chroma client
+        # is patched rather than the app's functions, which keeps the test
+        # from creating a database in the working tree.
+        with (
+            mock.patch("ingestion.stores.get_client"),
+            mock.patch(
+                "visualisation.visualisation_app.get_embeddings",
+                return_value=(self.data, self.clusters),
+            ),
         ):
             AppTest.from_file("visualisation/visualisation_app.py").run(
                 timeout=30
@@ -52,7 +68,47 @@ class TestRagApp(TestCase):
 
         scatter_data = fig.data[0]
         assert (
-            scatter_data.type == "scatter"
-        ), "The plot type should be scatter"
+            scatter_data.type == "scattergl"
+        ), "The plot type should be scattergl"
         assert all(scatter_data.x == self.data["x"]), "X data should match"
         assert all(scatter_data.y == self.data["y"]), "Y data should match"
+
+    def test_clusters(self):
+        """
+        Ensure points are summarised by the clusters stored with the
+        projection, with their sizes.
+        """
+        data = pd.DataFrame(
+            {
+                "x": [0, 0.1, 10, 10.1, 10.2],
+                "y": [0, 0.1, 10, 10.1, 10.2],
+                "doc_id": [f"id{i}" for i in range(5)],
+                "short_title": [f"stitle{i}" for i in range(5)],
+                "cluster": [0, 0, 2, 2, 2],
+            }
+        )
+        centroids = np.array([[0.05, 0.05], [5, 5], [10.1, 10.1]])
+        clusters = summarise_clusters(data, centroids)
+        # The empty cluster is left out.
+        assert clusters["cluster"].to_list() == [0, 2]
+        assert clusters["count"].to_list() == [2, 3]
+        assert clusters["x"].to_list() == [0.05, 10.1]
+        assert clusters["titles"][0] == "stitle0<br>stitle1"
+        fig = create_cluster_figure(clusters)
+        assert fig.data[0].type == "scattergl"
+        assert sorted(fig.data[0].marker.size) == [2, 3]
+
+    def test_extract_details(self):
+        """
+        Ensure details are looked up by dataset id and the description is
+        fetched lazily.
+        """
+        data = self.data.assign(id=["chroma1", "chroma2"])
+        data.index = pd.Index(data["doc_id"].to_numpy())
+        with mock.patch(
+            "visualisation.visualisation_app.get_description",
+            return_value="description2",
+        ) as get_description:
+            title, desc = extract_details(data, "id2")
+        assert (title, desc) == ("stitle2", "description2")
+        assert get_description.call_args.args[1] == "chroma2"
@@ -0,0 +1,260 @@
+"""
+Unit tests for the pipeline wrappers.
+"""
+
+from typing import Callable, List, Optional
+from unittest import TestCase, mock
+
+from haystack import Document, Pipeline, component
+from haystack.components.builders import AnswerBuilder, PromptBuilder
+from haystack.dataclasses import StreamingChunk
+
+from rag.metrics import Metrics
+from rag.wrappers import RagPipelineWrapper
+
+
+@component
+class FakeRetriever:
+    @component.output_types(documents=List[Document])
+    def run(self, query: str):
+        return {
+            "documents": [
+                Document(
+                    content=f"content {i}",
+                    meta={
+                        "dataset_title": f"title {i}",
+                        "eidc_metadata_key": "description",
+                    },
+                    score=i / 10,
+                )
+                for i in range(2)
+            ]
+        }
+
+    def run_batch(self, queries: List[str], query_embeddings=None):
+        return [
+            [
+                Document(
+                    content=query,
+                    meta={
+                        "dataset_title": f"{query} dataset",
+                        "eidc_metadata_key": "description",
+                    },
+                    score=1.0,
+                )
+            ]
+            for query in queries
+        ]
+
+
+@component
+class FakeGenerator:
+    def __init__(self, streaming_callback: Optional[Callable] = None):
+        self.streaming_callback = streaming_callback
+
+    @component.output_types(replies=List[str], meta=List[dict])
+    def run(self, prompt: str):
+        tokens = ["The ", "answer."]
+        for token in tokens:
+            if self.streaming_callback:
+                self.streaming_callback(StreamingChunk(content=token))
+        if self.streaming_callback:
+            # Ollama reports the generation statistics in its last chunk.
+            self.streaming_callback(
+                StreamingChunk(
+                    content="",
+                    meta={
+                        "done": True,
+                        "prompt_eval_count": 20,
+                        "prompt_eval_duration": 100_000_000,
+                        "eval_count": 2,
+                        "eval_duration": 500_000_000,
+                    },
+                )
+            )
+        return {"replies": ["".join(tokens)], "meta": [{}]}
+
+
+def fake_pipeline(retriever: bool = True) -> Pipeline:
+    pipeline = Pipeline()
+    pipeline.add_component(
+        "prompt_builder",
+        PromptBuilder(
+            "{{ query }}{% for d in documents %}{{ d.content }}{% endfor %}"
+        ),
+    )
+    pipeline.add_component("llm", FakeGenerator())
+    pipeline.add_component("answer_builder", AnswerBuilder())
+    if retriever:
+        pipeline.add_component("retriever", FakeRetriever())
+        pipeline.connect("retriever.documents", "prompt_builder.documents")
+        pipeline.connect("retriever.documents", "answer_builder.documents")
+    pipeline.connect("prompt_builder.prompt", "llm.prompt")
+    pipeline.connect("llm.replies", "answer_builder.replies")
+    return pipeline
+
+
+class TestRagPipelineWrapper(TestCase):
+    """
+    Test class for the RAG pipeline wrapper.
+    """
+
+    def setUp(self):
+        self.metrics = Metrics()
+        self.wrapper = RagPipelineWrapper("pipe.yml", metrics=self.metrics)
+        self.wrapper.pipeline = fake_pipeline()
+        self.wrapper.add_hooks(self.wrapper.pipeline)
+        self.wrapper.retrieved_pipeline = fake_pipeline(retriever=False)
+        self.wrapper.add_hooks(self.wrapper.retrieved_pipeline)
+
+    def test_stream(self):
+        events = list(self.wrapper.stream("question?"))
+        assert [event for event, _ in events] == [
+            "datasets",
+            "token",
+            "token",
+            "answer",
+        ]
+        assert events[0][1]["dataset"].to_list() == ["title 1", "title 0"]
+        assert [value for event, value in events if event == "token"] == [
+            "The ",
+            "answer.",
+        ]
+        assert events[-1][1] == "The answer."
+
+    def test_query_without_hooks(self):
+        answer, datasets = self.wrapper.query("question?")
+        assert answer == "The answer."
+        assert len(datasets) == 2
+
+    def test_query_inputs(self):
+        assert self.wrapper.query_inputs("question?") == {
+            "retriever": {"query": "question?"},
+            "prompt_builder": {"query": "question?"},
+            "answer_builder": {"query": "question?"},
+        }
+
+    def test_stage_timings(self):
+        self.wrapper.query("question?")
+        timings = self.wrapper.stage_timings()
+        assert list(timings) == [
+            "retriever",
+            "prompt_builder",
+            "llm",
+            "answer_builder",
+        ]
+        assert all(seconds >= 0 for seconds in timings.values())
+
+    def test_metrics(self):
+        self.wrapper.query("question?")
+        summary = self.metrics.summary().set_index("metric")
+        stages = summary.loc["component_seconds"]
+        assert set(stages["component"]) == {
+            "retriever",
+            "prompt_builder",
+            "llm",
+            "answer_builder",
+        }
+        assert (stages["pipeline"] == "pipe").all()
+        documents = summary.loc[["component_documents"]]
+        assert documents.iloc[0]["component"] == "retriever"
+        assert documents.iloc[0]["p50"] == 2
+        assert summary.loc["prompt_tokens", "p50"] > 0
+        assert summary.loc["llm_prompt_tokens", "p50"] == 20
+        assert summary.loc["llm_prefill_seconds", "p50"] == 0.1
+        assert summary.loc["llm_tokens_per_second", "p50"] == 4.0
+        assert summary.loc["query_seconds", "cached"] == "false"
+
+    def test_query_batch(self):
+        answers, datasets = self.wrapper.query_batch(["a?", "b?"])
+        assert answers == ["The answer.", "The answer."]
+        # The documents come from the batch retrieval, not from running the
+        # retriever for each query.
+        assert datasets.to_dict(orient="list") == {
+            "query": ["a?", "b?"],
+            "dataset": ["a? dataset", "b? dataset"],
+            "metadata": ["description", "description"],
+            "documents": [1, 1],
+            "score": [1.0, 1.0],
+        }
+        assert self.wrapper.query_batch([])[1].empty
+
+    def test_load_pipeline_without_retriever(self):
+        wrapper = RagPipelineWrapper("pipe.yml")
+        with mock.patch.object(
+            wrapper,
+            "read_pipeline_config",
+            return_value=fake_pipeline().dumps(),
+        ):
+            pipeline = wrapper.load_pipeline(exclude={"retriever"})
+        assert "retriever" not in pipeline.graph.nodes
+        assert "documents" in pipeline.inputs()["prompt_builder"]
+        assert "documents" in pipeline.inputs()["answer_builder"]
+
+    def test_retrieved_inputs(self):
+        documents = [Document(content="retrieved")]
+        assert self.wrapper.retrieved_inputs("question?", documents) == {
+            "prompt_builder": {"query": "question?", "documents": documents},
+            "answer_builder": {"query": "question?", "documents": documents},
+        }
+
+    def test_documents_to_datasets(self):
+        documents = [
+            Document(
+                content=key,
+                meta={
+                    "dataset_id": "a",
+                    "dataset_title": "A",
+                    "eidc_metadata_key": key,
+                },
+                score=score,
+            )
+            for key, score in [("title", 0.2), ("description", 0.5)]
+        ]
+        documents.append(
+            Document(
+                content="b",
+                meta={
+                    "dataset_id": "b",
+                    "dataset_title": "B",
+                    "eidc_metadata_key": "description",
+                },
+                score=0.3,
+            )
+        )
+        datasets = self.wrapper.documents_to_datasets(documents)
+        assert datasets["dataset"].to_list() == ["A", "B"]
+        assert datasets["metadata"].to_list() == [
+            "title, description",
+            "description",
+        ]
+        assert datasets["documents"].to_list() == [2, 1]
+        assert datasets["score"].to_list() == [0.5, 0.3]
+
+    def test_keep_alive(self):
+        llm = self.wrapper.get_component("llm")
+        llm.keep_alive = None
+        self.wrapper.keep_alive = "30m"
+        self.wrapper.add_hooks(self.wrapper.pipeline)
+        assert llm.keep_alive == "30m"
+
+    @mock.patch("rag.wrappers.requests.post")
+    def test_warm_up(self, post):
+        llm = self.wrapper.get_component("llm")
+        llm.url = "http://localhost:11434/api/generate"
+        llm.model = "llama3.1"
+        llm.generation_kwargs = {"num_ctx": 8192}
+        llm.timeout = 120
+        self.wrapper.keep_alive = "30m"
+        self.wrapper.warm_up_in_background().join(5)
+        post.assert_called_once_with(
+            "http://localhost:11434/api/generate",
+            json={
+                "model": "llama3.1",
+                "prompt": "",
+                "stream": False,
+                "options": {"num_ctx": 8192},
+                "keep_alive": "30m",
+            },
+            timeout=120,
+        )
@@ -0,0 +1,229 @@
+"""
+Unit tests for the incremental document writer.
+"""
+
+import json
+import os
+import tempfile
+import uuid
+from typing import List
+from unittest import TestCase
+
+from haystack import Document, Pipeline, component
+from haystack.dataclasses import ByteStream
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+from ingestion.bm25 import BM25Index
+from ingestion.converter import EIDCJSONToDocument, content_hash
+from ingestion.writer import ChangedDocumentFilter, IncrementalDocumentWriter
+from rag.wrappers import IndexPipelineWrapper
+
+
+def make_document(doc_id: str, content: str) -> Document:
+    return Document(
+        id=doc_id,
+        content=content,
+        meta={"content_hash": content_hash(content)},
+        embedding=[0.1, 0.2, 0.3],
+    )
+
+
+class TestIncrementalDocumentWriter(TestCase):
+    """
+    Test class for the incremental writer against an in-memory collection.
+    """
+
+    def setUp(self):
+        self.store = ChromaDocumentStore(
+            collection_name=f"test-{uuid.uuid4().hex}"
+        )
+        self.writer = IncrementalDocumentWriter(self.store)
+        self.writer.run(
+            documents=[make_document("a", "one"), make_document("b", "two")]
+        )
+        self.writer.delete_missing_documents()
+
+    def test_only_writes_changed_documents(self):
+        written = self.writer.run(
+            documents=[
+                make_document("a", "one"),
+                make_document("b", "changed"),
+                make_document("c", "new"),
+            ]
+        )["documents_written"]
+        assert written == 2
+        docs = {doc.id: doc.content for doc in self.store.filter_documents()}
+        assert docs == {"a": "one", "b": "changed", "c": "new"}
+
+    def test_deletes_missing_documents(self):
+        self.writer.run(documents=[make_document("a", "one")])
+        assert self.writer.delete_missing_documents() == 1
+        assert [doc.id for doc in self.store.filter_documents()] == ["a"]
+
+    def test_bm25_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bm25.sqlite")
+            # Added to an existing collection, the index is filled in from
+            # documents that are unchanged in the collection.
+            writer = IncrementalDocumentWriter(self.store, bm25_index=path)
+            written = writer.run(
+                documents=[
+                    make_document("a", "one"),
+                    make_document("c", "new"),
+                ]
+            )["documents_written"]
+            assert written == 1
+            assert writer.delete_missing_documents() == 1
+            assert set(BM25Index(path).hashes()) == {"a", "c"}
+            assert [doc.id for doc in BM25Index(path).search("one")] == ["a"]
+
+    def test_unchanged_documents_kept(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bm25.sqlite")
+            writer = IncrementalDocumentWriter(self.store, bm25_index=path)
+            split = ChangedDocumentFilter(self.store).run(
+                documents=[
+                    make_document("a", "one"),
+                    make_document("b", "changed"),
+                ]
+            )
+            assert [doc.id for doc in split["documents"]] == ["b"]
+            assert [doc.id for doc in split["unchanged"]] == ["a"]
+            writer.run(**split)
+            # Unchanged documents are not deleted, and are added to a new
+            # BM25 index without being written to the collection again.
+            assert writer.delete_missing_documents() == 0
+            assert set(BM25Index(path).hashes()) == {"a", "b"}
+
+
+def catalogue_page(*identifiers: str, **descriptions: str) -> ByteStream:
+    results = [
+        {
+            "identifier": i,
+            "title": f"title {i}",
+            "description": descriptions.get(i, i),
+        }
+        for i in identifiers
+    ]
+    return ByteStream(
+        data=json.dumps({"results": results}).encode(),
+        meta={"url": f"https://catalogue/{','.join(identifiers)}"},
+    )
+
+
+@component
+class FakeFetcher:
+    """
+    Fetcher that yields fixed catalogue pages instead of requesting them.
+    """
+
+    def __init__(self):
+        self.pages = []
+
+    @component.output_types(streams=List[ByteStream])
+    def run(self, urls: List[str]):
+        return {"streams": self.pages}
+
+    def iter_pages(self, url: str):
+        yield from self.pages
+
+
+@component
+class FakeEmbedder:
+    """
+    Embedder that records which datasets it was asked to embed.
+    """
+
+    def __init__(self):
+        self.embedded = []
+        self.stats = {"documents": 0, "cache_hits": 0, "seconds": 0.0}
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        for doc in documents:
+            self.embedded.append(doc.meta["dataset_id"])
+            doc.embedding = [1.0, 0.0]
+        return {"documents": documents}
+
+
+class TestIncrementalIndexing(TestCase):
+    """
+    Test class for indexing a paged catalogue with an incremental writer.
+    """
+
+    def setUp(self):
+        self.store = ChromaDocumentStore(f"test-{uuid.uuid4().hex}")
+        self.store._collection._embedding_function = lambda input: [
+            [1.0, 0.0] for _ in input
+        ]
+        self.fetcher = FakeFetcher()
+        self.embedder = FakeEmbedder()
+        pipeline = Pipeline()
+        pipeline.add_component(
+            "hash_filter", ChangedDocumentFilter(self.store)
+        )
+        pipeline.add_component("embedder", self.embedder)
+        pipeline.add_component("writer", IncrementalDocumentWriter(self.store))
+        pipeline.connect("hash_filter.documents", "embedder.documents")
+        pipeline.connect("hash_filter.unchanged", "writer.unchanged")
+        pipeline.connect("embedder.documents", "writer.documents")
+        self.wrapper = IndexPipelineWrapper("index.yml")
+        self.wrapper.pipeline = pipeline
+        self.wrapper.source_components = {
+            "fetcher": self.fetcher,
+            "converter": EIDCJSONToDocument(),
+        }
+        self.index(catalogue_page("a", "b"), catalogue_page("c"))
+
+    def index(self, *pages: ByteStream):
+        self.fetcher.pages = list(pages)
+        self.wrapper.index(metadata_fields=["description"])
+
+    def datasets(self):
+        return sorted(
+            doc.meta["dataset_id"] for doc in self.store.filter_documents()
+        )
+
+    def test_unchanged_documents_not_embedded(self):
+        self.embedder.embedded.clear()
+        self.index(
+            catalogue_page("a", "b", b="changed"), catalogue_page("c", "d")
+        )
+        # Only the changed and new datasets are embedded, while the unchanged
+        # ones are kept as they are still in the catalogue.
+        assert self.embedder.embedded == ["b", "d"]
+        assert self.datasets() == ["a", "b", "c", "d"]
+
+    def test_batch_inputs(self):
+        documents = [Document(content="converted")]
+        assert self.wrapper.batch_inputs(documents) == {
+            "hash_filter": {"documents": documents}
+        }
+
+    def test_index_pipeline_file(self):
+        # The converter's documents go to the hash filter, as connected in
+        # the pipeline file, which is run without the fetcher and converter.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            wrapper = IndexPipelineWrapper(
+                "pipelines/index-pipe.yml",
+                chroma_path=tmpdir,
+                collection="test",
+            )
+            assert set(wrapper.get_pipeline().graph.nodes) == {
+                "hash_filter",
+                "embedder",
+                "writer",
+            }
+            assert wrapper.batch_inputs([]) == {
+                "hash_filter": {"documents": []}
+            }
+
+    def test_deletes_missing_documents(self):
+        self.index(catalogue_page("a"), catalogue_page("c"))
+        assert self.datasets() == ["a", "c"]
+
+    def test_failed_page_deletes_nothing(self):
+        page = catalogue_page("a", "b")
+        truncated = ByteStream(data=page.data[:-20], meta=page.meta)
+        self.index(truncated, catalogue_page("d"))
+        assert self.datasets() == ["a", "b", "c", "d"]
@@ -0,0 +1,623 @@
+"""
+Precomputes 2-D projections of the dataset description embeddings for the
+visualisation app.
+
+Projections are computed offline, after ingestion, and saved as a compact npz
+artifact per collection together with a fingerprint of the collection
+content. The app only has to load the artifact, and the projection is only
+recomputed when the content of the collection or the reducer settings change.
+
+When only a few documents have been added or changed, they are placed into
+the existing layout by interpolating the positions of their nearest
+neighbours, rather than recomputing the whole layout. A full layout is only
+recomputed once the proportion of interpolated points passes a threshold,
+and is initialised from the previous layout so that points stay roughly
+where they were.
+
+The points are also grouped into clusters whenever a layout is saved, and the
+label of each point and the centre of each cluster are stored in the
+artifact, so that the app can show large collections as clusters without
+clustering them itself.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+import yaml
+
+from ingestion import stores
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "reducer": "tsne",
+    "pca_components": 50,
+    "random_state": 42,
+    "params": {},
+}
+
+
+@dataclass
+class Points:
+    """
+    The description documents of a collection, one per dataset.
+    """
+
+    ids: List[str]
+    metadatas: List[Dict[str, Any]]
+    documents: Optional[List[str]] = None
+    embeddings: Optional[np.ndarray] = None
+
+
+@dataclass
+class Projection:
+    """
+    2-D coordinates of the documents of a collection, with the fingerprint of
+    the content and the settings they were computed from.
+    """
+
+    ids: List[str]
+    xy: np.ndarray
+    fingerprint: str
+    settings: Dict[str, Any]
+    created: float
+    hashes: Optional[List[str]] = None
+    placed: int = 0
+    labels: Optional[np.ndarray] = None
+    centroids: Optional[np.ndarray] = None
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "fingerprint": self.fingerprint,
+            "settings": self.settings,
+            "created": self.created,
+            "placed": self.placed,
+        }
+        # Write then rename, so the app never reads a partial artifact.
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            ids=np.array(self.ids, dtype=str),
+            xy=self.xy.astype(np.float32),
+            hashes=np.array(self.hashes or [], dtype=str),
+            labels=np.asarray(
+                self.labels if self.labels is not None else [], dtype=np.int32
+            ),
+            centroids=np.asarray(
+                self.centroids if self.centroids is not None else [],
+                dtype=np.float32,
+            ).reshape(-1, 2),
+            meta=np.array(json.dumps(meta)),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["Projection"]:
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as artifact:
+            meta = json.loads(str(artifact["meta"]))
+            return cls(
+                ids=artifact["ids"].tolist(),
+                xy=artifact["xy"],
+                fingerprint=meta["fingerprint"],
+                settings=meta["settings"],
+                created=meta["created"],
+                hashes=(
+                    artifact["hashes"].tolist()
+                    if "hashes" in artifact
+                    and len(artifact["hashes"]) == len(artifact["ids"])
+                    else None
+                ),
+                placed=meta.get("placed", 0),
+                labels=(
+                    artifact["labels"]
+                    if "labels" in artifact
+                    and len(artifact["labels"]) == len(artifact["ids"])
+                    else None
+                ),
+                centroids=(
+                    artifact["centroids"] if "centroids" in artifact else None
+                ),
+            )
+
+
+def read_points(
+    collection: chromadb.Collection,
+    include_documents: bool = False,
+    include_embeddings: bool = False,
+) -> Points:
+    """
+    Reads the description documents of a collection. Only the first chunk of
+    a description is used when descriptions are chunked, so each dataset is a
+    single point.
+    """
+    include = ["metadatas"]
+    if include_documents:
+        include.append("documents")
+    if include_embeddings:
+        include.append("embeddings")
+    result = collection.get(
+        where={"eidc_metadata_key": "description"}, include=include
+    )
+    keep = [
+        i
+        for i, meta in enumerate(result["metadatas"])
+        if meta.get("chunk_index", 0) == 0
+    ]
+    return Points(
+        ids=[result["ids"][i] for i in keep],
+        metadatas=[result["metadatas"][i] for i in keep],
+        documents=(
+            [result["documents"][i] for i in keep]
+            if include_documents
+            else None
+        ),
+        embeddings=(
+            np.asarray([result["embeddings"][i] for i in keep])
+            if include_embeddings
+            else None
+        ),
+    )
+
+
+def content_hashes(points: Points) -> List[str]:
+    return [str(meta.get("content_hash")) for meta in points.metadatas]
+
+
+def content_fingerprint(points: Points) -> str:
+    """
+    Returns a fingerprint of the documents, which changes whenever a document
+    is added, removed or its content changes.
+    """
+    digest = hashlib.sha256()
+    for doc_id, doc_hash in sorted(zip(points.ids, content_hashes(points))):
+        digest.update(f"{doc_id}:{doc_hash}\n".encode())
+    return digest.hexdigest()
+
+
+def interpolate(
+    known_embeddings: np.ndarray,
+    known_xy: np.ndarray,
+    embeddings: np.ndarray,
+    neighbours: int = 10,
+    batch_size: int = 1024,
+) -> np.ndarray:
+    """
+    Places embeddings into an existing 2-D layout at the mean position of
+    their nearest known neighbours by cosine distance, weighted by inverse
+    distance.
+    """
+
+    def normalise(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    known = normalise(known_embeddings)
+    k = min(neighbours, len(known))
+    xy = np.empty((len(embeddings), 2), dtype=np.float32)
+    for start in range(0, len(embeddings), batch_size):
+        batch = normalise(embeddings[start : start + batch_size])
+        distances = 1 - batch @ known.T
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        weights = 1 / (np.take_along_axis(distances, nearest, axis=1) + 1e-6)
+        weights /= weights.sum(axis=1, keepdims=True)
+        xy[start : start + len(batch)] = np.einsum(
+            "nk,nkd->nd", weights, known_xy[nearest]
+        )
+    return xy
+
+
+def pca(
+    embeddings: np.ndarray, random_state: int, init=None, **params
+) -> np.ndarray:
+    from sklearn.decomposition import PCA
+
+    return PCA(
+        n_components=2, random_state=random_state, **params
+    ).fit_transform(embeddings)
+
+
+def tsne(
+    embeddings: np.ndarray, random_state: int, init=None, **params
+) -> np.ndarray:
+    from sklearn.manifold import TSNE
+
+    if init is not None:
+        # Rescaled as scikit-learn does for its own pca initialisation.
+        params["init"] = init / np.std(init[:, 0]) * 1e-4
+    params.setdefault("init", "pca")
+    params.setdefault("perplexity", min(30.0, (len(embeddings) - 1) / 3))
+    return TSNE(
+        n_components=2, random_state=random_state, **params
+    ).fit_transform(embeddings)
+
+
+def opentsne(
+    embeddings: np.ndarray, random_state: int, init=None, **params
+) -> np.ndarray:
+    try:
+        from openTSNE import TSNE
+    except ImportError as e:
+        raise ImportError(
+            "The opentsne reducer requires openTSNE: pip install openTSNE"
+        ) from e
+
+    if init is not None:
+        params["initialization"] = init
+    params.setdefault("neighbors", "approx")
+    params.setdefault("n_jobs", -1)
+    return np.asarray(
+        TSNE(n_components=2, random_state=random_state, **params).fit(
+            embeddings
+        )
+    )
+
+
+def umap(
+    embeddings: np.ndarray, random_state: int, init=None, **params
+) -> np.ndarray:
+    try:
+        from umap import UMAP
+    except ImportError as e:
+        raise ImportError(
+            "The umap reducer requires umap-learn: pip install umap-learn"
+        ) from e
+
+    if init is not None:
+        params["init"] = init
+    return UMAP(
+        n_components=2, random_state=random_state, **params
+    ).fit_transform(embeddings)
+
+
+def kmeans_clusters(
+    xy: np.ndarray, n_clusters: int, random_state: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Groups 2-D points into at most `n_clusters` clusters with k-means,
+    returning the cluster of each point and the centre of each cluster.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    if len(xy) == 0:
+        return np.empty(0, dtype=np.int32), np.empty((0, 2), np.float32)
+    kmeans = MiniBatchKMeans(
+        n_clusters=min(n_clusters, len(xy)),
+        random_state=random_state,
+        n_init=3,
+    )
+    labels = kmeans.fit_predict(xy)
+    return labels.astype(np.int32), kmeans.cluster_centers_.astype(np.float32)
+
+
+REDUCERS: Dict[str, Callable[..., np.ndarray]] = {
+    "pca": pca,
+    "tsne": tsne,
+    "opentsne": opentsne,
+    "umap": umap,
+}
+
+
+def reduce(
+    embeddings: np.ndarray,
+    settings: Dict[str, Any],
+    init: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Projects embeddings to 2-D with the configured reducer, optionally
+    initialised from the given positions. Except for the pca reducer itself,
+    embeddings are first reduced to `pca_components` dimensions with PCA,
+    which speeds up the neighbour search of the non-linear reducers
+    considerably while losing little structure.
+    """
+    reducer = settings["reducer"]
+    if reducer not in REDUCERS:
+        raise ValueError(
+            f"Unknown reducer {reducer}, expected one of {list(REDUCERS)}."
+        )
+    random_state = settings["random_state"]
+    components = settings["pca_components"]
+    if reducer != "pca" and components and components < min(embeddings.shape):
+        from sklearn.decomposition import PCA
+
+        embeddings = PCA(
+            n_components=components, random_state=random_state
+        ).fit_transform(embeddings)
+    return REDUCERS[reducer](
+        embeddings,
+        random_state=random_state,
+        init=init,
+        **dict(settings["params"]),
+    )
+
+
+class ProjectionStore:
+    """
+    Directory of projection artifacts, one per collection.
+    """
+
+    def __init__(
+        self,
+        path: str = "projection-cache",
+        settings: Optional[Dict[str, Any]] = None,
+        incremental: bool = True,
+        drift_threshold: float = 0.1,
+        neighbours: int = 10,
+        clusters: int = 50,
+    ) -> None:
+        """
+        :param path: Directory the artifacts are stored in.
+        :param settings: Reducer settings, overriding `DEFAULT_SETTINGS`.
+        :param incremental: Whether new documents are placed into the
+            existing layout instead of recomputing it.
+        :param drift_threshold: Proportion of points placed incrementally
+            since the last full layout above which the layout is recomputed.
+        :param neighbours: Number of nearest neighbours new points are
+            interpolated from.
+        :param clusters: Number of clusters the points are grouped into.
+        """
+        self.path = Path(path)
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.incremental = incremental
+        self.drift_threshold = drift_threshold
+        self.neighbours = neighbours
+        self.clusters = clusters
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ProjectionStore":
+        """
+        Creates a store from the `visualisation.projection` section of the
+        config file.
+        """
+        settings = dict(
+            config.get("visualisation", {}).get("projection") or {}
+        )
+        options = {
+            key: settings.pop(key)
+            for key in (
+                "incremental",
+                "drift_threshold",
+                "neighbours",
+                "clusters",
+            )
+            if key in settings
+        }
+        return cls(
+            settings.pop("path", "projection-cache"), settings, **options
+        )
+
+    def artifact_path(self, collection_name: str) -> Path:
+        return self.path / f"{collection_name}.npz"
+
+    def load(self, collection_name: str) -> Optional[Projection]:
+        return Projection.load(self.artifact_path(collection_name))
+
+    def is_current(
+        self, projection: Optional[Projection], fingerprint: str
+    ) -> bool:
+        """
+        Whether a projection was computed from the given content with the
+        current settings.
+        """
+        return (
+            projection is not None
+            and projection.fingerprint == fingerprint
+            and projection.settings == self.settings
+        )
+
+    def retained(
+        self, projection: Optional[Projection], points: Points
+    ) -> np.ndarray:
+        """
+        Returns the position in the projection of each point that is
+        unchanged since the projection was computed, or -1 for new and
+        changed points.
+        """
+        if projection is None or projection.hashes is None:
+            return np.full(len(points.ids), -1)
+        previous = {
+            (doc_id, doc_hash): i
+            for i, (doc_id, doc_hash) in enumerate(
+                zip(projection.ids, projection.hashes)
+            )
+        }
+        return np.array(
+            [
+                previous.get(key, -1)
+                for key in zip(points.ids, content_hashes(points))
+            ],
+            dtype=int,
+        )
+
+    def has_clusters(self, projection: Projection) -> bool:
+        """
+        Whether a projection's points have been grouped into the configured
+        number of clusters.
+        """
+        return (
+            projection.labels is not None
+            and projection.centroids is not None
+            and len(projection.centroids)
+            == min(self.clusters, len(projection.ids))
+        )
+
+    def cluster(self, projection: Projection) -> None:
+        """
+        Groups the points of a projection into clusters.
+        """
+        start = time.time()
+        projection.labels, projection.centroids = kmeans_clusters(
+            projection.xy, self.clusters, self.settings["random_state"]
+        )
+        logger.info(
+            f"Grouped {len(projection.ids)} points into "
+            f"{len(projection.centroids)} clusters in "
+            f"{time.time() - start:.1f}s"
+        )
+
+    def save(
+        self,
+        collection: chromadb.Collection,
+        points: Points,
+        xy: np.ndarray,
+        placed: int = 0,
+    ) -> Projection:
+        projection = Projection(
+            ids=points.ids,
+            xy=np.asarray(xy, dtype=np.float32),
+            fingerprint=content_fingerprint(points),
+            settings=self.settings,
+            created=time.time(),
+            hashes=content_hashes(points),
+            placed=placed,
+        )
+        self.cluster(projection)
+        projection.save(self.artifact_path(collection.name))
+        return projection
+
+    def place(
+        self,
+        points: Points,
+        projection: Optional[Projection],
+        retained: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Returns positions for every point, keeping the positions of retained
+        points and interpolating the rest from their retained neighbours.
+        """
+        kept = retained >= 0
+        xy = np.empty((len(points.ids), 2), dtype=np.float32)
+        xy[kept] = projection.xy[retained[kept]]
+        if not kept.all():
+            xy[~kept] = interpolate(
+                points.embeddings[kept],
+                xy[kept],
+                points.embeddings[~kept],
+                self.neighbours,
+            )
+        return xy
+
+    def update(
+        self, collection: chromadb.Collection, projection: Projection
+    ) -> Optional[Projection]:
+        """
+        Places new and changed documents into the stored layout and saves it.
+        Returns None if the layout has drifted too far from the last full
+        layout and should be recomputed.
+        """
+        points = read_points(collection, include_embeddings=True)
+        retained = self.retained(projection, points)
+        new = int((retained < 0).sum())
+        placed = projection.placed + new
+        if not (retained >= 0).any() or placed > self.drift_threshold * len(
+            points.ids
+        ):
+            logger.info(
+                f"{placed} of {len(points.ids)} documents placed since the "
+                f"last full layout of {collection.name}, recomputing"
+            )
+            return None
+        xy = self.place(points, projection, retained)
+        logger.info(
+            f"Placed {new} new documents into the layout of "
+            f"{collection.name}"
+        )
+        return self.save(collection, points, xy, placed)
+
+    def project(
+        self,
+        collection: chromadb.Collection,
+        previous: Optional[Projection] = None,
+    ) -> Projection:
+        """
+        Computes and saves the projection of a collection. If a previous
+        projection is given, the layout is initialised from it so that
+        points keep roughly the same positions.
+        """
+        points = read_points(collection, include_embeddings=True)
+        init = None
+        retained = self.retained(previous, points)
+        if (retained >= 0).any():
+            init = self.place(points, previous, retained)
+        start = time.time()
+        xy = reduce(points.embeddings, self.settings, init)
+        logger.info(
+            f"Projected {len(points.ids)} documents from {collection.name} "
+            f"with {self.settings['reducer']} in {time.time() - start:.1f}s"
+        )
+        return self.save(collection, points, xy)
+
+    def get(
+        self, collection: chromadb.Collection, force: bool = False
+    ) -> Projection:
+        """
+        Returns the stored projection of a collection, updating it if the
+        collection or settings have changed since it was computed, or only
+        its clusters if the number of clusters has.
+        """
+        projection = self.load(collection.name)
+        if force:
+            return self.project(collection, projection)
+        if self.is_current(
+            projection, content_fingerprint(read_points(collection))
+        ):
+            if not self.has_clusters(projection):
+                self.cluster(projection)
+                projection.save(self.artifact_path(collection.name))
+            return projection
+        if (
+            self.incremental
+            and projection is not None
+            and projection.settings == self.settings
+        ):
+            updated = self.update(collection, projection)
+            if updated is not None:
+                return updated
+        return self.project(collection, projection)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", default="config.yml")
+    parser.add_argument(
+        "--collection", help="collection to project (default: vector-db)"
+    )
+    parser.add_argument("--reducer", choices=list(REDUCERS))
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="recompute even if the stored projection is current",
+    )
+    args = parser.parse_args()
+
+    with open(args.config, "r") as config_file:
+        config = yaml.safe_load(config_file)
+    store = ProjectionStore.from_config(config)
+    if args.reducer:
+        store.settings["reducer"] = args.reducer
+    stores.configure(config)
+    client = stores.get_client(config["vector-db"]["path"])
+    collection = client.get_collection(
+        args.collection or config["vector-db"]["collection"]
+    )
+    projection = store.get(collection, force=args.force)
+    logger.info(
+        f"Projection of {len(projection.ids)} documents saved to "
+        f"{store.artifact_path(collection.name)}"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
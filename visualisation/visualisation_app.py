@@ -2,76 +2,147 @@
 Streamlit application to view EIDC datasets using their document embeddings
 """
 
-import chromadb
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
-from sklearn.manifold import TSNE
-import numpy as np
 import yaml
+from chromadb.api import ClientAPI
+
+from ingestion import stores
+from rag.cache import chroma_collection_fingerprint
+from visualisation.projection import ProjectionStore, read_points
 
-CDB = None
 with open("config.yml", "r") as config_file:
     config = yaml.safe_load(config_file)
+stores.configure(config)
 
 
-def get_chroma_client() -> chromadb.Client:
+def get_chroma_client() -> ClientAPI:
     """
-    Retrieve or instantiate the chromadb client.
+    Retrieve the chromadb client shared by the whole process.
     """
-    global CDB
-    if CDB is None:
-        CDB = chromadb.PersistentClient(path=config["vector-db"]["path"])
-    return CDB
+    return stores.get_client(config["vector-db"]["path"])
 
 
-@st.cache_data
-def get_embeddings(collection_name: str) -> pd.DataFrame:
+def get_embeddings(
+    collection_name: str,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Retrieve document embeddings from chroma database.
+    Retrieve the 2-D projection of the document embeddings and its clusters,
+    reloading them only when the collection has been re-indexed.
     """
     collection = get_chroma_client().get_collection(collection_name)
-    result = collection.get(
-        where={"eidc_metadata_key": "description"},
-        include=["embeddings", "documents", "metadatas"],
+    return load_projection(
+        collection_name, chroma_collection_fingerprint(collection)
     )
 
-    embeddings = np.array(result["embeddings"])
-
-    tsne = TSNE(n_components=2, verbose=1, random_state=42)
-    reduced_embeddings = tsne.fit_transform(embeddings)
 
-    df = pd.DataFrame(reduced_embeddings, columns=["x", "y"])
-    df["title"] = [
-        metadata["dataset_title"] for metadata in result["metadatas"]
-    ]
-    df["description"] = result["documents"]
-
-    df["doc_id"] = [metadata["dataset_id"] for metadata in result["metadatas"]]
+@st.cache_data
+def load_projection(
+    collection_name: str, fingerprint: str
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Load the precomputed projection of a collection with the titles and
+    clusters of the datasets, indexed by dataset id, and a frame of the
+    clusters. Descriptions are fetched from chroma only when a dataset is
+    selected. The projection is recomputed if the content of the collection
+    has changed since it was last computed.
+    """
+    collection = get_chroma_client().get_collection(collection_name)
+    projection = ProjectionStore.from_config(config).get(collection)
+    points = read_points(collection)
+
+    df = pd.DataFrame(projection.xy, columns=["x", "y"])
+    df["id"] = projection.ids
+    df["cluster"] = projection.labels
+    details = pd.DataFrame(
+        {
+            "id": points.ids,
+            "title": [meta["dataset_title"] for meta in points.metadatas],
+            "doc_id": [meta["dataset_id"] for meta in points.metadatas],
+        }
+    )
+    df = df.merge(details, on="id")
     df["short_title"] = [
         title[:50] + "..." if len(title) > 15 else title
         for title in df["title"].to_list()
     ]
-    return df
+    # Hash index on the dataset id, so selected points are looked up in
+    # constant time rather than by scanning the frame.
+    df.index = pd.Index(df["doc_id"].to_numpy())
+    return df, summarise_clusters(df, projection.centroids)
+
+
+@st.cache_data
+def get_description(collection_name: str, document_id: str) -> str:
+    """
+    Fetch the description of a single dataset from chroma.
+    """
+    collection = get_chroma_client().get_collection(collection_name)
+    return collection.get(ids=[document_id], include=["documents"])[
+        "documents"
+    ][0]
+
+
+def summarise_clusters(
+    df: pd.DataFrame, centroids: np.ndarray
+) -> pd.DataFrame:
+    """
+    Returns a frame with the centre, size and example titles of each cluster
+    of the projected points, from the clusters stored with the projection.
+    Clusters without any points are left out.
+    """
+    grouped = df.groupby("cluster")
+    clusters = pd.DataFrame(centroids, columns=["x", "y"])
+    clusters["count"] = grouped.size()
+    clusters["titles"] = grouped["short_title"].agg(
+        lambda titles: "<br>".join(titles.head(3))
+    )
+    clusters = clusters.dropna(subset=["count"]).astype({"count": int})
+    return clusters.rename_axis("cluster").reset_index()
 
 
 def create_figure(df: pd.DataFrame) -> go.Figure:
     """
-    Creates scatter plot based on handed data frame
+    Creates a WebGL scatter plot of the datasets in the handed data frame.
     """
-    color_dict = {i: px.colors.qualitative.Alphabet[i] for i in range(0, 20)}
-    color_dict[-1] = "#ABABAB"
-    # topic_color = df["topic_number"].map(color_dict)
     fig = go.Figure(
-        data=go.Scatter(
+        data=go.Scattergl(
             x=df["x"],
             y=df["y"],
             mode="markers",
-            # marker_color=topic_color,
             customdata=df["doc_id"],
             text=df["title"],
-            hovertemplate="<b>%{text}</b>",
+            hovertemplate="<b>%{text}</b><extra></extra>",
+        )
+    )
+    fig.update_layout(height=600)
+    return fig
+
+
+def create_cluster_figure(clusters: pd.DataFrame) -> go.Figure:
+    """
+    Creates a scatter plot with one marker per cluster, sized by the number
+    of datasets in the cluster.
+    """
+    fig = go.Figure(
+        data=go.Scattergl(
+            x=clusters["x"],
+            y=clusters["y"],
+            mode="markers",
+            marker=dict(
+                size=clusters["count"],
+                sizemode="area",
+                sizeref=2.0 * clusters["count"].max() / 40**2,
+                sizemin=4,
+            ),
+            customdata=clusters["cluster"],
+            text="<b>"
+            + clusters["count"].astype(str)
+            + " datasets</b><br>"
+            + clusters["titles"],
+            hovertemplate="%{text}<extra></extra>",
         )
     )
     fig.update_layout(height=600)
@@ -85,35 +156,59 @@ def update_text(title: str, desc: str, col) -> None:
     """
     with col:
         st.markdown(f"**{title}**")
-        # st.markdown(f"*{topic}*")
         st.markdown(desc)
 
 
-def extract_details(df: pd.DataFrame, doc_id: str) -> str | str | str:
+def extract_details(df: pd.DataFrame, doc_id: str) -> tuple[str, str]:
     """
-    Extract title, description and topic details from a dataframe based on
-    the an id.
+    Extract title and description of a dataset based on its id, fetching the
+    description from chroma.
     """
-    selection = df[df["doc_id"] == doc_id]
-    title = selection["title"].iloc[0]
-    desc = selection["description"].iloc[0]
-    # topic = selection["topic"].iloc[0]
-    return title, desc
+    selection = df.loc[doc_id]
+    desc = get_description(config["vector-db"]["collection"], selection["id"])
+    return selection["title"], desc
 
 
 def main() -> None:
     """
     Main method that sets up the streamlit app and builds the visualisation.
+    Large collections are first shown as clusters, and selecting a cluster
+    shows the datasets within it.
     """
     st.set_page_config(layout="wide", page_title="EIDC Dataset Embeddings")
     st.title("EIDC Dataset Embeddings")
     col1, col2 = st.columns([3, 1])
 
-    df = get_embeddings(config["vector-db"]["collection"])
-    fig = create_figure(df)
+    df, clusters = get_embeddings(config["vector-db"]["collection"])
+    map_config = config.get("visualisation", {}).get("map", {})
+    lod_threshold = map_config.get("lod_threshold", 2000)
+
+    if "cluster" not in st.session_state:
+        st.session_state.cluster = None
+    if len(df) > lod_threshold:
+        if st.session_state.cluster is None:
+            event = col1.plotly_chart(
+                create_cluster_figure(clusters),
+                key="clusters",
+                on_select="rerun",
+                selection_mode="points",
+            )
+            if len(event["selection"]["points"]) > 0:
+                st.session_state.cluster = event.selection.points[0][
+                    "customdata"
+                ]
+                st.rerun()
+            return
+        if col1.button("Back to all clusters"):
+            st.session_state.cluster = None
+            st.rerun()
+        df = df[df["cluster"] == st.session_state.cluster]
 
     event = col1.plotly_chart(
-        fig, key="embeddings", on_select="rerun", selection_mode="points"
+        create_figure(df),
+        key="embeddings",
+        on_select="rerun",
+        selection_mode="points",
     )
     if len(event["selection"]["points"]) > 0:
         point = event.selection.points[0]